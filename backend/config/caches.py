@@ -0,0 +1,45 @@
+"""
+Default cache, selected with the ``DJANGO_CACHE_URL`` environment variable.
+
+Unset
+    Local-memory cache. Entries are private to each process, so unless
+    ``USERS_SINGLE_PROCESS`` is set (``runserver``, tests) the users app
+    stops trusting the version keys it holds (see ``users.cache``).
+
+``redis://host:6379/0`` (or ``rediss://``, ``unix://``)
+    Redis, shared by every worker. Several comma-separated URLs make the
+    first the primary that takes writes and the rest read replicas.
+
+``memcached://host:11211`` (comma-separated ``host:port`` for several servers)
+    Memcached through pymemcache, shared by every worker.
+"""
+
+import os
+
+REDIS_SCHEMES = ('redis://', 'rediss://', 'unix://')
+MEMCACHED_SCHEME = 'memcached://'
+
+
+def cache_from_env(env=os.environ):
+    """Return the ``CACHES['default']`` entry for ``DJANGO_CACHE_URL``."""
+    url = env.get('DJANGO_CACHE_URL', '').strip()
+    if not url:
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'users',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    locations = [location.strip() for location in url.split(',') if location.strip()]
+    if url.startswith(REDIS_SCHEMES):
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': locations,
+        }
+    if url.startswith(MEMCACHED_SCHEME):
+        return {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': [location.removeprefix(MEMCACHED_SCHEME) for location in locations],
+        }
+    raise ValueError(
+        f"Unsupported DJANGO_CACHE_URL '{url}', expected a redis://, rediss://, unix:// or memcached:// URL"
+    )
@@ -0,0 +1,113 @@
+"""
+Database profiles, selected with the ``DJANGO_DB_PROFILE`` environment variable.
+
+``sqlite`` (default)
+    Local SQLite file in WAL mode: readers no longer block the writer,
+    ``synchronous=NORMAL`` avoids an fsync per commit, a busy timeout makes
+    writers wait instead of failing with "database is locked", and
+    transactions take the write lock up front (``BEGIN IMMEDIATE``) so two
+    writers cannot deadlock upgrading from a read lock.
+
+``postgres``
+    PostgreSQL configured from ``POSTGRES_*`` variables, with a psycopg 3
+    connection pool (``POSTGRES_POOL_MAX_SIZE=0`` switches to persistent
+    per-thread connections via ``CONN_MAX_AGE`` instead).
+
+Read replicas are listed in ``DJANGO_DB_REPLICAS`` (comma-separated) and
+become the aliases ``replica1``, ``replica2``, ...: SQLite file paths for
+the SQLite profiles (kept in sync by ``manage.py sync_replicas``),
+``host[:port]`` for PostgreSQL. Tests run them as mirrors of ``default``.
+"""
+
+import os
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,  # KiB
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_profile(path, env=os.environ, tuned=True):
+    """
+    SQLite database settings; ``tuned=False`` gives Django's defaults.
+    """
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': env.get('SQLITE_PATH', path),
+    }
+    if tuned:
+        database['OPTIONS'] = {
+            'timeout': float(env.get('SQLITE_BUSY_TIMEOUT', 20)),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ''.join(f'PRAGMA {name}={value};' for name, value in SQLITE_PRAGMAS.items()),
+        }
+        database['CONN_MAX_AGE'] = int(env.get('DJANGO_CONN_MAX_AGE', 60))
+    return database
+
+
+def postgres_profile(env=os.environ):
+    """
+    PostgreSQL database settings with connection pooling.
+    """
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('POSTGRES_DB', 'inventory'),
+        'USER': env.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': env.get('POSTGRES_PASSWORD', ''),
+        'HOST': env.get('POSTGRES_HOST', 'localhost'),
+        'PORT': env.get('POSTGRES_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    max_size = int(env.get('POSTGRES_POOL_MAX_SIZE', 20))
+    if max_size:
+        # Pooled connections are returned on close, so CONN_MAX_AGE must stay 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(env.get('POSTGRES_POOL_MIN_SIZE', 2)),
+            'max_size': max_size,
+            'timeout': float(env.get('POSTGRES_POOL_TIMEOUT', 10)),
+        }
+    else:
+        database['CONN_MAX_AGE'] = int(env.get('DJANGO_CONN_MAX_AGE', 60))
+    return database
+
+
+PROFILES = {
+    'sqlite': lambda base_dir, env: sqlite_profile(base_dir / 'db.sqlite3', env),
+    'sqlite-default': lambda base_dir, env: sqlite_profile(base_dir / 'db.sqlite3', env, tuned=False),
+    'postgres': lambda base_dir, env: postgres_profile(env),
+}
+
+
+def database_from_env(base_dir, env=os.environ):
+    """Return the ``DATABASES['default']`` entry for ``DJANGO_DB_PROFILE``."""
+    profile = env.get('DJANGO_DB_PROFILE', 'sqlite')
+    try:
+        return PROFILES[profile](base_dir, env)
+    except KeyError:
+        raise ValueError(
+            f"Unknown DJANGO_DB_PROFILE '{profile}', expected one of: {', '.join(PROFILES)}"
+        ) from None
+
+
+def replicas_from_env(base_dir, env=os.environ):
+    """Return the ``DATABASES`` entries of the read replicas in ``DJANGO_DB_REPLICAS``."""
+    profile = env.get('DJANGO_DB_PROFILE', 'sqlite')
+    names = [name.strip() for name in env.get('DJANGO_DB_REPLICAS', '').split(',') if name.strip()]
+    replicas = {}
+    for n, name in enumerate(names, start=1):
+        if profile == 'postgres':
+            host, _, port = name.partition(':')
+            replica_env = {**env, 'POSTGRES_HOST': host}
+            if port:
+                replica_env['POSTGRES_PORT'] = port
+            database = postgres_profile(replica_env)
+        else:
+            local = {key: value for key, value in env.items() if key != 'SQLITE_PATH'}
+            database = sqlite_profile(base_dir / name, local, tuned=profile != 'sqlite-default')
+        database['TEST'] = {'MIRROR': 'default'}
+        replicas[f'replica{n}'] = database
+    return replicas
@@ -0,0 +1,267 @@
+"""
+Precomputed OpenAPI schema.
+
+The schema is generated once per fingerprint (a hash of the URLconf, the
+modules defining its views and serializers, and the drf-spectacular
+settings), rendered to YAML and JSON, gzipped, and kept in memory and in
+``USERS_SCHEMA_CACHE_DIR``. ``/schema/`` only ever serves those bytes, with
+an ETag and gzip when the client accepts it.
+
+``manage.py regenerate_schema`` builds (and validates) the files at deploy
+time. Whether a missing schema may be generated on the request path is
+controlled by ``USERS_SCHEMA_GENERATE_ON_REQUEST`` (default: ``DEBUG``);
+otherwise ``/schema/`` answers 503 until the command has been run.
+
+Nothing from drf-spectacular is imported until a schema route is first hit:
+``swagger_view`` builds the Swagger UI view on its first request, so workers
+that never serve ``/docs/`` don't pay for it at startup.
+"""
+
+import gzip
+import hashlib
+import logging
+import sys
+import threading
+from importlib import import_module
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import URLResolver, get_resolver
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'yaml': ('application/vnd.oai.openapi; charset=utf-8', 'schema.yaml'),
+    'json': ('application/vnd.oai.openapi+json; charset=utf-8', 'schema.json'),
+}
+
+# Modules registering drf-spectacular extensions, imported before generating
+EXTENSION_MODULES = ('users.schema',)
+
+
+class RenderedSchema(NamedTuple):
+    body: bytes
+    gzipped: bytes
+    etag: str
+
+
+def _iter_views(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _iter_views(pattern.url_patterns, prefix + str(pattern.pattern))
+        else:
+            yield prefix + str(pattern.pattern), pattern.callback
+
+
+def _qualname(obj) -> str:
+    return f'{obj.__module__}.{getattr(obj, "__qualname__", type(obj).__qualname__)}'
+
+
+def compute_fingerprint(urlconf=None) -> str:
+    """
+    Hash everything the generated schema depends on.
+
+    Covers every URL route and its view, the source of the modules that
+    define the views, their serializers and the schema extensions, and the
+    spectacular settings.
+    """
+    import drf_spectacular
+
+    for name in EXTENSION_MODULES:
+        import_module(name)
+
+    digest = hashlib.sha256()
+    modules = set()
+    for route, callback in _iter_views(get_resolver(urlconf).url_patterns):
+        view = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None) or callback
+        digest.update(f'{route}\0{_qualname(view)}\n'.encode())
+        modules.add(view.__module__)
+        serializer_class = getattr(view, 'serializer_class', None)
+        if serializer_class is not None:
+            modules.add(serializer_class.__module__)
+    modules.update(EXTENSION_MODULES)
+
+    for name in sorted(modules):
+        path = getattr(sys.modules.get(name), '__file__', None)
+        if path:
+            digest.update(Path(path).read_bytes())
+    digest.update(drf_spectacular.__version__.encode())
+    digest.update(repr(sorted(getattr(settings, 'SPECTACULAR_SETTINGS', {}).items())).encode())
+    return digest.hexdigest()[:16]
+
+
+class SchemaGenerationError(Exception):
+    """The generator reported errors, so views are missing from the schema."""
+
+
+def generate_schema(validate=False, strict=False) -> dict:
+    """
+    Run drf-spectacular's generator.
+
+    Raises:
+        SchemaGenerationError: If ``strict`` is set and the generator
+            reported errors (it skips the views it can't handle)
+        Exception: If ``validate`` is set and the schema is not valid OpenAPI
+    """
+    from drf_spectacular.drainage import GENERATOR_STATS
+    from drf_spectacular.settings import spectacular_settings
+    from drf_spectacular.validation import validate_schema
+
+    for name in EXTENSION_MODULES:
+        import_module(name)
+    GENERATOR_STATS.reset()
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    errors = list(GENERATOR_STATS._error_cache)
+    if strict and errors:
+        raise SchemaGenerationError(f"{len(errors)} generator error(s):\n" + "\n".join(errors))
+    if validate:
+        validate_schema(schema)
+    return schema
+
+
+def render_schema(schema) -> dict:
+    """Render the schema in every format, returning ``{format: RenderedSchema}``."""
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    rendered = {}
+    for fmt, renderer in (('yaml', OpenApiYamlRenderer()), ('json', OpenApiJsonRenderer())):
+        body = renderer.render(schema, renderer_context={})
+        rendered[fmt] = _pack(body)
+    return rendered
+
+
+def _pack(body: bytes) -> RenderedSchema:
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    return RenderedSchema(body, gzip.compress(body, compresslevel=9, mtime=0), etag)
+
+
+def get_cache_dir() -> Path:
+    return Path(getattr(settings, 'USERS_SCHEMA_CACHE_DIR', settings.BASE_DIR / 'schema-cache'))
+
+
+def _path(fingerprint, fmt) -> Path:
+    return get_cache_dir() / f'{fingerprint}.{FORMATS[fmt][1]}'
+
+
+def write_schema(fingerprint, rendered):
+    directory = get_cache_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    for fmt, schema in rendered.items():
+        path = _path(fingerprint, fmt)
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_bytes(schema.body)
+        tmp.replace(path)
+    # Drop schemas built for older code
+    for path in directory.glob('*.schema.*'):
+        if not path.name.startswith(f'{fingerprint}.'):
+            path.unlink(missing_ok=True)
+
+
+def read_schema(fingerprint):
+    """Load the rendered schema for ``fingerprint`` from disk, or None."""
+    try:
+        return {fmt: _pack(_path(fingerprint, fmt).read_bytes()) for fmt in FORMATS}
+    except FileNotFoundError:
+        return None
+
+
+_state = {'fingerprint': None, 'rendered': None}
+_lock = threading.Lock()
+
+
+def build(validate=False, force=False, strict=False):
+    """
+    Generate, render and store the schema for the current code; see
+    ``generate_schema`` for ``validate`` and ``strict``.
+
+    Returns:
+        tuple: ``(fingerprint, rendered, generated)``; ``generated`` is False
+        when an up-to-date schema was already on disk
+    """
+    fingerprint = compute_fingerprint()
+    rendered = None if force else read_schema(fingerprint)
+    generated = rendered is None
+    if generated:
+        rendered = render_schema(generate_schema(validate=validate, strict=strict))
+        write_schema(fingerprint, rendered)
+    with _lock:
+        _state.update(fingerprint=fingerprint, rendered=rendered)
+    return fingerprint, rendered, generated
+
+
+def get_rendered_schema():
+    """
+    Return ``{format: RenderedSchema}`` from memory or disk, generating it
+    only when ``USERS_SCHEMA_GENERATE_ON_REQUEST`` allows; None otherwise.
+    """
+    rendered = _state['rendered']
+    if rendered is not None:
+        return rendered
+    with _lock:
+        if _state['rendered'] is None:
+            fingerprint = compute_fingerprint()
+            rendered = read_schema(fingerprint)
+            if rendered is None:
+                if not getattr(settings, 'USERS_SCHEMA_GENERATE_ON_REQUEST', settings.DEBUG):
+                    logger.error("No OpenAPI schema for fingerprint %s; run manage.py regenerate_schema", fingerprint)
+                    return None
+                rendered = render_schema(generate_schema())
+                write_schema(fingerprint, rendered)
+            _state.update(fingerprint=fingerprint, rendered=rendered)
+        return _state['rendered']
+
+
+def _wants_json(request) -> bool:
+    fmt = request.GET.get('format')
+    if fmt:
+        return fmt in ('json', 'openapi-json')
+    return 'json' in request.META.get('HTTP_ACCEPT', '')
+
+
+@require_GET
+def schema_view(request):
+    """
+    Serve the precomputed schema: YAML by default, JSON with ``?format=json``
+    or a JSON ``Accept`` header.
+    """
+    rendered = get_rendered_schema()
+    if rendered is None:
+        response = HttpResponse("OpenAPI schema has not been built.", status=503, content_type='text/plain')
+        response['Retry-After'] = '60'
+        return response
+
+    fmt = 'json' if _wants_json(request) else 'yaml'
+    schema = rendered[fmt]
+    use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    # Each encoding is a separate representation, so it gets its own ETag
+    etag = schema.etag[:-1] + '-gzip"' if use_gzip else schema.etag
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content_type, filename = FORMATS[fmt]
+        response = HttpResponse(schema.gzipped if use_gzip else schema.body, content_type=content_type)
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+    return response
+
+
+_swagger = []
+
+
+@csrf_exempt
+def swagger_view(request, *args, **kwargs):
+    """Swagger UI for ``/schema/``, built on first use."""
+    if not _swagger:
+        from drf_spectacular.views import SpectacularSwaggerView
+
+        _swagger.append(SpectacularSwaggerView.as_view(url_name='schema'))
+    return _swagger[0](request, *args, **kwargs)
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from .caches import cache_from_env
+from .databases import database_from_env, replicas_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,21 +52,17 @@ INSTALLED_APPS = [
 ]
 SITE_ID = 1
 MIDDLEWARE = [
+    'users.middleware.ServerTimingMiddleware',
+    # Scopes read-replica routing to the request (unused without replicas)
+    'users.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "corsheaders.middleware.CorsMiddleware",
-    "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -88,13 +87,14 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Profile chosen by DJANGO_DB_PROFILE (sqlite, sqlite-default or postgres), see config/databases.py
+# Read replicas from DJANGO_DB_REPLICAS; users.replicas routes safe reads to them
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_from_env(BASE_DIR),
+    **replicas_from_env(BASE_DIR),
 }
+DATABASE_ROUTERS = ['users.replicas.PrimaryReplicaRouter']
 
 
 # Password validation
@@ -115,6 +115,15 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Django's default hashers, with PBKDF2 timed for Server-Timing and /metrics
+PASSWORD_HASHERS = [
+    'users.hashing.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -143,20 +152,31 @@ AUTH_USER_MODEL = "users.User"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.RevocableJWTAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    "DEFAULT_RENDERER_CLASSES": [
+        "users.renderers.TimedJSONRenderer",
+        "users.renderers.TimedBrowsableAPIRenderer",
+    ],
 }
 
 from datetime import timedelta
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    # Embed role/approval claims for users.authentication.ClaimsJWTAuthentication
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.ClaimsTokenObtainPairSerializer",
+    # Reject tokens revoked through users.revocation
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.RevocableTokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "users.serializers.RevocableTokenVerifySerializer",
 }
 
 CORS_ALLOWED_ORIGINS = ["http://localhost:5173"]  # React dev server
 
-EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+# Emails are queued in the database and delivered by `manage.py send_queued_email`
+# through USERS_EMAIL_DELIVERY_BACKEND (use the SMTP backend in production)
+EMAIL_BACKEND = "users.mail.QueuedEmailBackend"
 DEFAULT_FROM_EMAIL = "no-reply@example.com"
 
 DJOSER = {
@@ -175,3 +195,49 @@ DJOSER = {
 
 STATIC_URL = "static/"
 ALLOWED_HOSTS = ["localhost", "127.0.0.1"]
+
+# Cache used for the /me/ payload, user version stamps and the version keys
+# other processes poll. Chosen by DJANGO_CACHE_URL (Redis or Memcached), see
+# config/caches.py; unset, it is per process and, unless USERS_SINGLE_PROCESS,
+# the users app reads the database instead (users.W001).
+CACHES = {
+    "default": cache_from_env(),
+}
+
+# Users app tuning
+USERS_ME_CACHE_TIMEOUT = 60 * 60  # seconds a cached /me/ payload is kept
+USERS_BULK_CHUNK_SIZE = 500  # primary keys per UPDATE in admin bulk actions
+USERS_BULK_BACKGROUND_THRESHOLD = 2000  # larger selections run as background jobs
+USERS_BULK_JOB_LEASE = 5 * 60  # seconds without a heartbeat before run_bulk_jobs requeues a running job
+USERS_SNAPSHOT_CACHE_SIZE = 10000  # users kept in the in-process JWT snapshot LRU
+USERS_APPROVAL_BATCH_MAX = 5000  # ids accepted in one approval queue POST
+USERS_ADMIN_EXACT_COUNT_THRESHOLD = 10000  # changelist counts above this are estimated
+USERS_ADMIN_COUNT_CACHE_TIMEOUT = 300  # seconds a filtered count is cached; off PostgreSQL each new filter still runs a full COUNT(*)
+USERS_ADMIN_FULL_RESULT_COUNT = False  # show the unfiltered total next to filtered counts
+USERS_HASHER_WORKERS = None  # password hashing threads for async views (None = CPU count)
+USERS_HASHER_QUEUE = None  # extra hashing jobs allowed to wait (None = 4 x workers)
+USERS_GRADUATION_EXPIRED_STATUS = 'pending'  # where expire_graduates moves approved students after 12 months
+USERS_UNITEC_EMAIL_DOMAINS = ['myunitec.ac.nz']  # auto-approved Unitec domains; '*.example.ac.nz' matches subdomains
+USERS_DOMAIN_RULES_CHECK_INTERVAL = 5  # seconds between checks for domain rule changes made by other processes
+USERS_EXPORT_CHUNK_SIZE = 2000  # rows fetched and encoded per chunk when streaming exports
+USERS_SERVER_TIMING_HEADER = True  # send per-request db/hash/serialize timings to clients in Server-Timing
+USERS_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # client addresses allowed to scrape /metrics
+USERS_SCHEMA_CACHE_DIR = BASE_DIR / 'schema-cache'  # rendered OpenAPI schemas, keyed by code fingerprint
+USERS_SCHEMA_GENERATE_ON_REQUEST = DEBUG  # False in production: build with manage.py regenerate_schema
+USERS_STARTUP_BUDGET_MS = 1500  # settings + django.setup() + URLconf import time; enforced by profile_startup --check
+USERS_REVOCATION_CHECK_INTERVAL = 5  # seconds between checks for token revocations made by other processes
+USERS_REVOCATION_REBUILD_INTERVAL = 600  # seconds before the revocation Bloom filter is rebuilt to drop expired entries
+USERS_REVOCATION_BLOOM_CAPACITY = 10000  # minimum entries the revocation Bloom filter is sized for
+USERS_REVOCATION_BLOOM_ERROR_RATE = 0.001  # false-positive rate; each false positive costs one query
+USERS_REVOCATION_PURGE_BATCH_SIZE = 1000  # expired revocations deleted per DELETE by purge_revoked_tokens
+USERS_AUDIT_BATCH_SIZE = 5000  # audit log entries buffered per bulk_create
+USERS_EMAIL_DELIVERY_BACKEND = "django.core.mail.backends.console.EmailBackend"  # backend send_queued_email delivers through
+USERS_EMAIL_BATCH_SIZE = 100  # queued emails claimed and sent over one connection
+USERS_EMAIL_MAX_ATTEMPTS = 6  # delivery attempts before an email is marked failed
+USERS_EMAIL_RETRY_BACKOFF = 30  # seconds before the first retry, doubled for each further attempt
+USERS_EMAIL_RETRY_BACKOFF_MAX = 60 * 60  # longest delay between retries
+USERS_EMAIL_SEND_TIMEOUT = 5 * 60  # seconds a claimed batch may take before another worker reclaims it
+USERS_DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']  # aliases safe reads are spread over
+USERS_DB_STICKY_SECONDS = 5  # after writing, a user's reads stay on the primary this long (must cover replica lag)
+USERS_DB_PRIMARY_MODELS = ['sessions.session', 'users.revokedtoken', 'users.tokenwatermark']  # always read from the primary
+USERS_SINGLE_PROCESS = DEBUG  # one process (runserver, tests): trust version keys in a per-process cache
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from users.views import me
+
+from config.schema import schema_view, swagger_view
+from users.views import (
+    TokenRevokeView, async_login, async_me, async_profile, async_register, me, metrics, profile,
+)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -9,15 +12,27 @@ urlpatterns = [
     # Djoser auth
     path("auth/", include("djoser.urls")),
     path("auth/", include("djoser.urls.jwt")),
+    path("auth/jwt/revoke/", TokenRevokeView.as_view(), name="jwt-revoke"),
+
+    # Async login/signup with password hashing off the event loop (ASGI)
+    path("auth/async/jwt/create/", async_login, name="async-jwt-create"),
+    path("auth/async/users/", async_register, name="async-user-create"),
 
-    # OpenAPI schema + Swagger UI (drf-spectacular)
-    path("schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "docs/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger-ui",
-    ),
+    # OpenAPI schema (precomputed, see config/schema.py) + Swagger UI (drf-spectacular, loaded on first hit)
+    path("schema/", schema_view, name="schema"),
+    path("docs/", swagger_view, name="swagger-ui"),
 
     # Test protected endpoint
     path("me/", me),
+    path("me/profile/", profile, name="profile"),
+
+    # Async /me/ and profile update using the async ORM (ASGI)
+    path("async/me/", async_me, name="async-me"),
+    path("async/me/profile/", async_profile, name="async-profile"),
+
+    # Users API
+    path("users/", include("users.urls")),
+
+    # Prometheus scrape endpoint (local addresses only)
+    path("metrics", metrics, name="metrics"),
 ]
\ No newline at end of file
@@ -1,8 +1,20 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.urls import reverse
 from django.utils.html import format_html
-from django.db.models import Q
-from .models import User
-from .utils import is_unitec_email, is_graduated_user
+from django.utils import timezone
+from .audit import acting_as
+from .bulk import run_bulk_action
+from .filters import (
+    EMAIL_DOMAIN_CHOICES,
+    GRADUATION_STATUS_CHOICES,
+    filter_email_domain,
+    filter_graduation_status,
+)
+from .models import AuditLogEntry, BulkActionJob, EmailDomainRule, OutboundEmail, User
+from .paginators import LargeTablePaginator
+from .revocation import revoke_user_tokens
+from .search import search_users
 
 
 class UnitecEmailFilter(admin.SimpleListFilter):
@@ -13,16 +25,11 @@ class UnitecEmailFilter(admin.SimpleListFilter):
     parameter_name = 'email_domain'
     
     def lookups(self, request, model_admin):
-        return (
-            ('unitec', 'Unitec Email'),
-            ('non_unitec', 'Non-Unitec Email'),
-        )
+        return EMAIL_DOMAIN_CHOICES
     
     def queryset(self, request, queryset):
-        if self.value() == 'unitec':
-            return queryset.filter(is_unitec_email=True)
-        if self.value() == 'non_unitec':
-            return queryset.filter(is_unitec_email=False)
+        if self.value():
+            return filter_email_domain(queryset, self.value())
 
 
 class GraduatedUserFilter(admin.SimpleListFilter):
@@ -33,32 +40,11 @@ class GraduatedUserFilter(admin.SimpleListFilter):
     parameter_name = 'graduation_status'
     
     def lookups(self, request, model_admin):
-        return (
-            ('graduated', 'Graduated (≤12m)'),
-            ('expired', 'Expired (>12m)'),
-            ('not_graduated', 'Not Graduated'),
-        )
+        return GRADUATION_STATUS_CHOICES
     
     def queryset(self, request, queryset):
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        today = timezone.now().date()
-        
-        if self.value() == 'graduated':
-            # Users graduated within 12 months
-            twelve_months_ago = today - timedelta(days=365)
-            return queryset.filter(
-                graduation_date__gte=twelve_months_ago,
-                graduation_date__lte=today
-            )
-        elif self.value() == 'expired':
-            # Users graduated more than 12 months ago
-            twelve_months_ago = today - timedelta(days=365)
-            return queryset.filter(graduation_date__lt=twelve_months_ago)
-        elif self.value() == 'not_graduated':
-            # Users without graduation date
-            return queryset.filter(graduation_date__isnull=True)
+        if self.value():
+            return filter_graduation_status(queryset, self.value())
 
 
 @admin.register(User)
@@ -81,8 +67,9 @@ class UserAdmin(admin.ModelAdmin):
         'created_at'
     ]
     
-    # Fields that can be used for searching
+    # Fields that can be used for searching (served by the index in users.search)
     search_fields = ['email', 'first_name', 'last_name', 'unitec_id']
+    search_help_text = 'Finds users whose name, email or Unitec id has a word starting with each search term.'
     
     # Filters for the right sidebar
     list_filter = [
@@ -117,14 +104,31 @@ class UserAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'is_unitec_email']
     
     # Actions for bulk operations
-    actions = ['approve_users', 'deny_users', 'extend_graduated_users']
+    actions = ['approve_users', 'deny_users', 'extend_graduated_users', 'export_users_csv', 'export_users_jsonl']
     
     # Items per page
     list_per_page = 25
     
+    # Avoid full COUNT(*) scans on large tables
+    paginator = LargeTablePaginator
+    show_full_result_count = getattr(settings, 'USERS_ADMIN_FULL_RESULT_COUNT', False)
+    
     # Ordering
     ordering = ['-created_at']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_graduation_status()
+    
+    def save_model(self, request, obj, form, change):
+        with acting_as(request.user, 'admin'):
+            super().save_model(request, obj, form, change)
+        if change and 'approval_status' in form.changed_data:
+            revoke_user_tokens([obj.pk])
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the user search index instead of LIKE '%term%' scans."""
+        return search_users(queryset, search_term), False
+    
     def approval_status_display(self, obj):
         """Display approval status with color coding."""
         colors = {
@@ -149,49 +153,158 @@ class UserAdmin(admin.ModelAdmin):
     
     def graduation_status(self, obj):
         """Display graduation status."""
-        if not obj.graduation_date:
+        state = obj.get_graduation_state()
+        if state == 'not_graduated':
             return 'N/A'
         
-        if is_graduated_user(obj.graduation_date):
+        if state == 'graduated':
             return format_html('🎓 Graduated (≤12m)')
         else:
             return format_html('⏰ Expired (>12m)')
     graduation_status.short_description = 'Graduation Status'
     
     # Bulk actions
-    def approve_users(self, request, queryset):
-        """Approve selected users."""
-        updated = queryset.update(approval_status='approved')
+    def _run_bulk_action(self, request, queryset, action, verb):
+        """Run a bulk action inline, or queue it as a background job for large selections."""
+        updated, job = run_bulk_action(action, queryset, requested_by=request.user)
+        if job is None:
+            self.message_user(
+                request,
+                f'Successfully {verb} {updated} user(s).'
+            )
+            return
+        url = reverse('admin:users_bulkactionjob_change', args=[job.pk])
         self.message_user(
-            request, 
-            f'Successfully approved {updated} user(s).'
+            request,
+            format_html(
+                '{} user(s) are being processed in the background. <a href="{}">Track progress</a>.',
+                job.total,
+                url,
+            ),
+            messages.INFO,
         )
+
+    def approve_users(self, request, queryset):
+        """Approve selected users."""
+        self._run_bulk_action(request, queryset, 'approve', 'approved')
     approve_users.short_description = "Approve selected users"
     
     def deny_users(self, request, queryset):
         """Deny selected users."""
-        updated = queryset.update(approval_status='denied')
-        self.message_user(
-            request, 
-            f'Successfully denied {updated} user(s).'
-        )
+        self._run_bulk_action(request, queryset, 'deny', 'denied')
     deny_users.short_description = "Deny selected users"
     
     def extend_graduated_users(self, request, queryset):
-        """Extend graduated users by updating their graduation date."""
-        from datetime import date
-        today = date.today()
-        updated = 0
-        
-        for user in queryset:
-            if user.graduation_date:
-                # Extend by 12 months from today
-                user.graduation_date = date(today.year + 1, today.month, today.day)
-                user.save()
-                updated += 1
-        
-        self.message_user(
-            request, 
-            f'Successfully extended {updated} graduated user(s).'
-        )
+        """Extend graduated users by 12 months from today."""
+        self._run_bulk_action(request, queryset, 'extend_graduation', 'extended')
     extend_graduated_users.short_description = "Extend graduated users (12 months)"
+    
+    # Exports
+    def export_users_csv(self, request, queryset):
+        """Download selected users as CSV."""
+        # Imported on use: the exporter pulls in the DRF serializers
+        from .export import export_response
+        return export_response(queryset, 'csv')
+    export_users_csv.short_description = "Export selected users (CSV)"
+    
+    def export_users_jsonl(self, request, queryset):
+        """Download selected users as JSON Lines."""
+        from .export import export_response
+        return export_response(queryset, 'jsonl')
+    export_users_jsonl.short_description = "Export selected users (JSONL)"
+
+
+@admin.register(BulkActionJob)
+class BulkActionJobAdmin(admin.ModelAdmin):
+    """
+    Read-only view of background bulk action jobs and their progress.
+    """
+
+    list_display = ['id', 'action', 'status', 'progress_display', 'updated', 'requested_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'action']
+    fields = ['action', 'status', 'progress_display', 'total', 'processed', 'updated', 'error',
+              'requested_by', 'created_at', 'started_at', 'heartbeat_at', 'finished_at']
+    readonly_fields = fields
+
+    def progress_display(self, obj):
+        """Display progress as a percentage."""
+        return f'{obj.progress}% ({obj.processed}/{obj.total})'
+    progress_display.short_description = 'Progress'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EmailDomainRule)
+class EmailDomainRuleAdmin(admin.ModelAdmin):
+    """
+    Email domain rules used to classify new users.
+    
+    Changing rules only affects users saved afterwards; run
+    ``manage.py reclassify_emails`` to apply them to existing users.
+    """
+    
+    list_display = ['pattern', 'is_unitec', 'auto_approve', 'is_active', 'created_at']
+    list_filter = ['is_unitec', 'auto_approve', 'is_active']
+    search_fields = ['pattern']
+
+
+@admin.register(AuditLogEntry)
+class AuditLogEntryAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the audit log.
+    """
+
+    list_display = ['created_at', 'user_id', 'field', 'old_value', 'new_value', 'actor_id', 'source']
+    # 'field' has choices; a 'source' filter would need a DISTINCT scan of the log
+    list_filter = ['field']
+    fields = list_display
+    readonly_fields = fields
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    """
+    Outbound email queue, delivered by ``manage.py send_queued_email``.
+    """
+
+    list_display = ['subject', 'recipients_display', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status']
+    fields = ['subject', 'from_email', 'to', 'cc', 'bcc', 'body', 'status', 'attempts', 'next_attempt_at',
+              'last_error', 'created_at', 'sent_at']
+    readonly_fields = fields
+    actions = ['retry_now']
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def recipients_display(self, obj):
+        return ', '.join(obj.to)
+    recipients_display.short_description = 'To'
+
+    def retry_now(self, request, queryset):
+        """Queue selected failed or waiting emails for immediate delivery."""
+        updated = queryset.filter(status__in=['queued', 'failed']).update(
+            status='queued', next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{updated} email(s) queued for delivery.')
+    retry_now.short_description = "Retry selected emails now"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
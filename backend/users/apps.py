@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401 (importing checks registers them)
+        from .instrumentation import install_query_timer
+
+        connection_created.connect(install_query_timer, dispatch_uid='users.install_query_timer')
@@ -0,0 +1,122 @@
+"""
+Append-only audit log of approval status, role and graduation date changes.
+
+Changes are collected in an ``AuditBuffer`` and written with ``bulk_create``
+every ``USERS_AUDIT_BATCH_SIZE`` entries and when the buffer is closed, so
+auditing a bulk action over tens of thousands of users costs a handful of
+INSERTs (SQLite caps a statement at 999 parameters, so there it is one
+INSERT per ~140 entries). A buffer holds entries for chunks that have
+already committed, so close it in a ``finally`` (or use it as a context
+manager) to keep them when a later chunk fails.
+
+Bulk code paths (``users.bulk``) record their changes explicitly. Single
+``User.save()`` calls are audited by a ``post_save`` receiver that compares
+the saved values with those the instance was loaded with; wrap the save in
+``acting_as()`` to record who made it and from where.
+"""
+
+import contextvars
+import datetime
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AuditLogEntry, User
+
+DEFAULT_BATCH_SIZE = 5000
+
+_actor = contextvars.ContextVar('users_audit_actor', default=(None, 'save'))
+
+
+def get_batch_size() -> int:
+    return getattr(settings, 'USERS_AUDIT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def _format(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+class AuditBuffer:
+    """
+    Collects audit entries and writes them in batches.
+
+    Args:
+        actor: User (or user id) making the changes, None for system changes
+        source (str): Where the changes come from, e.g. ``'admin_action'``
+        batch_size (int): Entries per flush (default from settings)
+    """
+
+    def __init__(self, actor=None, source='', batch_size: int = None):
+        self.actor_id = getattr(actor, 'pk', actor)
+        self.source = source
+        self.batch_size = batch_size or get_batch_size()
+        self.written = 0
+        self._entries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def record(self, user_id, field: str, old, new):
+        """Buffer one change; unchanged values are skipped."""
+        old, new = _format(old), _format(new)
+        if old == new:
+            return
+        self._entries.append(AuditLogEntry(
+            user_id=user_id,
+            actor_id=self.actor_id,
+            field=field,
+            old_value=old,
+            new_value=new,
+            source=self.source,
+            created_at=timezone.now(),
+        ))
+        if len(self._entries) >= self.batch_size:
+            self.flush()
+
+    def record_many(self, rows, field: str, new):
+        """Buffer the change of ``field`` to ``new`` for ``(user_id, old)`` rows."""
+        for user_id, old in rows:
+            self.record(user_id, field, old, new)
+
+    def flush(self):
+        """Write the buffered entries."""
+        if not self._entries:
+            return
+        AuditLogEntry.objects.bulk_create(self._entries)
+        self.written += len(self._entries)
+        self._entries = []
+
+
+@contextmanager
+def acting_as(actor, source: str):
+    """Attribute ``User.save()`` calls in the block to ``actor`` and ``source``."""
+    token = _actor.set((getattr(actor, 'pk', actor), source))
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+
+def audit_instance(user: User, update_fields=None):
+    """
+    Record the audited fields of ``user`` that changed since it was loaded.
+
+    Instances that were not loaded from the database (new users) are skipped.
+    """
+    loaded = getattr(user, '_loaded_values', None)
+    if not loaded:
+        return
+    actor_id, source = _actor.get()
+    buffer = AuditBuffer(actor_id, source)
+    for name in User.AUDITED_FIELDS:
+        if name in loaded and (update_fields is None or name in update_fields):
+            buffer.record(user.pk, name, loaded[name], getattr(user, name))
+    buffer.flush()
@@ -0,0 +1,227 @@
+"""
+JWT authentication backed by token claims and an in-process user cache.
+
+``ClaimsJWTAuthentication`` returns a ``UserSnapshot`` instead of loading the
+``User`` row on every request. Snapshots are kept in a bounded LRU and tagged
+with the user's cache version (see ``users.cache``), which is bumped whenever
+the row changes, so role and approval changes take effect on the next request.
+Snapshots of a recently bumped version are read from the primary database,
+which a read replica may still lag behind (see ``users.replicas``). With a
+per-process cache another worker's bump is invisible, so neither snapshots
+nor claims are trusted and every request reads the snapshot fields.
+
+Every JWT checked here, and every refresh token presented to the refresh and
+verify endpoints, is also checked against the revocations in ``users.revocation``.
+"""
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import LRUCache, aget_user_version, cache_is_shared, get_user_version
+from .models import User
+from .replicas import anote_user, db_for_version, note_user
+from .revocation import ais_revoked, is_revoked
+
+DEFAULT_SNAPSHOT_CACHE_SIZE = 10000
+
+# Fields copied into a snapshot when it has to be loaded from the database
+SNAPSHOT_FIELDS = ('id', 'role', 'approval_status', 'is_active', 'is_staff', 'is_superuser')
+
+# Claims added to access tokens by ClaimsTokenObtainPairSerializer
+CLAIM_FIELDS = ('role', 'approval_status', 'is_staff', 'is_superuser')
+VERSION_CLAIM = 'ver'
+
+
+class UserSnapshot:
+    """
+    Lightweight stand-in for ``User`` carrying the fields permission checks need.
+
+    Any other attribute loads the full row once, so views that need more than
+    the snapshot (or that save the user) keep working unchanged.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, role, approval_status, version, is_active=True, is_staff=False, is_superuser=False):
+        self.id = id
+        self.pk = id
+        self.role = role
+        self.approval_status = approval_status
+        self.version = version
+        self.is_active = is_active
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+
+    def __str__(self):
+        return f"UserSnapshot {self.id}"
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    @cached_property
+    def _user(self):
+        return User.objects.using(db_for_version(self.version)).get(pk=self.id)
+
+    def __getattr__(self, name):
+        # Only called for attributes the snapshot doesn't have
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._user, name)
+
+
+def get_snapshot_cache_size() -> int:
+    return getattr(settings, 'USERS_SNAPSHOT_CACHE_SIZE', DEFAULT_SNAPSHOT_CACHE_SIZE)
+
+
+snapshots = LRUCache(get_snapshot_cache_size())
+
+
+def load_snapshot(user_id, version):
+    """Read the snapshot fields from the database, or None if the user doesn't exist."""
+    row = User.objects.using(db_for_version(version)).filter(pk=user_id).values(*SNAPSHOT_FIELDS).first()
+    if row is None:
+        return None
+    row['version'] = version
+    return row
+
+
+async def aload_snapshot(user_id, version):
+    """Async ``load_snapshot`` using the async ORM."""
+    row = await User.objects.using(db_for_version(version)).filter(pk=user_id).values(*SNAPSHOT_FIELDS).afirst()
+    if row is None:
+        return None
+    row['version'] = version
+    return row
+
+
+def _revoked_token():
+    return InvalidToken({"detail": "Token has been revoked", "code": "token_revoked"})
+
+
+class RevocableRefreshToken(RefreshToken):
+    """
+    Refresh token that fails verification once revoked.
+    """
+
+    def verify(self):
+        super().verify()
+        if is_revoked(self.payload):
+            raise TokenError("Token has been revoked")
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that rejects revoked tokens.
+
+    Also tells the replica router (``users.replicas``) who the request is
+    from before the user's row is read.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token.payload):
+            raise _revoked_token()
+        note_user(validated_token.payload.get(api_settings.USER_ID_CLAIM))
+        return validated_token
+
+
+class ClaimsJWTAuthentication(RevocableJWTAuthentication):
+    """
+    JWT authentication that avoids the per-request ``User`` lookup.
+
+    Resolution order: a cached snapshot at the current version, then the
+    token's own claims if they were issued at the current version, and only
+    then the database. The LRU holds plain field dicts; every request gets
+    its own ``UserSnapshot`` so lazily loaded rows are never shared.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        version = get_user_version(user_id)
+        fields = self._cached_fields(validated_token, user_id, version)
+        if fields is None:
+            fields = self._store(user_id, load_snapshot(user_id, version))
+        return self._snapshot(fields)
+
+    async def aauthenticate(self, request):
+        """
+        Async ``authenticate`` for plain Django async views.
+
+        Token validation is pure CPU work; the version is read through the
+        cache's async API and only a snapshot miss touches the database,
+        through the async ORM.
+
+        Raises:
+            InvalidToken, AuthenticationFailed: As ``authenticate`` does
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # Skip the synchronous revocation check and run the async one instead
+        validated_token = JWTAuthentication.get_validated_token(self, raw_token)
+        if await ais_revoked(validated_token.payload):
+            raise _revoked_token()
+        await anote_user(validated_token.payload.get(api_settings.USER_ID_CLAIM))
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        version = await aget_user_version(user_id)
+        fields = self._cached_fields(validated_token, user_id, version)
+        if fields is None:
+            fields = self._store(user_id, await aload_snapshot(user_id, version))
+        return self._snapshot(fields)
+
+    def _user_id(self, validated_token) -> int:
+        try:
+            return int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidToken("Token contained no recognizable user identification") from e
+
+    def _cached_fields(self, validated_token, user_id, version):
+        """
+        Resolve the user at ``version`` from the LRU or the token's claims.
+
+        Returns:
+            dict: The snapshot fields, or None when the database has to be read
+        """
+        if not cache_is_shared():
+            return None
+        fields = snapshots.get(user_id)
+        if fields is None or fields['version'] != version:
+            fields = self._fields_from_claims(validated_token, user_id, version)
+            if fields is not None:
+                snapshots.set(user_id, fields)
+        return fields
+
+    def _store(self, user_id, fields):
+        if fields is None:
+            snapshots.pop(user_id)
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        snapshots.set(user_id, fields)
+        return fields
+
+    def _snapshot(self, fields):
+        if api_settings.CHECK_USER_IS_ACTIVE and not fields.get('is_active', True):
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return UserSnapshot(**fields)
+
+    def _fields_from_claims(self, validated_token, user_id, version):
+        if validated_token.get(VERSION_CLAIM) != version:
+            return None
+        if any(claim not in validated_token for claim in CLAIM_FIELDS):
+            return None
+        fields = {claim: validated_token[claim] for claim in CLAIM_FIELDS}
+        fields.update(id=user_id, version=version)
+        return fields
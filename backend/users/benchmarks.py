@@ -0,0 +1,257 @@
+"""
+Helpers shared by the benchmark management commands, and the endpoint
+benchmark suite run by ``bench_users`` and the query-count tests.
+"""
+
+import itertools
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Callable, NamedTuple
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import User
+from .stats import record_created
+from .utils import is_unitec_email, get_approval_status_by_email, graduation_expiry
+
+
+FIRST_NAMES = ['Aroha', 'Liam', 'Mere', 'Noah', 'Olivia', 'Tane', 'Ava', 'Wiremu', 'Isla', 'Jack']
+LAST_NAMES = ['Smith', 'Ngata', 'Williams', 'Brown', 'Parata', 'Wilson', 'Taylor', 'Walker']
+OTHER_DOMAINS = ['gmail.com', 'outlook.com', 'yahoo.co.nz', 'xtra.co.nz']
+
+
+def build_users(count: int, seed: int = 0, password: str = 'benchmark-pass'):
+    """
+    Yield unsaved, realistic User instances for bulk_create.
+
+    ``User.save()`` is bypassed by bulk_create, so the derived fields
+    (username, is_unitec_email, approval_status) are filled in here.
+
+    Args:
+        count (int): Number of users to build
+        seed (int): Random seed so runs are reproducible
+        password (str): Raw password, hashed once and shared by every row
+    """
+    rng = random.Random(seed)
+    password_hash = make_password(password)
+    now = timezone.now()
+    today = date.today()
+    roles = ['student'] * 85 + ['staff'] * 10 + ['admin'] * 5
+
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        unitec = rng.random() < 0.7
+        domain = 'myunitec.ac.nz' if unitec else rng.choice(OTHER_DOMAINS)
+        email = f"{first}.{last}.{seed}.{i}@{domain}".lower()
+
+        approval_status = get_approval_status_by_email(email)
+        if approval_status == 'pending':
+            approval_status = rng.choice(['pending', 'pending', 'approved', 'denied'])
+
+        graduation_date = None
+        if rng.random() < 0.3:
+            graduation_date = today - timedelta(days=rng.randint(-365, 730))
+
+        yield User(
+            email=email,
+            username=f"user_{uuid.uuid4().hex[:12]}",
+            password=password_hash,
+            first_name=first,
+            last_name=last,
+            role=rng.choice(roles),
+            unitec_id=f"{rng.randint(0, 9999999):07d}" if unitec else None,
+            year_group=str(rng.randint(1, 4)) if unitec else None,
+            graduation_date=graduation_date,
+            graduation_expires_on=graduation_expiry(graduation_date),
+            is_unitec_email=is_unitec_email(email),
+            approval_status=approval_status,
+            created_at=now - timedelta(seconds=rng.randint(0, 3 * 365 * 86400)),
+        )
+
+
+def seed_users(count: int, batch_size: int = 5000, seed: int = 0) -> int:
+    """
+    Insert ``count`` generated users in batches and return the number created.
+
+    ``created_at`` is ``auto_now_add`` so it is overwritten on insert; it is
+    restored afterwards with a bulk UPDATE so ordering and range filters see
+    realistic data.
+    """
+    created = 0
+    batch = []
+    for user in build_users(count, seed=seed):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            created += _insert_batch(batch)
+            batch = []
+    if batch:
+        created += _insert_batch(batch)
+    return created
+
+
+def _insert_batch(batch) -> int:
+    # auto_now_add overwrites created_at on insert, so restore it afterwards
+    created_at = [u.created_at for u in batch]
+    User.objects.bulk_create(batch, batch_size=len(batch))
+    record_created(batch)
+    if batch[0].pk is None:
+        by_email = dict(User.objects.filter(email__in=[u.email for u in batch]).values_list('email', 'id'))
+        for user in batch:
+            user.pk = by_email[user.email]
+    # One prepared UPDATE run with executemany; bulk_update's CASE expressions
+    # cost more than the inserts themselves
+    qn = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {qn(User._meta.db_table)} SET {qn('created_at')} = %s WHERE {qn('id')} = %s",
+            [(adapt(value), user.pk) for user, value in zip(batch, created_at)],
+        )
+    for user, value in zip(batch, created_at):
+        user.created_at = value
+    return len(batch)
+
+
+def time_call(fn, repeat: int = 5):
+    """
+    Call ``fn`` ``repeat`` times and return timing stats in milliseconds.
+    """
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'max_ms': round(max(samples), 3),
+    }, result
+
+
+# Endpoint benchmark suite
+
+BENCH_PASSWORD = 'bench-pass-123'
+
+
+class Scenario(NamedTuple):
+    """
+    One benchmarked request. ``max_queries`` is the steady-state SQL budget;
+    it must not depend on the number of users, so an N+1 shows up as a
+    budget overrun even on a small table.
+    """
+    name: str
+    max_queries: int
+    request: Callable
+    status: int = 200
+
+
+class BenchmarkContext:
+    """
+    Users and clients the scenarios run with. Create it inside a transaction
+    that is rolled back (or a TestCase) since it writes to the database.
+    """
+
+    def __init__(self):
+        self.admin = User.objects.create_superuser(
+            'bench-suite-admin@example.com', BENCH_PASSWORD, first_name='Bench', last_name='Admin',
+        )
+        self.member = User.objects.create_user(
+            'bench-suite-member@myunitec.ac.nz', BENCH_PASSWORD, first_name='Bench', last_name='Member',
+        )
+        self.admin_client = Client(SERVER_NAME='localhost')
+        self.admin_client.force_login(self.admin)
+        self.api_client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+        self.member_client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.member)}')
+        self.anonymous_client = Client(SERVER_NAME='localhost')
+        self.selected_ids = list(
+            User.objects.filter(approval_status='pending').order_by('pk').values_list('pk', flat=True)[:25]
+        )
+        self._signups = itertools.count()
+
+    def next_signup(self):
+        n = next(self._signups)
+        return {
+            'email': f'bench-suite-signup-{n}@myunitec.ac.nz',
+            'password': BENCH_PASSWORD,
+            're_password': BENCH_PASSWORD,
+            'first_name': 'Bench',
+            'last_name': 'Signup',
+        }
+
+
+def _admin_changelist(params):
+    return lambda ctx: ctx.admin_client.get('/admin/users/user/', params)
+
+
+def _admin_action(action):
+    return lambda ctx: ctx.admin_client.post('/admin/users/user/', {
+        'action': action, 'index': '0', '_selected_action': ctx.selected_ids,
+    })
+
+
+SCENARIOS = [
+    # The email uniqueness check, the user INSERT and the stat counter UPDATE
+    Scenario('signup', 3, lambda ctx: ctx.anonymous_client.post(
+        '/auth/users/', ctx.next_signup(), content_type='application/json'), status=201),
+    Scenario('login', 1, lambda ctx: ctx.anonymous_client.post(
+        '/auth/jwt/create/', {'email': ctx.member.email, 'password': BENCH_PASSWORD},
+        content_type='application/json')),
+    Scenario('me', 0, lambda ctx: ctx.member_client.get('/me/')),
+    Scenario('user list', 1, lambda ctx: ctx.api_client.get('/users/')),
+    Scenario('user list, pending', 1, lambda ctx: ctx.api_client.get('/users/', {'approval_status': 'pending'})),
+    Scenario('user search', 1, lambda ctx: ctx.api_client.get('/users/search/', {'q': 'smith'})),
+    Scenario('user stats', 1, lambda ctx: ctx.api_client.get('/users/stats/')),
+    Scenario('admin changelist', 4, _admin_changelist({})),
+    Scenario('admin filter approval_status', 4, _admin_changelist({'approval_status__exact': 'pending'})),
+    Scenario('admin filter role', 4, _admin_changelist({'role__exact': 'student'})),
+    Scenario('admin filter is_unitec_email', 4, _admin_changelist({'is_unitec_email__exact': '1'})),
+    Scenario('admin filter graduation_date', 4, _admin_changelist({'graduation_date__isnull': 'False'})),
+    Scenario('admin filter created_at', 4, _admin_changelist(
+        {'created_at__gte': (timezone.localtime() - timedelta(days=7)).isoformat()})),
+    Scenario('admin filter email_domain', 4, _admin_changelist({'email_domain': 'unitec'})),
+    Scenario('admin filter graduation_status', 4, _admin_changelist({'graduation_status': 'graduated'})),
+    Scenario('admin search', 4, _admin_changelist({'q': 'smith'})),
+    # Includes the token watermark upsert, the old-value SELECT, the stat
+    # counter UPDATE and the audit log INSERT
+    Scenario('bulk approve', 10, _admin_action('approve_users'), status=302),
+    Scenario('bulk deny', 10, _admin_action('deny_users'), status=302),
+]
+
+
+def run_scenario(ctx, scenario, repeat: int = 1):
+    """
+    Run ``scenario`` once to warm caches, then ``repeat`` timed times.
+
+    Returns:
+        dict: Timings, steady-state query count and the last response status
+    """
+    cache.clear()
+    scenario.request(ctx)
+    samples, queries, status = [], 0, None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = scenario.request(ctx)
+            samples.append((time.perf_counter() - start) * 1000)
+        queries = max(queries, len(captured))
+        status = response.status_code
+    return {
+        'scenario': scenario.name,
+        'queries': queries,
+        'max_queries': scenario.max_queries,
+        'status': status,
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'max_ms': round(max(samples), 3),
+    }
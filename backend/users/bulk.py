@@ -0,0 +1,421 @@
+"""
+Bulk operations on users for admin actions.
+
+Every change is expressed as set-based UPDATEs over chunks of primary keys,
+each chunk in its own short transaction so SQLite's write lock is released
+between chunks. Selections larger than ``USERS_BULK_BACKGROUND_THRESHOLD``
+are recorded as a ``BulkActionJob`` and processed in a background thread.
+A running job refreshes its heartbeat after every chunk; if its worker
+dies, ``manage.py run_bulk_jobs`` requeues it once the heartbeat is older
+than ``USERS_BULK_JOB_LEASE`` and resumes it after the last recorded chunk.
+
+Changing a user's approval status also revokes the tokens they hold, which
+carry the old status in their claims. Every change is recorded in the audit
+log through a buffer that is flushed in large batches (see ``users.audit``),
+and the user stat counters are adjusted in the same transaction as each
+UPDATE (see ``users.stats``).
+"""
+
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.utils import timezone
+
+from .audit import AuditBuffer
+from .cache import bump_user_versions
+from .models import BulkActionJob, User
+from .revocation import revoke_user_tokens
+from .stats import apply_deltas, record_transitions
+from .utils import GRADUATED_PERIOD_MONTHS, add_months, derive_email_fields, graduation_expiry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_BACKGROUND_THRESHOLD = 2000
+DEFAULT_JOB_LEASE = 5 * 60
+
+
+def get_chunk_size() -> int:
+    return getattr(settings, 'USERS_BULK_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def get_background_threshold() -> int:
+    return getattr(settings, 'USERS_BULK_BACKGROUND_THRESHOLD', DEFAULT_BACKGROUND_THRESHOLD)
+
+
+def get_job_lease() -> int:
+    return getattr(settings, 'USERS_BULK_JOB_LEASE', DEFAULT_JOB_LEASE)
+
+
+class LeaseLost(Exception):
+    """Raised in a job's worker once the job has been requeued and claimed elsewhere."""
+
+
+def _set_approval_status(ids, status, changes) -> int:
+    # Users already in ``status`` are left alone: no audit row, stat move or token revocation
+    users = User.objects.filter(pk__in=ids).exclude(approval_status=status)
+    rows = list(users.values_list('pk', 'approval_status'))
+    changes.extend((pk, 'approval_status', old, status) for pk, old in rows)
+    updated = users.update(approval_status=status)
+    record_transitions('approval_status', (old for _, old in rows), status)
+    return updated
+
+
+def _approve(ids, changes) -> int:
+    return _set_approval_status(ids, 'approved', changes)
+
+
+def _deny(ids, changes) -> int:
+    return _set_approval_status(ids, 'denied', changes)
+
+
+def _extend_graduation(ids, changes) -> int:
+    new_date = add_months(timezone.localdate(), GRADUATED_PERIOD_MONTHS)
+    new_expiry = graduation_expiry(new_date)
+    users = User.objects.filter(pk__in=ids, graduation_date__isnull=False)
+    rows = list(users.values_list('pk', 'graduation_date', 'graduation_expires_on'))
+    changes.extend((pk, 'graduation_date', old, new_date) for pk, old, _ in rows)
+    updated = users.update(
+        graduation_date=new_date,
+        graduation_expires_on=new_expiry,
+    )
+    record_transitions('graduation_expires_on', (old for _, _, old in rows), new_expiry)
+    return updated
+
+
+# Maps BulkActionJob.action to the set-based update applied to each chunk;
+# each appends ``(user_id, field, old, new)`` for the audit log to ``changes``
+# for the users it actually changed and adjusts the stat counters
+ACTIONS = {
+    'approve': _approve,
+    'deny': _deny,
+    'extend_graduation': _extend_graduation,
+}
+
+# Actions that change approval status and so revoke the users' tokens
+REVOKING_ACTIONS = {'approve', 'deny'}
+
+
+def chunked(items, size):
+    """Yield successive ``size``-length slices of ``items``."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def apply_action(action: str, ids, chunk_size: int = None, on_chunk=None, actor=None,
+                 source: str = 'admin_action') -> int:
+    """
+    Apply ``action`` to the users in ``ids`` chunk by chunk.
+
+    Args:
+        action (str): One of the keys of ``ACTIONS``
+        ids: Sequence of user primary keys
+        chunk_size (int): Primary keys per UPDATE (default from settings)
+        on_chunk: Optional callback ``(processed, updated)`` run after each chunk
+        actor: User (or id) recorded in the audit log as making the change
+        source (str): Source recorded in the audit log
+
+    Returns:
+        int: Number of rows updated
+    """
+    update = ACTIONS[action]
+    chunk_size = chunk_size or get_chunk_size()
+    total_updated = 0
+    with AuditBuffer(actor, source) as audit:
+        for chunk in chunked(list(ids), chunk_size):
+            changes = []
+            with transaction.atomic():
+                updated = update(chunk, changes)
+                changed_ids = [change[0] for change in changes]
+                if action in REVOKING_ACTIONS:
+                    revoke_user_tokens(changed_ids)
+            # queryset.update() skips post_save, so invalidate cached payloads here
+            bump_user_versions(changed_ids)
+            # Buffered only once the chunk has committed
+            for change in changes:
+                audit.record(*change)
+            total_updated += updated
+            if on_chunk:
+                on_chunk(len(chunk), updated)
+    return total_updated
+
+
+def run_bulk_action(action: str, queryset, requested_by=None):
+    """
+    Run ``action`` over ``queryset`` inline, or as a background job if the
+    selection is above the threshold.
+
+    Returns:
+        tuple: ``(updated, job)`` where ``updated`` is None when a job was queued
+    """
+    ids = list(queryset.order_by().values_list('pk', flat=True))
+    if len(ids) <= get_background_threshold():
+        return apply_action(action, ids, actor=requested_by), None
+
+    job = BulkActionJob.objects.create(
+        action=action,
+        user_ids=ids,
+        total=len(ids),
+        requested_by=requested_by,
+    )
+    transaction.on_commit(lambda: start_job(job.pk))
+    return None, job
+
+
+def start_job(job_id: int) -> threading.Thread:
+    """
+    Process a queued job in a daemon thread of the current (web) worker.
+
+    The thread dies with the worker, e.g. on a restart or deploy, leaving
+    the job 'running' with a stale heartbeat. ``manage.py run_bulk_jobs``
+    requeues it once ``USERS_BULK_JOB_LEASE`` has passed and resumes it
+    after the last recorded chunk, so run that command periodically.
+    """
+    thread = threading.Thread(target=_run_job_in_thread, args=(job_id,), daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_job_in_thread(job_id: int):
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def run_job(job_id: int) -> bool:
+    """
+    Process a queued job, recording progress and a heartbeat after every chunk.
+
+    A requeued job resumes after the chunks already recorded as processed;
+    the actions are idempotent, so a chunk applied but not yet recorded
+    when the worker died is simply applied again.
+
+    Returns:
+        bool: False if the job was already claimed by another worker
+    """
+    now = timezone.now()
+    claimed = BulkActionJob.objects.filter(pk=job_id, status='queued').update(
+        status='running', started_at=now, heartbeat_at=now,
+    )
+    if not claimed:
+        return False
+
+    job = BulkActionJob.objects.get(pk=job_id)
+    # Matches only while this claim holds; requeueing and reclaiming changes started_at
+    jobs = BulkActionJob.objects.filter(pk=job_id, status='running', started_at=now)
+
+    def record_progress(processed, updated):
+        if not jobs.update(
+            processed=F('processed') + processed, updated=F('updated') + updated, heartbeat_at=timezone.now(),
+        ):
+            raise LeaseLost()
+
+    try:
+        apply_action(
+            job.action, job.user_ids[job.processed:], on_chunk=record_progress, actor=job.requested_by_id,
+            source='bulk_job',
+        )
+    except LeaseLost:
+        logger.warning("Bulk action job %s was requeued while running; leaving it to its new worker", job_id)
+    except Exception as exc:
+        logger.exception("Bulk action job %s failed", job_id)
+        jobs.update(status='failed', error=str(exc), finished_at=timezone.now())
+    else:
+        jobs.update(status='done', finished_at=timezone.now())
+    return True
+
+
+def requeue_stale_jobs(now=None) -> int:
+    """
+    Requeue running jobs whose heartbeat is older than ``USERS_BULK_JOB_LEASE``
+    (their worker died or was restarted).
+
+    Returns:
+        int: Number of jobs requeued
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=get_job_lease())
+    return BulkActionJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff), status='running',
+    ).update(status='queued')
+
+
+def apply_approval_decisions(decisions: dict, expected_status: str = 'pending', actor=None) -> dict:
+    """
+    Apply a batch of approval decisions as one conditional UPDATE.
+
+    Args:
+        decisions (dict): Maps a target approval status to a list of user ids
+        expected_status (str): Only users currently in this status are changed
+        actor: User (or id) recorded in the audit log as deciding
+
+    Returns:
+        dict: Maps every requested id to ``(outcome, approval_status)``, where
+        outcome is ``'updated'``, ``'conflict'`` or ``'not_found'``
+    """
+    target_by_id = {
+        user_id: status
+        for status, user_ids in decisions.items()
+        for user_id in user_ids
+    }
+    ids = list(target_by_id)
+
+    with transaction.atomic():
+        current = dict(
+            User.objects.select_for_update()
+            .filter(pk__in=ids)
+            .values_list('pk', 'approval_status')
+        )
+        eligible = [user_id for user_id, status in current.items() if status == expected_status]
+        if eligible:
+            ids_by_status = {}
+            for user_id in eligible:
+                ids_by_status.setdefault(target_by_id[user_id], []).append(user_id)
+            new_status = Case(
+                *[When(pk__in=group, then=Value(status)) for status, group in ids_by_status.items()],
+                output_field=CharField(),
+            )
+            # The status predicate is the optimistic-concurrency check
+            User.objects.filter(pk__in=eligible, approval_status=expected_status).update(
+                approval_status=new_status
+            )
+            revoke_user_tokens(eligible)
+            deltas = Counter({('approval_status', expected_status): -len(eligible)})
+            for user_id in eligible:
+                deltas['approval_status', target_by_id[user_id]] += 1
+            apply_deltas(deltas)
+            with AuditBuffer(actor, 'approval_queue') as audit:
+                for user_id in eligible:
+                    audit.record(user_id, 'approval_status', expected_status, target_by_id[user_id])
+    if eligible:
+        bump_user_versions(eligible)
+
+    eligible = set(eligible)
+    results = {}
+    for user_id in ids:
+        if user_id not in current:
+            results[user_id] = ('not_found', None)
+        elif user_id in eligible:
+            results[user_id] = ('updated', target_by_id[user_id])
+        else:
+            results[user_id] = ('conflict', current[user_id])
+    return results
+
+
+def expired_graduates(today=None):
+    """Approved students whose graduated period has ended."""
+    if today is None:
+        today = timezone.localdate()
+    return User.objects.filter(
+        graduation_expires_on__lt=today,
+        role='student',
+        approval_status='approved',
+    )
+
+
+def sweep_expired_graduates(new_status: str, today=None, chunk_size: int = None, on_chunk=None) -> int:
+    """
+    Move expired graduates to ``new_status`` in chunked UPDATEs.
+
+    Each chunk re-selects from ``user_graduation_expires_on`` and locks the
+    rows before updating them, so rows changed concurrently are skipped
+    rather than overwritten and only the users actually moved are audited.
+    (SQLite ignores ``select_for_update``; its transactions take the write
+    lock when they begin.)
+
+    Returns:
+        int: Number of users moved
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    queryset = expired_graduates(today)
+    total = 0
+    with AuditBuffer(source='expire_graduates') as audit:
+        while True:
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                # The rows still expired once locked, so the UPDATE and the audit cover the same users
+                moved = list(queryset.filter(pk__in=ids).select_for_update().values_list('pk', flat=True))
+                updated = User.objects.filter(pk__in=moved).update(approval_status=new_status)
+                record_transitions('approval_status', ['approved'] * updated, new_status)
+                revoke_user_tokens(moved)
+            bump_user_versions(moved)
+            audit.record_many(((pk, 'approved') for pk in moved), 'approval_status', new_status)
+            total += updated
+            if on_chunk:
+                on_chunk(updated)
+            if len(ids) < chunk_size:
+                break
+    return total
+
+
+def reclassify_emails(chunk_size: int = None, on_chunk=None) -> dict:
+    """
+    Recompute ``is_unitec_email`` for every user from the current domain
+    rules, and approve pending users whose domain is now auto-approved.
+
+    Users are walked in primary-key order, one chunk at a time; each chunk
+    issues at most three conditional UPDATEs and only touches rows whose
+    values actually change. Approved or denied users are never demoted, and
+    graduates whose graduated period has ended are not re-approved (they
+    were moved out of 'approved' by ``sweep_expired_graduates``).
+
+    Returns:
+        dict: Counts of ``scanned``, ``unitec_changed`` and ``approved`` users
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    totals = {'scanned': 0, 'unitec_changed': 0, 'approved': 0}
+    last_pk = 0
+    today = timezone.localdate()
+    with AuditBuffer(source='reclassify_emails') as audit:
+        while True:
+            rows = list(
+                User.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'email', 'approval_status', 'graduation_expires_on')[:chunk_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            derived = derive_email_fields(email for _, email, _, _ in rows)
+            unitec_ids, other_ids, approve_ids = [], [], []
+            for pk, email, current_status, expires_on in rows:
+                is_unitec, approval_status = derived[email]
+                (unitec_ids if is_unitec else other_ids).append(pk)
+                expired = expires_on is not None and expires_on < today
+                if approval_status == 'approved' and current_status == 'pending' and not expired:
+                    approve_ids.append(pk)
+
+            with transaction.atomic():
+                to_unitec = User.objects.filter(pk__in=unitec_ids, is_unitec_email=False).update(is_unitec_email=True)
+                to_other = User.objects.filter(pk__in=other_ids, is_unitec_email=True).update(is_unitec_email=False)
+                # Only users still pending once locked are approved and audited
+                approve_ids = list(
+                    User.objects.filter(pk__in=approve_ids, approval_status='pending')
+                    .select_for_update().values_list('pk', flat=True)
+                )
+                approved = User.objects.filter(pk__in=approve_ids).update(approval_status='approved')
+                apply_deltas({
+                    ('email_domain', 'unitec'): to_unitec - to_other,
+                    ('email_domain', 'non_unitec'): to_other - to_unitec,
+                    ('approval_status', 'pending'): -approved,
+                    ('approval_status', 'approved'): approved,
+                })
+            changed = to_unitec + to_other
+            if changed or approved:
+                bump_user_versions([pk for pk, _, _, _ in rows])
+            audit.record_many(((pk, 'pending') for pk in approve_ids), 'approval_status', 'approved')
+
+            totals['scanned'] += len(rows)
+            totals['unitec_changed'] += changed
+            totals['approved'] += approved
+            if on_chunk:
+                on_chunk(totals)
+    return totals
@@ -0,0 +1,165 @@
+"""
+Per-user cache of the ``/me/`` payload.
+
+Each user has a version stamp in the cache, the time of the last change in
+nanoseconds. Cached payloads are keyed on ``(user id, version)``, so bumping
+the version on ``User.save()`` or a bulk update invalidates them without
+having to find and delete the old entries. The version also serves as the
+ETag and Last-Modified value for conditional requests.
+
+Version stamps only work when every process shares the cache. With a
+per-process cache in a multi-process deployment (``cache_is_shared()`` is
+False) a bump made by one worker is never seen by the others, so code that
+trusts a version falls back to the database instead.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+DEFAULT_TIMEOUT = 60 * 60
+
+# Cache backends that don't share their entries with other processes
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def cache_is_shared() -> bool:
+    """
+    Whether every process sees the default cache's entries: it is a shared
+    backend, or ``USERS_SINGLE_PROCESS`` says there is only one process.
+    """
+    if getattr(settings, 'USERS_SINGLE_PROCESS', False):
+        return True
+    return not isinstance(caches['default'], PROCESS_LOCAL_CACHES)
+
+
+def _version_key(user_id) -> str:
+    return f"users:version:{user_id}"
+
+
+def _payload_key(user_id, version) -> str:
+    return f"users:me:{user_id}:{version}"
+
+
+def get_timeout() -> int:
+    return getattr(settings, 'USERS_ME_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _new_version() -> int:
+    return time.time_ns()
+
+
+def get_user_version(user_id) -> int:
+    """
+    Return the current version stamp for a user, creating one if missing.
+    """
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = _new_version()
+        # add() so two concurrent readers agree on the same stamp
+        if not cache.add(_version_key(user_id), version, timeout=None):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+async def aget_user_version(user_id) -> int:
+    """Async ``get_user_version``, through the cache's async API."""
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        version = _new_version()
+        if not await cache.aadd(_version_key(user_id), version, timeout=None):
+            version = await cache.aget(_version_key(user_id), version)
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate the cached payload for one user."""
+    cache.set(_version_key(user_id), _new_version(), timeout=None)
+
+
+def bump_user_versions(user_ids):
+    """Invalidate the cached payloads for many users with one cache call."""
+    version = _new_version()
+    cache.set_many({_version_key(user_id): version for user_id in user_ids}, timeout=None)
+
+
+def build_me_payload(user) -> dict:
+    return {
+        "id": user.id,
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "role": user.role,
+        "unitec_id": user.unitec_id,
+        "year_group": user.year_group,
+        "approval_status": user.approval_status,
+        "is_unitec_email": user.is_unitec_email,
+    }
+
+
+def get_me_payload(user, version=None) -> dict:
+    """
+    Return the ``/me/`` payload for ``user``, from the cache when possible.
+    """
+    if version is None:
+        version = get_user_version(user.pk)
+    key = _payload_key(user.pk, version)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_me_payload(user)
+        cache.set(key, payload, timeout=get_timeout())
+    return payload
+
+
+async def aget_me_payload(user_id, version, load_user) -> dict:
+    """
+    Async ``get_me_payload``; ``load_user()`` is awaited for the row on a miss.
+    """
+    key = _payload_key(user_id, version)
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = build_me_payload(await load_user())
+        await cache.aset(key, payload, timeout=get_timeout())
+    return payload
+
+
+class LRUCache:
+    """
+    Small thread-safe, bounded in-process LRU mapping.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,31 @@
+"""
+System checks for the users app.
+"""
+
+from django.core.cache import caches
+from django.core.checks import Tags, Warning, register
+
+from .cache import cache_is_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The default cache holds the version keys other processes poll: user
+    version stamps (``users.cache``), domain rule and token revocation
+    versions (``users.domains``, ``users.revocation``) and the replica
+    stickiness pins. With a per-process cache, changes made in one worker
+    go unnoticed by the others: the app then stops trusting the versions
+    and reads the database on every request instead, and replica stickiness
+    only holds within a worker. Not raised when ``USERS_SINGLE_PROCESS`` is
+    set.
+    """
+    if cache_is_shared():
+        return []
+    return [Warning(
+        f"The default cache ({type(caches['default']).__name__}) is local to each process, so the "
+        "/me/ payload cache, JWT claim snapshots and revocation and domain rule versions are bypassed.",
+        hint="Set DJANGO_CACHE_URL to a Redis or Memcached server (see config/caches.py), or set "
+             "USERS_SINGLE_PROCESS = True if the site runs in one process.",
+        id='users.W001',
+    )]
@@ -0,0 +1,124 @@
+"""
+Email domain rule registry.
+
+Rules come from ``settings.USERS_UNITEC_EMAIL_DOMAINS`` and the
+``EmailDomainRule`` table. They are compiled into a ``DomainRuleSet`` that is
+cached per process and rebuilt when a rule changes: changes in this process
+clear it immediately, other processes notice a bumped version in the shared
+cache within ``USERS_DOMAIN_RULES_CHECK_INTERVAL`` seconds. With a
+per-process cache the rules are rebuilt at every check instead.
+"""
+
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from .cache import cache_is_shared
+
+VERSION_KEY = 'users:domain-rules:version'
+
+
+class DomainRule(NamedTuple):
+    pattern: str
+    is_unitec: bool
+    auto_approve: bool
+
+
+class DomainRuleSet:
+    """
+    Suffix-matching structure for domain rules.
+
+    Exact patterns and wildcard suffixes are kept in two dicts, so matching
+    costs one lookup per label of the domain. The most specific rule wins:
+    an exact match, then the longest wildcard suffix.
+    """
+
+    def __init__(self, rules):
+        self._exact = {}
+        self._wildcard = {}
+        for rule in rules:
+            if rule.pattern.startswith('*.'):
+                self._wildcard[rule.pattern[2:]] = rule
+            else:
+                self._exact[rule.pattern] = rule
+
+    def __len__(self):
+        return len(self._exact) + len(self._wildcard)
+
+    def match(self, domain: str) -> Optional[DomainRule]:
+        """Return the rule matching ``domain``, or None."""
+        domain = domain.lower().rstrip('.')
+        rule = self._exact.get(domain)
+        if rule is not None:
+            return rule
+        dot = domain.find('.')
+        while dot != -1:
+            rule = self._wildcard.get(domain[dot + 1:])
+            if rule is not None:
+                return rule
+            dot = domain.find('.', dot + 1)
+        return None
+
+
+def _settings_rules():
+    for pattern in getattr(settings, 'USERS_UNITEC_EMAIL_DOMAINS', ['myunitec.ac.nz']):
+        yield DomainRule(pattern.strip().lower(), True, True)
+
+
+def _database_rules():
+    from .models import EmailDomainRule
+
+    try:
+        # Savepoint so a missing table (before migrate) doesn't break the caller's transaction
+        with transaction.atomic():
+            rows = list(
+                EmailDomainRule.objects.filter(is_active=True)
+                .values_list('pattern', 'is_unitec', 'auto_approve')
+            )
+    except DatabaseError:
+        return []
+    return [DomainRule(*row) for row in rows]
+
+
+def build_rule_set() -> DomainRuleSet:
+    # Database rules come last so they override settings for the same pattern
+    rules = {rule.pattern: rule for rule in _settings_rules()}
+    rules.update((rule.pattern, rule) for rule in _database_rules())
+    return DomainRuleSet(rules.values())
+
+
+_state = {'rules': None, 'version': None, 'checked_at': 0.0}
+_lock = threading.Lock()
+
+
+def get_rule_set() -> DomainRuleSet:
+    """Return the compiled rules, rebuilding them if they changed."""
+    now = time.monotonic()
+    interval = getattr(settings, 'USERS_DOMAIN_RULES_CHECK_INTERVAL', 5)
+    if _state['rules'] is not None and now - _state['checked_at'] < interval:
+        return _state['rules']
+
+    with _lock:
+        version = cache.get(VERSION_KEY)
+        if _state['rules'] is None or version != _state['version'] or not cache_is_shared():
+            _state['rules'] = build_rule_set()
+            _state['version'] = version
+        _state['checked_at'] = now
+        return _state['rules']
+
+
+def invalidate_rules():
+    """Drop the compiled rules here and tell other processes to rebuild theirs."""
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    with _lock:
+        _state['rules'] = None
+
+
+def match_domain(domain: str) -> Optional[DomainRule]:
+    if not domain:
+        return None
+    return get_rule_set().match(domain)
@@ -0,0 +1,124 @@
+"""
+Streaming user export.
+
+Rows are read with ``values().iterator(chunk_size=...)`` and encoded chunk by
+chunk, so memory use stays constant however many users are exported and the
+first bytes can be sent before the query has finished. The output has the
+same fields as ``CustomUserSerializer``, derived fields included.
+"""
+
+import csv
+import datetime
+import io
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import User
+from .serializers import CustomUserSerializer
+
+EXPORT_FIELDS = CustomUserSerializer.Meta.fields
+
+# Derived fields are computed here rather than by the serializer
+DERIVED_FIELDS = ('approval_status_display', 'is_unitec_email_display', 'graduation_status')
+COLUMNS = tuple(f for f in EXPORT_FIELDS if f not in DERIVED_FIELDS)
+
+APPROVAL_STATUS_LABELS = dict(User.APPROVAL_STATUS_CHOICES)
+GRADUATION_STATUS_LABELS = dict(User.GRADUATION_STATUS_CHOICES)
+
+
+def get_chunk_size() -> int:
+    return getattr(settings, 'USERS_EXPORT_CHUNK_SIZE', 2000)
+
+
+def _format_value(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def export_rows(queryset, chunk_size: int = None):
+    """
+    Yield one dict per user, with keys in ``EXPORT_FIELDS`` order.
+
+    Args:
+        queryset: User queryset to export (filters and selections are kept)
+        chunk_size: Rows fetched from the database cursor at a time
+    """
+    rows = (
+        queryset.with_graduation_status()
+        .order_by('pk')
+        .values(*COLUMNS, 'graduation_state')
+        .iterator(chunk_size=chunk_size or get_chunk_size())
+    )
+    for row in rows:
+        derived = {
+            'approval_status_display': APPROVAL_STATUS_LABELS.get(row['approval_status'], row['approval_status']),
+            'is_unitec_email_display': "Unitec" if row['is_unitec_email'] else "Non-Unitec",
+            'graduation_status': GRADUATION_STATUS_LABELS[row['graduation_state']],
+        }
+        yield {
+            name: derived[name] if name in derived else _format_value(row[name])
+            for name in EXPORT_FIELDS
+        }
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_csv(rows, chunk_size: int = None):
+    """Encode rows as CSV, yielding the header and then one string per chunk."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for batch in _batched(rows, chunk_size or get_chunk_size()):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def iter_jsonl(rows, chunk_size: int = None):
+    """Encode rows as JSON Lines, yielding one string per chunk."""
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    for batch in _batched(rows, chunk_size or get_chunk_size()):
+        yield ''.join(encode(row) + '\n' for row in batch)
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (iter_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def iter_export(queryset, fmt: str, chunk_size: int = None):
+    """Yield the export of ``queryset`` in ``fmt`` ('csv' or 'jsonl') as strings."""
+    encoder, _ = FORMATS[fmt]
+    return encoder(export_rows(queryset, chunk_size), chunk_size)
+
+
+def export_response(queryset, fmt: str, filename: str = 'users') -> StreamingHttpResponse:
+    """
+    Stream the export of ``queryset`` as a file download.
+    """
+    _, content_type = FORMATS[fmt]
+    # Rows are read after the view returns, outside the request's replica
+    # routing (users.replicas), so choose the database now
+    queryset = queryset.using(queryset.db)
+    response = StreamingHttpResponse(iter_export(queryset, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,72 @@
+"""
+Filters for user listings, shared by the admin and the API, and for the
+audit log.
+"""
+
+import django_filters
+from django.utils import timezone
+
+from .models import AuditLogEntry, User
+
+EMAIL_DOMAIN_CHOICES = (
+    ('unitec', 'Unitec Email'),
+    ('non_unitec', 'Non-Unitec Email'),
+)
+
+GRADUATION_STATUS_CHOICES = User.GRADUATION_STATUS_CHOICES
+
+
+def filter_email_domain(queryset, value):
+    """Filter users by Unitec vs non-Unitec email."""
+    if value == 'unitec':
+        return queryset.filter(is_unitec_email=True)
+    if value == 'non_unitec':
+        return queryset.filter(is_unitec_email=False)
+    return queryset
+
+
+def filter_graduation_status(queryset, value):
+    """Filter users by graduation status, using the indexed expiry date."""
+    today = timezone.localdate()
+    if value == 'graduated':
+        return queryset.filter(graduation_expires_on__gte=today)
+    if value == 'expired':
+        return queryset.filter(graduation_expires_on__lt=today)
+    if value == 'not_graduated':
+        return queryset.filter(graduation_expires_on__isnull=True)
+    return queryset
+
+
+class UserFilter(django_filters.FilterSet):
+    """
+    API filters matching ``UserAdmin.list_filter``.
+    """
+
+    graduation_date = django_filters.DateFromToRangeFilter()
+    created_at = django_filters.IsoDateTimeFromToRangeFilter()
+    email_domain = django_filters.ChoiceFilter(
+        choices=EMAIL_DOMAIN_CHOICES,
+        method=lambda queryset, name, value: filter_email_domain(queryset, value),
+    )
+    graduation_status = django_filters.ChoiceFilter(
+        choices=GRADUATION_STATUS_CHOICES,
+        method=lambda queryset, name, value: filter_graduation_status(queryset, value),
+    )
+
+    class Meta:
+        model = User
+        fields = ['approval_status', 'role', 'is_unitec_email', 'graduation_date', 'created_at']
+
+
+class AuditLogFilter(django_filters.FilterSet):
+    """
+    Audit log filters; ``user``, ``actor`` and ``created_at`` each match an index.
+    """
+
+    user = django_filters.NumberFilter(field_name='user_id')
+    actor = django_filters.NumberFilter(field_name='actor_id')
+    created_at = django_filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = AuditLogEntry
+        fields = ['user', 'actor', 'field', 'source', 'created_at']
@@ -0,0 +1,83 @@
+"""
+Bounded executor for password hashing in async views.
+
+PBKDF2 runs in worker threads (hashlib releases the GIL while hashing), so
+the event loop stays free while passwords are hashed. The number of jobs
+running or waiting is capped; once the cap is reached new jobs are rejected
+immediately with ``HasherOverloaded`` instead of queueing without bound.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from .instrumentation import timed
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher, reporting hashing time to the request
+    instrumentation. Same algorithm name, so stored hashes are unchanged.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        with timed('hash'):
+            return super().encode(password, salt, iterations)
+
+
+class HasherOverloaded(Exception):
+    """Raised when the hashing executor has no free slot."""
+
+
+class BoundedHasher:
+    """
+    Thread pool with a cap on in-flight jobs (running plus queued).
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hasher')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    async def run(self, fn, *args):
+        """
+        Run ``fn(*args)`` on the pool and await the result.
+
+        Raises:
+            HasherOverloaded: If ``max_workers + max_queue`` jobs are already in flight
+        """
+        if not self._slots.acquire(blocking=False):
+            raise HasherOverloaded()
+        try:
+            # Run in the caller's context so hashing time reaches its request timings
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Release the slot when the job finishes, even if the caller was cancelled
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher() -> BoundedHasher:
+    """Return the process-wide hasher, created from settings on first use."""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                workers = getattr(settings, 'USERS_HASHER_WORKERS', None) or os.cpu_count() or 1
+                queue = getattr(settings, 'USERS_HASHER_QUEUE', None)
+                if queue is None:
+                    queue = workers * 4
+                _hasher = BoundedHasher(workers, queue)
+    return _hasher
@@ -0,0 +1,187 @@
+"""
+Per-request timing instrumentation.
+
+``ServerTimingMiddleware`` starts a ``RequestTimings`` for every request and
+stores it in a context variable, which follows the request into
+``sync_to_async`` threads and the password hasher pool. Instrumented code
+adds to it:
+
+- ``db``: every SQL query, through a wrapper installed on each new DB connection
+- ``hash``: password hashing and checking (``users.hashing`` hashers)
+- ``serialize``: DRF response rendering (``users.renderers``)
+
+At the end of the request the timings are sent as a ``Server-Timing`` header
+and folded into per-view histograms that ``/metrics`` serves in the
+Prometheus text format. The histograms are per process; scrape every worker
+or run a single one per host.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('users_request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Time spent per phase (seconds) and the number of SQL queries of one request.
+    """
+
+    __slots__ = ('started', 'db', 'queries', 'hash', 'serialize')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.hash = 0.0
+        self.serialize = 0.0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: float) -> str:
+        """Format the timings as a ``Server-Timing`` header value."""
+        parts = [f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"']
+        if self.hash:
+            parts.append(f'hash;dur={self.hash * 1000:.2f}')
+        if self.serialize:
+            parts.append(f'serialize;dur={self.serialize * 1000:.2f}')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+
+def start_request() -> tuple:
+    """Start timing a request; returns the timings and a token for ``end_request``."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    """Return the timings of the request being handled, or None."""
+    return _current.get()
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the time spent in the block to ``phase`` of the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timings, phase, getattr(timings, phase) + time.perf_counter() - started)
+
+
+def query_timer(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook counting and timing queries."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``query_timer`` to the connection."""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+# Prometheus metrics
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """
+    Labelled Prometheus histogram with fixed buckets.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: tuple, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple, value: float):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """Yield the exposition-format lines for this histogram."""
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = [(key, list(counts), count, total) for key, (counts, count, total) in self._series.items()]
+        for label_values, counts, count, total in sorted(series):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{labels},le="+Inf"}} {count}'
+            yield f'{self.name}_count{{{labels}}} {count}'
+            yield f'{self.name}_sum{{{labels}}} {total:.6f}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Request latency by view.', ('view', 'method', 'status'),
+)
+REQUEST_DB = Histogram('http_request_db_seconds', 'Time spent in SQL queries per request.', ('view',))
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL queries per request.', ('view',), buckets=QUERY_BUCKETS,
+)
+REQUEST_HASH = Histogram('http_request_hash_seconds', 'Time spent hashing passwords per request.', ('view',))
+REQUEST_SERIALIZE = Histogram('http_request_serialize_seconds', 'Time spent rendering responses per request.', ('view',))
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_DB, REQUEST_QUERIES, REQUEST_HASH, REQUEST_SERIALIZE)
+
+
+def record_request(view: str, method: str, status: int, timings: RequestTimings, total: float):
+    """Fold one request's timings into the histograms."""
+    REQUEST_DURATION.observe((view, method, str(status)), total)
+    REQUEST_DB.observe((view,), timings.db)
+    REQUEST_QUERIES.observe((view,), timings.queries)
+    REQUEST_HASH.observe((view,), timings.hash)
+    REQUEST_SERIALIZE.observe((view,), timings.serialize)
+
+
+def render_metrics() -> str:
+    """Return every histogram in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,204 @@
+"""
+Database-backed outbound email queue.
+
+``QueuedEmailBackend`` is the ``EMAIL_BACKEND``: sending a message (djoser's
+activation and password reset emails included) stores it as an
+``OutboundEmail`` row with a single INSERT, so requests never wait on the
+mail server. ``manage.py send_queued_email`` delivers the queue through
+``USERS_EMAIL_DELIVERY_BACKEND`` (SMTP in production, the console or file
+backend locally).
+
+The worker claims due messages in batches by moving them to ``sending`` and
+pushing ``next_attempt_at`` out by ``USERS_EMAIL_SEND_TIMEOUT``, which acts
+as a lease: if the worker dies, another one picks the batch up once the
+lease lapses. Each batch goes out over one connection. A failed message is
+retried with exponential backoff (``USERS_EMAIL_RETRY_BACKOFF`` doubling up
+to ``USERS_EMAIL_RETRY_BACKOFF_MAX``) until ``USERS_EMAIL_MAX_ATTEMPTS``,
+after which it is marked ``failed``. Delivery is at least once: messages
+sent by a worker that dies before recording them go out again.
+"""
+
+import base64
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection as db_connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_RETRY_BACKOFF = 30
+DEFAULT_RETRY_BACKOFF_MAX = 60 * 60
+DEFAULT_SEND_TIMEOUT = 5 * 60
+
+
+def get_batch_size() -> int:
+    return getattr(settings, 'USERS_EMAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def get_max_attempts() -> int:
+    return getattr(settings, 'USERS_EMAIL_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Delay before the next try after ``attempts`` failed ones."""
+    base = getattr(settings, 'USERS_EMAIL_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF)
+    cap = getattr(settings, 'USERS_EMAIL_RETRY_BACKOFF_MAX', DEFAULT_RETRY_BACKOFF_MAX)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def _attachment(attachment) -> list:
+    filename, content, mimetype = attachment
+    if content is None or not filename:
+        raise ValueError("Only file attachments (filename, content, mimetype) can be queued.")
+    if isinstance(content, str):
+        content = content.encode()
+    return [filename, base64.b64encode(content).decode('ascii'), mimetype]
+
+
+def to_row(message) -> OutboundEmail:
+    """Build an unsaved ``OutboundEmail`` from an ``EmailMessage``."""
+    return OutboundEmail(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(message.to),
+        cc=list(message.cc),
+        bcc=list(message.bcc),
+        reply_to=list(message.reply_to),
+        headers=dict(message.extra_headers),
+        alternatives=[[content, mimetype] for content, mimetype in getattr(message, 'alternatives', [])],
+        attachments=[_attachment(attachment) for attachment in message.attachments],
+    )
+
+
+def to_message(row: OutboundEmail, connection=None) -> EmailMultiAlternatives:
+    """Rebuild the ``EmailMessage`` stored in ``row``."""
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email,
+        to=row.to,
+        cc=row.cc,
+        bcc=row.bcc,
+        reply_to=row.reply_to,
+        headers=row.headers,
+        connection=connection,
+    )
+    for content, mimetype in row.alternatives:
+        message.attach_alternative(content, mimetype)
+    for filename, content, mimetype in row.attachments:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Email backend that stores messages in the outbound queue.
+    """
+
+    def send_messages(self, email_messages):
+        rows = [to_row(message) for message in email_messages if message.recipients()]
+        if not rows:
+            return 0
+        try:
+            if len(rows) == 1:
+                # A plain INSERT; bulk_create adds a transaction around it
+                rows[0].save(force_insert=True)
+            else:
+                OutboundEmail.objects.bulk_create(rows)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(rows)
+
+
+def claim_batch(batch_size: int = None) -> list:
+    """
+    Claim the next due messages for this worker.
+
+    Returns:
+        list: ``OutboundEmail`` rows now in ``sending``, oldest due first
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'USERS_EMAIL_SEND_TIMEOUT', DEFAULT_SEND_TIMEOUT))
+    due = OutboundEmail.objects.filter(status__in=['queued', 'sending'], next_attempt_at__lte=now)
+    with transaction.atomic():
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        rows = list(due.order_by('next_attempt_at', 'pk')[:batch_size or get_batch_size()])
+        if rows:
+            OutboundEmail.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status='sending', next_attempt_at=lease,
+            )
+    return rows
+
+
+def _record_failure(row, error: str, now):
+    attempts = row.attempts + 1
+    if attempts >= get_max_attempts():
+        logger.error("Giving up on email %s after %s attempts: %s", row.pk, attempts, error)
+        changes = {'status': 'failed'}
+    else:
+        changes = {'status': 'queued', 'next_attempt_at': now + retry_delay(attempts)}
+    # Only if this worker still holds the claim
+    OutboundEmail.objects.filter(pk=row.pk, status='sending').update(attempts=attempts, last_error=error, **changes)
+
+
+def send_batch(rows, backend: str = None) -> dict:
+    """
+    Deliver claimed rows over one connection and record the outcome.
+
+    Returns:
+        dict: Counts of ``sent`` and ``failed`` messages
+    """
+    connection = get_connection(
+        backend or getattr(settings, 'USERS_EMAIL_DELIVERY_BACKEND', DEFAULT_DELIVERY_BACKEND),
+        fail_silently=False,
+    )
+    sent, failed = [], 0
+    try:
+        connection.open()
+    except Exception as exc:
+        now = timezone.now()
+        for row in rows:
+            _record_failure(row, f"Cannot connect: {exc}", now)
+        return {'sent': 0, 'failed': len(rows)}
+    try:
+        for row in rows:
+            try:
+                connection.send_messages([to_message(row, connection)])
+            except Exception as exc:
+                failed += 1
+                _record_failure(row, f"{type(exc).__name__}: {exc}", timezone.now())
+                # A failed SMTP transaction can leave the connection unusable
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass
+            else:
+                sent.append(row.pk)
+    finally:
+        connection.close()
+    if sent:
+        OutboundEmail.objects.filter(pk__in=sent, status='sending').update(
+            status='sent', attempts=F('attempts') + 1, sent_at=timezone.now(),
+        )
+    return {'sent': len(sent), 'failed': failed}
+
+
+def purge_sent(older_than: timedelta) -> int:
+    """Delete sent messages older than ``older_than``; returns the number deleted."""
+    deleted, _ = OutboundEmail.objects.filter(status='sent', sent_at__lt=timezone.now() - older_than).delete()
+    return deleted
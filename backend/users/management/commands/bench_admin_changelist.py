@@ -0,0 +1,81 @@
+"""
+Benchmark UserAdmin changelist latency as the users table grows.
+
+For each table size the changelist is timed with Django's default paginator
+plus the full result count, and with LargeTablePaginator and no full count.
+Everything runs inside a transaction that is rolled back at the end.
+"""
+
+import json
+from unittest import mock
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.test import RequestFactory
+
+from users.benchmarks import seed_users, time_call
+from users.models import User
+from users.paginators import LargeTablePaginator
+
+SCENARIOS = [
+    ('page 1', {}),
+    ('page 200', {'p': '200'}),
+    ('pending, page 1', {'approval_status__exact': 'pending'}),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare UserAdmin changelist latency with exact and estimated counts at several table sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Table sizes to measure at')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per scenario')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        model_admin = admin.site._registry[User]
+        factory = RequestFactory()
+        results = []
+
+        with transaction.atomic():
+            superuser = User.objects.create_superuser('bench-admin@example.com', 'bench-pass')
+            seeded = 0
+            for size in sorted(options['sizes']):
+                self.stdout.write(f"Seeding up to {size} users...")
+                seed_users(size - seeded, seed=seeded)
+                seeded = size
+
+                for label, params in SCENARIOS:
+                    request = factory.get('/admin/users/user/', params)
+                    request.user = superuser
+                    for mode, paginator, full_count in (
+                        ('exact', Paginator, True),
+                        ('estimated', LargeTablePaginator, False),
+                    ):
+                        # Start each mode with a cold count cache
+                        cache.clear()
+                        with mock.patch.object(model_admin, 'paginator', paginator), \
+                                mock.patch.object(model_admin, 'show_full_result_count', full_count):
+                            def page():
+                                changelist = model_admin.get_changelist_instance(request)
+                                changelist.get_results(request)
+                                list(changelist.result_list)
+                                return changelist
+
+                            timings, _ = time_call(page, options['repeat'])
+                        results.append({'users': size, 'scenario': label, 'mode': mode, **timings})
+
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            self.stdout.write(
+                f"{row['users']:>8} users  {row['scenario']:16} {row['mode']:10} "
+                f"median {row['median_ms']} ms (min {row['min_ms']}, max {row['max_ms']})"
+            )
@@ -0,0 +1,79 @@
+"""
+Benchmark the UserAdmin changelist for each list_filter combination.
+
+Seeds a large user table inside a transaction that is rolled back at the
+end, then reports the EXPLAIN QUERY PLAN and latency of every filter.
+"""
+
+import json
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from users.benchmarks import seed_users, time_call
+from users.models import User
+
+
+# (label, querystring) pairs covering every entry in UserAdmin.list_filter
+FILTER_CASES = [
+    ('unfiltered', {}),
+    ('approval_status', {'approval_status__exact': 'pending'}),
+    ('role', {'role__exact': 'staff'}),
+    ('is_unitec_email', {'is_unitec_email__exact': '1'}),
+    ('graduation_date', {'graduation_date__isnull': 'False'}),
+    ('created_at', {'created_at__gte': '2025-01-01T00:00:00+13:00'}),
+    ('email_domain', {'email_domain': 'non_unitec'}),
+    ('graduation_status', {'graduation_status': 'graduated'}),
+    ('approval_status+role', {'approval_status__exact': 'pending', 'role__exact': 'student'}),
+]
+
+
+class Command(BaseCommand):
+    help = "Seed users and report EXPLAIN output and latency for each UserAdmin list_filter."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200000, help='Number of users to seed')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per filter')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        results = []
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['users']} users...")
+            seed_users(options['users'])
+            superuser = User.objects.create_superuser('bench-admin@example.com', 'bench-pass')
+            model_admin = admin.site._registry[User]
+            factory = RequestFactory()
+
+            for label, params in FILTER_CASES:
+                request = factory.get('/admin/users/user/', params)
+                request.user = superuser
+
+                def page():
+                    changelist = model_admin.get_changelist_instance(request)
+                    changelist.get_results(request)
+                    return changelist
+
+                timings, changelist = time_call(page, options['repeat'])
+                results.append({
+                    'filter': label,
+                    'params': params,
+                    'count': changelist.result_count,
+                    'plan': changelist.queryset.explain(),
+                    **timings,
+                })
+
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for row in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{row['filter']}: {row['count']} rows, "
+                f"median {row['median_ms']} ms (min {row['min_ms']}, max {row['max_ms']})"
+            ))
+            self.stdout.write(row['plan'])
@@ -0,0 +1,96 @@
+"""
+Concurrency benchmark for the sync and async /me/ and profile endpoints
+under the ASGI handler.
+
+Each endpoint is hit with many requests in flight at once (100 to 1000 by
+default) and the run reports throughput and latency per concurrency level.
+Sync views run through the ASGI handler's thread hop; the async views stay
+on the event loop except for database access.
+"""
+
+import asyncio
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from users.models import User
+from users.serializers import ClaimsTokenObtainPairSerializer
+
+EMAIL = 'bench-async-me@myunitec.ac.nz'
+
+ENDPOINTS = [
+    ('me', 'sync', 'get', '/me/'),
+    ('me', 'async', 'get', '/async/me/'),
+    ('profile', 'sync', 'patch', '/me/profile/'),
+    ('profile', 'async', 'patch', '/async/me/profile/'),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare sync-under-ASGI and async /me/ and profile updates at increasing concurrency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[100, 250, 500, 1000],
+                            help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and concurrency level')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        # Async views use their own DB connection, so the user must be committed
+        User.objects.filter(email=EMAIL).delete()
+        user = User.objects.create_user(EMAIL, 'bench-pass', first_name='Bench', last_name='Async')
+        token = str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+        results = []
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for concurrency in options['concurrency']:
+                    for name, mode, method, url in ENDPOINTS:
+                        row = asyncio.run(self._run(method, url, token, concurrency, options['requests']))
+                        results.append({'endpoint': name, 'mode': mode, 'concurrency': concurrency, **row})
+        finally:
+            User.objects.filter(email=EMAIL).delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            self.stdout.write(
+                f"{row['endpoint']:8} {row['mode']:5} c={row['concurrency']:<5} "
+                f"{row['requests_per_s']:8.1f} req/s  p50 {row['p50_ms']:8.1f} ms  "
+                f"p95 {row['p95_ms']:8.1f} ms  errors={row['errors']}"
+            )
+
+    async def _run(self, method, url, token, concurrency, total):
+        client = AsyncClient()
+        headers = {'Authorization': f'Bearer {token}'}
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], []
+
+        async def call(n):
+            async with semaphore:
+                started = time.perf_counter()
+                if method == 'get':
+                    response = await client.get(url, headers=headers)
+                else:
+                    response = await client.patch(
+                        url, {'year_group': str(n % 4 + 1)}, content_type='application/json', headers=headers,
+                    )
+                latencies.append(time.perf_counter() - started)
+                statuses.append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call(n) for n in range(total)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'requests': total,
+            'seconds': round(elapsed, 3),
+            'requests_per_s': round(total / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p95_ms': round(latencies[int(total * 0.95)] * 1000, 2),
+            'errors': sum(1 for status in statuses if status != 200),
+        }
@@ -0,0 +1,145 @@
+"""
+Concurrent write benchmark for the database profiles in config/databases.py.
+
+Worker threads mix signup-style single-row INSERTs with admin-style batch
+UPDATEs on a scratch table, each in its own transaction, and the run reports
+throughput, latency and "database is locked" failures per profile.
+
+SQLite profiles use a throwaway file. PostgreSQL runs only with
+``--postgres`` against the database described by the ``POSTGRES_*``
+environment variables (a local instance is fine); the scratch table is
+dropped afterwards.
+"""
+
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections, transaction
+
+from config.databases import postgres_profile, sqlite_profile
+
+TABLE = 'bench_db_writes'
+ALIAS = 'bench_db_writes'
+
+CREATE_TABLE = {
+    'sqlite': f"CREATE TABLE {TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+              f"email VARCHAR(254) NOT NULL UNIQUE, status VARCHAR(20) NOT NULL)",
+    'postgresql': f"CREATE TABLE {TABLE} (id BIGSERIAL PRIMARY KEY, "
+                  f"email VARCHAR(254) NOT NULL UNIQUE, status VARCHAR(20) NOT NULL)",
+}
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent write throughput for the SQLite (default and WAL) and PostgreSQL profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writers')
+        parser.add_argument('--ops', type=int, default=200, help='Transactions per writer')
+        parser.add_argument('--update-every', type=int, default=10,
+                            help='Every Nth transaction is a 100-row batch UPDATE instead of an INSERT')
+        parser.add_argument('--postgres', action='store_true',
+                            help='Also benchmark the postgres profile (POSTGRES_* environment variables)')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            profiles = [
+                ('sqlite-default', sqlite_profile(Path(tmp) / 'default.sqlite3', env={}, tuned=False)),
+                ('sqlite', sqlite_profile(Path(tmp) / 'wal.sqlite3', env={})),
+            ]
+            if options['postgres']:
+                profiles.append(('postgres', postgres_profile(os.environ)))
+            for name, database in profiles:
+                self.stdout.write(f"Benchmarking {name}...")
+                results.append({'profile': name, **self._run(database, options)})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            self.stdout.write(
+                f"{row['profile']:15} {row['tx_per_s']:8.1f} tx/s  "
+                f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  errors={row['errors']}"
+            )
+
+    def _run(self, database, options):
+        configured = connections.configure_settings({'default': database, ALIAS: database})
+        connections.settings[ALIAS] = configured[ALIAS]
+        connection = connections[ALIAS]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+                cursor.execute(CREATE_TABLE[connection.vendor])
+        except DatabaseError as exc:
+            del connections[ALIAS]
+            del connections.settings[ALIAS]
+            raise CommandError(f"Cannot prepare {database['ENGINE']} database: {exc}")
+        connection.close()
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker(n):
+            rng = random.Random(n)
+            local_latencies, local_errors = [], []
+            try:
+                for i in range(options['ops']):
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic(using=ALIAS), connections[ALIAS].cursor() as cursor:
+                            if i % options['update_every'] == options['update_every'] - 1:
+                                low = rng.randint(0, max(1, n * options['ops']))
+                                cursor.execute(
+                                    f"UPDATE {TABLE} SET status = %s WHERE id BETWEEN %s AND %s",
+                                    ['approved', low, low + 100],
+                                )
+                            else:
+                                cursor.execute(
+                                    f"INSERT INTO {TABLE} (email, status) VALUES (%s, %s)",
+                                    [f'bench-{n}-{i}@example.com', 'pending'],
+                                )
+                    except DatabaseError as exc:
+                        local_errors.append(str(exc))
+                        continue
+                    local_latencies.append(time.perf_counter() - started)
+            finally:
+                connections[ALIAS].close()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.extend(local_errors)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {TABLE}")
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+        del connections[ALIAS]
+        del connections.settings[ALIAS]
+
+        latencies.sort()
+        return {
+            'threads': options['threads'],
+            'transactions': len(latencies),
+            'seconds': round(elapsed, 3),
+            'tx_per_s': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+            'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+            'errors': len(errors),
+            'sample_error': errors[0] if errors else None,
+        }
@@ -0,0 +1,83 @@
+"""
+Throughput benchmark of ``import_users``.
+
+A synthetic JSONL roster is imported once without passwords and once with
+a password on every row, inside a transaction that is rolled back, so the
+difference is the cost of hashing. The password run is repeated for each
+``--hash-workers`` value to show how hashing scales with threads (up to the
+CPU count). Hashing takes around half a second per row, so keep ``--rows``
+small.
+"""
+
+import json
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.benchmarks import build_users
+
+
+class Command(BaseCommand):
+    help = "Measure import_users throughput for rosters with and without passwords."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200, help='Rows in the synthetic roster')
+        parser.add_argument('--batch-size', type=int, default=1000, help='import_users --batch-size')
+        parser.add_argument('--hash-workers', type=int, action='append',
+                            help='import_users --hash-workers for the password runs (repeatable; default: 1)')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        scenarios = [('no passwords', False, 1)] + [
+            (f'passwords, {workers} hash worker(s)', True, workers) for workers in options['hash_workers'] or [1]
+        ]
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, with_passwords, workers in scenarios:
+                path = Path(tmp) / f'roster-{with_passwords}.jsonl'
+                if not path.exists():
+                    self._write_roster(path, rows, with_passwords)
+                elapsed = self._import(path, options['batch_size'], workers)
+                results.append({
+                    'scenario': label,
+                    'rows': rows,
+                    'seconds': round(elapsed, 3),
+                    'rows_per_s': round(rows / elapsed, 1),
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            self.stdout.write(f"{row['scenario']:30} {row['seconds']:8.2f}s  {row['rows_per_s']:9.1f} rows/s")
+
+    def _write_roster(self, path, rows, with_passwords):
+        with open(path, 'w', encoding='utf-8') as f:
+            for n, user in enumerate(build_users(rows, seed=7)):
+                row = {
+                    'email': user.email,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name,
+                    'unitec_id': user.unitec_id,
+                    'year_group': user.year_group,
+                }
+                if with_passwords:
+                    row['password'] = f'Roster-pass-{n}'
+                f.write(json.dumps({key: value for key, value in row.items() if value is not None}) + '\n')
+
+    def _import(self, path, batch_size, workers):
+        with transaction.atomic():
+            started = time.perf_counter()
+            call_command(
+                'import_users', str(path), batch_size=batch_size, hash_workers=workers,
+                stdout=StringIO(), stderr=StringIO(),
+            )
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed
@@ -0,0 +1,73 @@
+"""
+Throughput benchmark for concurrent logins through the ASGI handler.
+
+Compares the sync /auth/jwt/create/ view with the async
+/auth/async/jwt/create/ view at a given concurrency.
+"""
+
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from users.models import User
+
+EMAIL = 'bench-login@myunitec.ac.nz'
+PASSWORD = 'bench-pass-123'
+
+
+class Command(BaseCommand):
+    help = "Measure login throughput for the sync and async login endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=64, help='Logins per endpoint')
+        parser.add_argument('--concurrency', type=int, default=16, help='Logins in flight at once')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        # Async views use their own DB connection, so the user must be committed
+        User.objects.filter(email=EMAIL).delete()
+        User.objects.create_user(EMAIL, PASSWORD, first_name='Bench', last_name='Login')
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = {
+                    'sync': asyncio.run(self._run('/auth/jwt/create/', options)),
+                    'async': asyncio.run(self._run('/auth/async/jwt/create/', options)),
+                }
+        finally:
+            User.objects.filter(email=EMAIL).delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:6} {row['logins_per_s']:8.1f} logins/s  "
+                f"ok={row['ok']} rejected={row['rejected']} errors={row['errors']}"
+            )
+
+    async def _run(self, url, options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        body = {'email': EMAIL, 'password': PASSWORD}
+
+        async def login():
+            async with semaphore:
+                response = await client.post(url, body, content_type='application/json')
+                return response.status_code
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(login() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        return {
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'seconds': round(elapsed, 3),
+            'logins_per_s': round(len(statuses) / elapsed, 1),
+            'ok': statuses.count(200),
+            'rejected': sum(1 for s in statuses if s in (429, 503)),
+            'errors': sum(1 for s in statuses if s not in (200, 429, 503)),
+        }
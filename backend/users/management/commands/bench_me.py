@@ -0,0 +1,52 @@
+"""
+Benchmark the /me/ endpoint: cold cache, warm cache and conditional hits.
+"""
+
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.benchmarks import time_call
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Compare cold, warm and conditional-hit (304) latency of /me/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200, help='Requests per scenario')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        results = {}
+        with transaction.atomic():
+            user = User.objects.create_user('bench-me@myunitec.ac.nz', 'bench-pass', first_name='Bench', last_name='User')
+            client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+            def cold():
+                cache.clear()
+                return client.get('/me/')
+
+            results['cold'], _ = time_call(cold, repeat)
+            results['warm'], response = time_call(lambda: client.get('/me/'), repeat)
+            etag = response['ETag']
+            results['conditional'], response = time_call(
+                lambda: client.get('/me/', HTTP_IF_NONE_MATCH=etag), repeat
+            )
+            assert response.status_code == 304, response.status_code
+
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for scenario, timings in results.items():
+            self.stdout.write(
+                f"{scenario:12} median {timings['median_ms']} ms "
+                f"(min {timings['min_ms']}, max {timings['max_ms']})"
+            )
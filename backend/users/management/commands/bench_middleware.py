@@ -0,0 +1,103 @@
+"""
+Microbenchmark of per-request middleware overhead.
+
+A trivial view is served through the request handler with the previous
+middleware list (every middleware listed twice) and with the current one,
+on an API path and on an admin path, so the difference is the cost of the
+middleware alone.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import path
+
+from users.benchmarks import time_call
+
+# MIDDLEWARE before duplicates were removed
+PREVIOUS_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+
+def empty_view(request):
+    return HttpResponse(b'{}', content_type='application/json')
+
+
+class BenchUrls:
+    urlpatterns = [
+        path('me/', empty_view),
+        path('admin/page/', empty_view),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Measure middleware overhead per request for the previous and the current middleware lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='Requests per timed run')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per scenario')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        # The instrumentation middleware is left out so only the stacks are compared
+        current = [m for m in settings.MIDDLEWARE if m != 'users.middleware.ServerTimingMiddleware']
+        scenarios = [
+            ('none', [], '/me/'),
+            ('previous, /me/', PREVIOUS_MIDDLEWARE, '/me/'),
+            ('previous, admin', PREVIOUS_MIDDLEWARE, '/admin/page/'),
+            ('current, /me/', current, '/me/'),
+            ('current, admin', current, '/admin/page/'),
+        ]
+        factory = RequestFactory(SERVER_NAME='localhost')
+        count = options['requests']
+        results = {}
+        for label, middleware, url in scenarios:
+            with override_settings(MIDDLEWARE=middleware, ROOT_URLCONF=BenchUrls):
+                handler = BaseHandler()
+                handler.load_middleware()
+                request = factory.get(url, HTTP_AUTHORIZATION='Bearer x')
+
+                def run():
+                    for _ in range(count):
+                        response = handler.get_response(request)
+                    return response
+
+                timings, response = time_call(run, options['repeat'])
+                assert response.status_code == 200, response.status_code
+            results[label] = {
+                'middleware': len(middleware),
+                'us_per_request': round(timings['median_ms'] * 1000 / count, 2),
+            }
+
+        baseline = results['none']['us_per_request']
+        for row in results.values():
+            row['overhead_us'] = round(row['us_per_request'] - baseline, 2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for label, row in results.items():
+            self.stdout.write(
+                f"{label:18} {row['middleware']:2} middleware  "
+                f"{row['us_per_request']:7.2f} us/request  (+{row['overhead_us']} us)"
+            )
+
@@ -0,0 +1,132 @@
+"""
+Read throughput of the primary alone versus reads spread over replicas.
+
+Worker processes run the user listing's first-page query (newest users,
+optionally filtered by approval status) for a fixed time, first all against
+``default`` and then spread over 1..N of the ``USERS_DB_REPLICAS`` aliases,
+the way ``PrimaryReplicaRouter`` spreads requests. ``--writer`` adds a
+process running batch UPDATEs on the primary throughout, as admin actions
+would. Processes rather than threads, so the GIL doesn't cap the scaling.
+Replica files on the same machine share its CPUs and disk, so locally this
+mostly measures routing and contention with the writer; reads scale with
+replicas that run on their own hosts.
+
+Locally, with two SQLite replica files::
+
+    export DJANGO_DB_REPLICAS=db.replica1.sqlite3,db.replica2.sqlite3
+    python manage.py seed_users 50000
+    python manage.py sync_replicas
+    python manage.py bench_replicas --writer
+"""
+
+import json
+import multiprocessing
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F
+
+from users.models import User
+from users.replicas import PRIMARY, get_replicas
+
+LIST_FIELDS = ('id', 'email', 'first_name', 'last_name', 'role', 'approval_status', 'created_at')
+STATUSES = [None, 'pending', 'approved', 'denied']
+
+
+def _read_loop(args):
+    alias, seconds, seed = args
+    # Connections inherited from the parent must not be shared
+    connections.close_all()
+    rng = random.Random(seed)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while True:
+        started = time.perf_counter()
+        if started >= deadline:
+            break
+        users = User.objects.using(alias).order_by('-created_at', '-id')
+        status = rng.choice(STATUSES)
+        if status:
+            users = users.filter(approval_status=status)
+        list(users.values(*LIST_FIELDS)[:50])
+        latencies.append(time.perf_counter() - started)
+    connections.close_all()
+    return latencies
+
+
+def _write_loop(seconds):
+    connections.close_all()
+    ids = list(User.objects.using(PRIMARY).values_list('pk', flat=True)[:5000])
+    writes = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline and ids:
+        batch = random.sample(ids, min(100, len(ids)))
+        # Rewrites the rows without changing them, so the data is left as it was
+        User.objects.using(PRIMARY).filter(pk__in=batch).update(last_login=F('last_login'))
+        writes += 1
+    connections.close_all()
+    return writes
+
+
+class Command(BaseCommand):
+    help = "Benchmark user-listing read throughput on the primary and spread over 1..N replicas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Reader processes')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each configuration')
+        parser.add_argument('--writer', action='store_true', help='Run batch UPDATEs on the primary meanwhile')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        replicas = get_replicas()
+        if not replicas:
+            raise CommandError("No replicas configured; set DJANGO_DB_REPLICAS (and run sync_replicas).")
+        for alias in [PRIMARY, *replicas]:
+            if not User.objects.using(alias).exists():
+                raise CommandError(f"No users on '{alias}'; seed the primary and run sync_replicas first.")
+        connections.close_all()
+
+        configurations = [('primary', [PRIMARY])] + [
+            (f'{n} replica(s)', replicas[:n]) for n in range(1, len(replicas) + 1)
+        ]
+        results = []
+        for name, aliases in configurations:
+            self.stdout.write(f"Benchmarking {name}...")
+            results.append({'config': name, 'aliases': aliases, **self._run(aliases, options)})
+        baseline = results[0]['reads_per_s'] or 1
+        for row in results:
+            row['speedup'] = round(row['reads_per_s'] / baseline, 2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            writes = f"  writes {row['writes_per_s']:.1f}/s" if options['writer'] else ''
+            self.stdout.write(
+                f"{row['config']:15} {row['reads_per_s']:9.1f} reads/s  x{row['speedup']:<5}"
+                f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms{writes}"
+            )
+
+    def _run(self, aliases, options):
+        ctx = multiprocessing.get_context('fork')
+        seconds = options['seconds']
+        jobs = [(aliases[n % len(aliases)], seconds, n) for n in range(options['workers'])]
+        with ctx.Pool(options['workers'] + (1 if options['writer'] else 0)) as pool:
+            writer = pool.apply_async(_write_loop, (seconds,)) if options['writer'] else None
+            started = time.perf_counter()
+            per_worker = pool.map(_read_loop, jobs)
+            elapsed = time.perf_counter() - started
+            writes = writer.get() if writer else 0
+
+        latencies = sorted(latency for worker in per_worker for latency in worker)
+        return {
+            'workers': options['workers'],
+            'reads': len(latencies),
+            'reads_per_s': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+            'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+            'writes_per_s': round(writes / elapsed, 1),
+        }
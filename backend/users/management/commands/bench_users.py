@@ -0,0 +1,81 @@
+"""
+Endpoint benchmark suite for the users app.
+
+Seeds users, then times signup, login, /me/, the user listing and search,
+the admin changelist with each filter, and bulk actions, checking each
+scenario's SQL query budget. Everything runs inside a transaction that is
+rolled back at the end.
+
+Results can be saved with ``--output`` and compared with a previous run
+with ``--baseline``.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from users.benchmarks import SCENARIOS, BenchmarkContext, run_scenario, seed_users
+
+
+class Command(BaseCommand):
+    help = "Time the users app endpoints and check their SQL query budgets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Users to seed before measuring')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per scenario')
+        parser.add_argument('--scenario', action='append', help='Only run scenarios with this name (repeatable)')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--baseline', help='Compare medians with a JSON file from a previous --output')
+        parser.add_argument('--tolerance', type=float, default=20.0,
+                            help='Percent slowdown against the baseline reported as a regression')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        scenarios = [s for s in SCENARIOS if not options['scenario'] or s.name in options['scenario']]
+        if not scenarios:
+            raise CommandError('No matching scenarios')
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+            self.stdout.write(f"Seeding {options['users']} users...")
+            seed_users(options['users'], seed=0)
+            ctx = BenchmarkContext()
+            results = [run_scenario(ctx, scenario, options['repeat']) for scenario in scenarios]
+            transaction.set_rollback(True)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'users': options['users'], 'repeat': options['repeat'], 'results': results}, f, indent=2)
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = {row['scenario']: row for row in json.load(f)['results']}
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for row in results:
+                line = (
+                    f"{row['scenario']:32} median {row['median_ms']:9.3f} ms  "
+                    f"queries {row['queries']}/{row['max_queries']}"
+                )
+                previous = baseline.get(row['scenario'])
+                if previous:
+                    change = (row['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100
+                    line += f"  {change:+6.1f}% vs baseline"
+                    if change > options['tolerance']:
+                        line += '  REGRESSION'
+                self.stdout.write(line)
+
+        failures = [
+            f"{row['scenario']}: {row['queries']} queries (budget {row['max_queries']})"
+            for row in results if row['queries'] > row['max_queries']
+        ] + [
+            f"{row['scenario']}: HTTP {row['status']} (expected {scenario.status})"
+            for row, scenario in zip(results, scenarios) if row['status'] != scenario.status
+        ]
+        if failures:
+            raise CommandError('Benchmark checks failed:\n  ' + '\n  '.join(failures))
@@ -0,0 +1,42 @@
+"""
+Move graduates whose 12-month graduated period has ended.
+
+Intended to run daily from cron or a scheduler, e.g.
+``0 2 * * * python manage.py expire_graduates``.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk import expired_graduates, sweep_expired_graduates
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Move approved students whose graduated period has expired to another approval status, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--status',
+            default=getattr(settings, 'USERS_GRADUATION_EXPIRED_STATUS', 'pending'),
+            help='Approval status to move expired graduates to',
+        )
+        parser.add_argument('--batch-size', type=int, help='Users per UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many users would move')
+
+    def handle(self, *args, **options):
+        status = options['status']
+        if status not in dict(User.APPROVAL_STATUS_CHOICES) or status == 'approved':
+            raise CommandError(f"Invalid target status: {status}")
+
+        if options['dry_run']:
+            count = expired_graduates().count()
+            self.stdout.write(f"{count} expired graduate(s) would be moved to '{status}'.")
+            return
+
+        moved = sweep_expired_graduates(
+            status,
+            chunk_size=options['batch_size'],
+            on_chunk=lambda n: self.stdout.write(f"  moved {n} user(s)"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} expired graduate(s) to '{status}'."))
@@ -0,0 +1,217 @@
+"""
+Bulk import users from a CSV or JSONL roster export.
+
+Rows are streamed from the file, validated with the signup serializer rules
+and inserted in chunks with ``bulk_create``, so memory use only depends on
+the chunk size, not on the size of the file.
+
+Rows without a password get an unusable one (the user sets it through a
+password reset). Hashing a password is deliberately slow, around half a
+second of CPU per row with Django's PBKDF2 iterations, so a roster with
+passwords is bound by hashing: each batch's passwords are hashed on a pool of
+``--hash-workers`` threads (hashlib releases the GIL), which scales with the
+CPU count only. ``--skip-passwords`` ignores the password column instead,
+and ``--dry-run`` never hashes. ``manage.py bench_import`` measures both
+kinds of roster.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from users.models import User
+from users.serializers import UserImportSerializer
+from users.stats import record_created
+from users.utils import derive_email_fields, graduation_expiry
+
+
+class Command(BaseCommand):
+    help = "Stream users from a CSV/JSONL file and insert them in chunked bulk_create batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file to import ('-' for stdin)")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate rows without inserting them')
+        parser.add_argument('--skip-passwords', action='store_true',
+                            help='Ignore the password column; users set a password through a reset')
+        parser.add_argument('--hash-workers', type=int,
+                            help='Threads hashing passwords (default: USERS_HASHER_WORKERS or the CPU count)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        hash_workers = (
+            options['hash_workers'] or getattr(settings, 'USERS_HASHER_WORKERS', None) or os.cpu_count() or 1
+        )
+        if hash_workers < 1:
+            raise CommandError('--hash-workers must be at least 1')
+
+        self.dry_run = options['dry_run']
+        self.skip_passwords = options['skip_passwords']
+        # One serializer instance is reused for every row, the same way a
+        # ListSerializer reuses its child, so the fields are only built once.
+        self.validator = UserImportSerializer()
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        started = time.perf_counter()
+
+        handle = sys.stdin if path == '-' else self._open(path)
+        self.hash_pool = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix='import-hasher')
+        try:
+            batch = []
+            for line_no, row in self._read_rows(handle, fmt):
+                batch.append((line_no, row))
+                if len(batch) >= batch_size:
+                    self._process_batch(batch)
+                    self._write_errors()
+                    batch = []
+            if batch:
+                self._process_batch(batch)
+        finally:
+            self.hash_pool.shutdown(cancel_futures=True)
+            if handle is not sys.stdin:
+                handle.close()
+        self._write_errors()
+
+        elapsed = time.perf_counter() - started
+        total = self.created + self.failed
+        rate = total / elapsed if elapsed else 0.0
+        verb = 'validated' if self.dry_run else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb.capitalize()} {self.created} user(s), {self.failed} error(s) "
+            f"in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        ))
+
+    def _open(self, path):
+        try:
+            return open(path, newline='', encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f"Cannot open {path}: {exc}")
+
+    def _read_rows(self, handle, fmt):
+        """Yield ``(line_no, row_dict)`` pairs without loading the file into memory."""
+        if fmt == 'csv':
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, {k: v for k, v in row.items() if k and v not in (None, '')}
+            return
+
+        for line_no, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                self._report(line_no, {'non_field_errors': [f'Invalid JSON: {exc}']})
+                continue
+            if not isinstance(row, dict):
+                self._report(line_no, {'non_field_errors': ['Expected a JSON object.']})
+                continue
+            yield line_no, row
+
+    def _process_batch(self, batch):
+        valid = []
+        for line_no, row in batch:
+            try:
+                data = dict(self.validator.run_validation(row))
+            except serializers.ValidationError as exc:
+                self._report(line_no, exc.detail)
+                continue
+            data['email'] = User.objects.normalize_email(data['email'])
+            valid.append((line_no, data))
+
+        valid = self._drop_duplicates(valid)
+        if not valid:
+            return
+
+        derived = derive_email_fields(data['email'] for _, data in valid)
+        passwords = self._hash_passwords([data.pop('password', None) for _, data in valid])
+        users = []
+        for (line_no, data), password in zip(valid, passwords):
+            is_unitec, approval_status = derived[data['email']]
+            users.append((line_no, User(
+                username=f"user_{uuid.uuid4().hex[:8]}",
+                password=password,
+                is_unitec_email=is_unitec,
+                approval_status=approval_status,
+                role='student',
+                graduation_expires_on=graduation_expiry(data.get('graduation_date')),
+                **data,
+            )))
+
+        if self.dry_run:
+            self.created += len(users)
+            return
+        self._insert(users)
+
+    def _hash_passwords(self, passwords):
+        """Hash a batch's passwords on the pool, in order; missing ones become unusable."""
+        if self.dry_run or self.skip_passwords:
+            return [make_password(None) for _ in passwords]
+        return list(self.hash_pool.map(lambda password: make_password(password or None), passwords))
+
+    def _drop_duplicates(self, valid):
+        """Reject rows whose email is already taken, in the table or earlier in the batch."""
+        emails = [data['email'] for _, data in valid]
+        existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        unique = []
+        for line_no, data in valid:
+            if data['email'] in existing:
+                self._report(line_no, {'email': ['user with this email already exists.']})
+                continue
+            existing.add(data['email'])
+            unique.append((line_no, data))
+        return unique
+
+    def _insert(self, users):
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user for _, user in users])
+                # bulk_create skips post_save, so count the new users here
+                record_created(user for _, user in users)
+            self.created += len(users)
+            return
+        except IntegrityError:
+            pass
+
+        # Something in the chunk conflicted (e.g. a concurrent signup); fall
+        # back to row-by-row inserts so only the offending rows are rejected.
+        for line_no, user in users:
+            try:
+                with transaction.atomic():
+                    user.pk = None
+                    user.save(force_insert=True)
+                self.created += 1
+            except IntegrityError as exc:
+                self._report(line_no, {'non_field_errors': [str(exc)]})
+
+    def _report(self, line_no, errors):
+        self.failed += 1
+        self.errors.append((line_no, errors))
+
+    def _write_errors(self):
+        """
+        Write the errors reported so far in line order.
+
+        Called after each batch: rows are read in order, so every error still
+        to come is on a later line than those written.
+        """
+        for line_no, errors in sorted(self.errors, key=lambda error: error[0]):
+            self.stderr.write(f"line {line_no}: {json.dumps(errors, default=str)}")
+        self.errors = []
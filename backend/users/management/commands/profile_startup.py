@@ -0,0 +1,81 @@
+"""
+Report where process startup time goes.
+
+The project is booted in fresh interpreters (see users/startup.py); the
+command prints the best time of each phase, the packages and modules that
+cost the most to import per phase, and whether subsystems meant to load on
+first use (schema generation, Swagger UI) were imported anyway. With
+``--check`` it fails when startup exceeds ``USERS_STARTUP_BUDGET_MS``; run
+that on a quiet machine (CI), as timings on a loaded one are noisy.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.startup import DEFERRED_MODULES, PHASES, measure_startup
+
+
+class Command(BaseCommand):
+    help = "Profile settings import, django.setup() and URLconf loading with per-module import costs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Process starts; the fastest is reported')
+        parser.add_argument('--top', type=int, default=15, help='Packages and modules listed per phase')
+        parser.add_argument('--no-urls', action='store_true', help='Stop after django.setup()')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+        parser.add_argument('--check', action='store_true', help='Exit non-zero if over USERS_STARTUP_BUDGET_MS')
+
+    def handle(self, *args, **options):
+        runs = [measure_startup(include_urls=not options['no_urls']) for _ in range(max(1, options['repeat']))]
+        profile = min(runs, key=lambda run: run.total_ms)
+        budget = getattr(settings, 'USERS_STARTUP_BUDGET_MS', None)
+        top = options['top']
+        phases = [phase for phase in PHASES if phase in profile.timings]
+
+        packages = profile.by_package()
+        result = {
+            'total_ms': round(profile.total_ms, 1),
+            'budget_ms': budget,
+            'phases': {phase: round(profile.timings[phase], 1) for phase in phases},
+            'deferred_loaded': {phase: profile.loaded[phase] for phase in phases},
+            'packages': {
+                phase: [(name, round(ms, 1)) for name, p, ms in packages if p == phase][:top]
+                for phase in phases
+            },
+            'modules': {
+                phase: [
+                    (m.name, round(m.cumulative_ms, 1), round(m.self_ms, 1))
+                    for m in sorted(profile.modules, key=lambda m: -m.cumulative_ms) if m.phase == phase
+                ][:top]
+                for phase in phases
+            },
+        }
+        over_budget = budget is not None and profile.total_ms > budget
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+        else:
+            self._report(result, profile, phases, len(runs))
+        if options['check'] and over_budget:
+            raise CommandError(f"Startup took {result['total_ms']} ms, over USERS_STARTUP_BUDGET_MS ({budget} ms)")
+
+    def _report(self, result, profile, phases, runs):
+        budget = result['budget_ms']
+        self.stdout.write(f"Startup: {result['total_ms']} ms (best of {runs} under -X importtime, budget {budget} ms)")
+        for phase in phases:
+            self.stdout.write(f"\n{phase}: {result['phases'][phase]} ms")
+            self.stdout.write("  self time by package:")
+            for name, ms in result['packages'][phase]:
+                self.stdout.write(f"    {ms:8.1f} ms  {name}")
+            self.stdout.write("  cumulative time by module:")
+            for name, cumulative, self_ms in result['modules'][phase]:
+                self.stdout.write(f"    {cumulative:8.1f} ms  (self {self_ms:6.1f})  {name}")
+
+        loaded = profile.loaded[phases[-1]]
+        if loaded:
+            self.stdout.write(self.style.WARNING(f"\nLoaded at startup although deferred: {', '.join(loaded)}"))
+        else:
+            self.stdout.write(f"\nDeferred until first use: {', '.join(DEFERRED_MODULES)}")
+        if budget is not None and profile.total_ms > budget:
+            self.stdout.write(self.style.ERROR(f"Startup exceeds USERS_STARTUP_BUDGET_MS ({budget} ms)"))
@@ -0,0 +1,24 @@
+"""
+Delete token revocations whose tokens have all expired.
+
+Intended to run daily from cron or a scheduler, e.g.
+``30 2 * * * python manage.py purge_revoked_tokens``.
+"""
+
+from django.core.management.base import BaseCommand
+
+from users.revocation import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired revoked-token and token-watermark rows, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Rows per DELETE')
+
+    def handle(self, *args, **options):
+        purged = purge_expired(
+            batch_size=options['batch_size'],
+            on_batch=lambda model, n: self.stdout.write(f"  deleted {n} {model._meta.verbose_name_plural.lower()}"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired revocation(s)."))
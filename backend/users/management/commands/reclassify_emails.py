@@ -0,0 +1,30 @@
+"""
+Re-apply the email domain rules to existing users.
+"""
+
+from django.core.management.base import BaseCommand
+
+from users.bulk import reclassify_emails
+from users.domains import invalidate_rules
+
+
+class Command(BaseCommand):
+    help = "Recompute is_unitec_email (and auto-approve pending users) across the users table in chunked UPDATEs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Users per chunk')
+
+    def handle(self, *args, **options):
+        # Make sure this run sees the latest rules
+        invalidate_rules()
+        verbosity = options['verbosity']
+
+        def report(totals):
+            if verbosity > 1:
+                self.stdout.write(f"  scanned {totals['scanned']} user(s)")
+
+        totals = reclassify_emails(chunk_size=options['batch_size'], on_chunk=report)
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {totals['scanned']} user(s): {totals['unitec_changed']} email classification(s) changed, "
+            f"{totals['approved']} pending user(s) approved."
+        ))
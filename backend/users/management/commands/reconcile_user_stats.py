@@ -0,0 +1,24 @@
+"""
+Recompute the user stat counters and correct any drift.
+
+Intended to run periodically from cron or a scheduler, e.g.
+``15 * * * * python manage.py reconcile_user_stats``.
+"""
+
+from django.core.management.base import BaseCommand
+
+from users.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount users by approval status, role, email domain and graduation expiry, and fix drifted counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        drift = reconcile(dry_run=options['dry_run'])
+        for (dimension, value), (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f"  {dimension}={value or '-'}: {stored} -> {actual}")
+        verb = "Found" if options['dry_run'] else "Corrected"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drift)} drifted counter(s)."))
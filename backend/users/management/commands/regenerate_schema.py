@@ -0,0 +1,48 @@
+"""
+Generate, validate and store the OpenAPI schema served at /schema/.
+
+Run it at build or deploy time so schema generation never happens on the
+request path. It fails if the generator reports errors (views it had to
+leave out), unless ``--allow-errors`` is given.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config.schema import build, compute_fingerprint, get_cache_dir, read_schema
+
+
+class Command(BaseCommand):
+    help = "Regenerate and validate the precomputed OpenAPI schema."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-validation', action='store_true', help='Do not validate against the OpenAPI spec')
+        parser.add_argument('--allow-errors', action='store_true',
+                            help='Store the schema even if the generator reported errors')
+        parser.add_argument('--check', action='store_true',
+                            help='Only check that a schema for the current code exists; exit non-zero if not')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            fingerprint = compute_fingerprint()
+            if read_schema(fingerprint) is None:
+                raise CommandError(f"No schema built for fingerprint {fingerprint} in {get_cache_dir()}")
+            self.stdout.write(self.style.SUCCESS(f"Schema {fingerprint} is up to date."))
+            return
+
+        started = time.perf_counter()
+        try:
+            fingerprint, rendered, _ = build(
+                validate=not options['skip_validation'], force=True, strict=not options['allow_errors'],
+            )
+        except Exception as exc:
+            raise CommandError(f"Schema generation failed: {exc}") from exc
+        elapsed = time.perf_counter() - started
+        sizes = ', '.join(
+            f"{fmt} {len(schema.body) // 1024} KiB ({len(schema.gzipped) // 1024} KiB gzipped)"
+            for fmt, schema in rendered.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Built schema {fingerprint} in {elapsed:.2f}s: {sizes} -> {get_cache_dir()}"
+        ))
@@ -0,0 +1,30 @@
+"""
+Process queued bulk action jobs.
+
+Jobs are normally started in a background thread by the admin; this command
+picks up any that were left queued, e.g. after a worker restart, and first
+requeues running jobs whose worker stopped sending heartbeats (see
+``USERS_BULK_JOB_LEASE``). Run it periodically, e.g. from cron.
+"""
+
+from django.core.management.base import BaseCommand
+
+from users.bulk import requeue_stale_jobs, run_job
+from users.models import BulkActionJob
+
+
+class Command(BaseCommand):
+    help = "Requeue abandoned bulk action jobs and run queued ones."
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} abandoned job(s).")
+        job_ids = list(
+            BulkActionJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True)
+        )
+        for job_id in job_ids:
+            if run_job(job_id):
+                job = BulkActionJob.objects.get(pk=job_id)
+                self.stdout.write(f"Job {job_id}: {job.status}, {job.updated} user(s) updated")
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(job_ids)} queued job(s)."))
@@ -0,0 +1,49 @@
+"""
+Deliver the outbound email queue (see users/mail.py).
+
+Run it continuously next to the web workers, e.g. under systemd or
+supervisor: ``python manage.py send_queued_email --loop``. Without
+``--loop`` it drains what is due and exits, which suits cron.
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.mail import claim_batch, purge_sent, send_batch
+
+
+class Command(BaseCommand):
+    help = "Send queued outbound emails in batches over one connection, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Messages claimed and sent per connection')
+        parser.add_argument('--backend', help='Email backend to deliver through (default USERS_EMAIL_DELIVERY_BACKEND)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new messages')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls when the queue is empty')
+        parser.add_argument('--purge-days', type=int, help='Also delete messages sent more than this many days ago')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            purged = purge_sent(timedelta(days=options['purge_days']))
+            self.stdout.write(f"Purged {purged} sent message(s).")
+
+        totals = {'sent': 0, 'failed': 0}
+        try:
+            while True:
+                rows = claim_batch(options['batch_size'])
+                if rows:
+                    result = send_batch(rows, options['backend'])
+                    totals['sent'] += result['sent']
+                    totals['failed'] += result['failed']
+                    self.stdout.write(f"  sent {result['sent']}, failed {result['failed']}")
+                    continue
+                if not options['loop']:
+                    break
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Sent {totals['sent']} message(s), {totals['failed']} failed."))
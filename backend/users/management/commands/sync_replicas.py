@@ -0,0 +1,45 @@
+"""
+Copy the SQLite primary to its replica files, standing in for replication
+when developing with ``DJANGO_DB_REPLICAS`` (see users/replicas.py).
+
+``python manage.py sync_replicas --loop --interval 1`` keeps the replicas
+at most about a second (plus the copy time) behind, which is roughly how a
+lagging streaming replica behaves. Real deployments replicate with the
+database server instead.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from users.replicas import PRIMARY, get_replicas, sync_sqlite_replica
+
+
+class Command(BaseCommand):
+    help = "Copy the SQLite primary over each configured replica file with the online backup API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep copying until interrupted')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between copies with --loop')
+
+    def handle(self, *args, **options):
+        aliases = get_replicas()
+        if not aliases:
+            raise CommandError("No replicas configured; set DJANGO_DB_REPLICAS.")
+        if any(connections[alias].vendor != 'sqlite' for alias in [PRIMARY, *aliases]):
+            raise CommandError("sync_replicas only copies SQLite databases; use the server's replication.")
+
+        source = connections[PRIMARY].settings_dict['NAME']
+        try:
+            while True:
+                for alias in aliases:
+                    seconds = sync_sqlite_replica(source, connections[alias].settings_dict['NAME'])
+                    if options['verbosity'] > 1 or not options['loop']:
+                        self.stdout.write(f"  {alias}: copied in {seconds * 1000:.0f} ms")
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Synced {len(aliases)} replica(s) from {source}."))
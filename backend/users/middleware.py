@@ -0,0 +1,101 @@
+"""
+Request instrumentation and replica routing.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import replicas
+from .instrumentation import end_request, record_request, start_request
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request, add a ``Server-Timing`` header and record it in the
+    ``/metrics`` histograms. Place it first so the total covers every other
+    middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.send_header = getattr(settings, 'USERS_SERVER_TIMING_HEADER', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, timings)
+
+    def _finish(self, request, response, timings):
+        total = timings.elapsed()
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        record_request(view, request.method, response.status_code, timings, total)
+        if self.send_header:
+            response['Server-Timing'] = timings.server_timing(total)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Scope ``users.replicas`` routing to the request: reads may go to a
+    replica only while it runs and only for safe methods, and a request
+    that wrote keeps its user on the primary for ``USERS_DB_STICKY_SECONDS``
+    afterwards.
+
+    Unused when no replicas are configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas.get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _, token = replicas.start_request(pinned=request.method not in replicas.SAFE_METHODS)
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.end_request(token)
+        return response
+
+    async def __acall__(self, request):
+        _, token = replicas.start_request(pinned=request.method not in replicas.SAFE_METHODS)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.end_request(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Session-authenticated (admin) requests; JWT views note their user when authenticating
+        session = getattr(request, 'session', None)
+        if session is not None:
+            replicas.note_user(session.get('_auth_user_id'))
+        return None
+
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:06
+
+import calendar
+
+from django.db import migrations, models
+
+
+def backfill_graduation_expires_on(apps, schema_editor):
+    """Set graduation_expires_on = graduation_date + 12 months, in batches."""
+    User = apps.get_model('users', 'User')
+    db_alias = schema_editor.connection.alias
+    batch_size = 2000
+    last_pk = 0
+    while True:
+        batch = list(
+            User.objects.using(db_alias)
+            .filter(pk__gt=last_pk, graduation_date__isnull=False)
+            .order_by('pk')
+            .only('pk', 'graduation_date')[:batch_size]
+        )
+        if not batch:
+            break
+        for user in batch:
+            day = user.graduation_date
+            year = day.year + 1
+            user.graduation_expires_on = day.replace(
+                year=year, day=min(day.day, calendar.monthrange(year, day.month)[1])
+            )
+        User.objects.using(db_alias).bulk_update(batch, ['graduation_expires_on'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='graduation_expires_on',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True, verbose_name='Graduation Expires On'),
+        ),
+        migrations.RunPython(backfill_graduation_expires_on, migrations.RunPython.noop),
+    ]
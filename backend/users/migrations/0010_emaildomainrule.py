@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:08
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_user_graduation_expires_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailDomainRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pattern', models.CharField(max_length=253, unique=True, validators=[django.core.validators.RegexValidator('^(\\*\\.)?([a-z0-9]([a-z0-9-]*[a-z0-9])?\\.)+[a-z0-9-]+$', "Enter a lowercase domain, optionally prefixed with '*.' for subdomains.")])),
+                ('is_unitec', models.BooleanField(default=True, verbose_name='Is Unitec Domain')),
+                ('auto_approve', models.BooleanField(default=True, verbose_name='Auto Approve')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'Email Domain Rule',
+                'verbose_name_plural': 'Email Domain Rules',
+                'ordering': ['pattern'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_token_revocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('approval_status', 'Approval Status'), ('role', 'Role'), ('graduation_date', 'Graduation Date')], max_length=30)),
+                ('old_value', models.CharField(blank=True, max_length=50, null=True)),
+                ('new_value', models.CharField(blank=True, max_length=50, null=True)),
+                ('source', models.CharField(max_length=30)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Audit Log Entry',
+                'verbose_name_plural': 'Audit Log Entries',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='audit_user_created_idx'), models.Index(fields=['actor', '-created_at', '-id'], name='audit_actor_created_idx'), models.Index(fields=['-created_at', '-id'], name='audit_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_user_stats(apps, schema_editor):
+    """Count the existing users into the new counters."""
+    User = apps.get_model('users', 'User')
+    UserStatCounter = apps.get_model('users', 'UserStatCounter')
+    db_alias = schema_editor.connection.alias
+    users = User.objects.using(db_alias).order_by()
+    counters = [UserStatCounter(dimension='total', value='', count=users.count())]
+    for field, dimension in [
+        ('approval_status', 'approval_status'),
+        ('role', 'role'),
+        ('is_unitec_email', 'email_domain'),
+        ('graduation_expires_on', 'graduation_expires_on'),
+    ]:
+        for value, count in users.values(field).annotate(n=Count('pk')).values_list(field, 'n'):
+            if field == 'is_unitec_email':
+                value = 'unitec' if value else 'non_unitec'
+            elif field == 'graduation_expires_on':
+                value = value.isoformat() if value else ''
+            counters.append(UserStatCounter(dimension=dimension, value=value, count=count))
+    UserStatCounter.objects.using(db_alias).bulk_create([c for c in counters if c.count])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('approval_status', 'Approval Status'), ('role', 'Role'), ('email_domain', 'Email Domain'), ('graduation_expires_on', 'Graduation Expires On')], max_length=32)),
+                ('value', models.CharField(blank=True, max_length=32)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'User Stat Counter',
+                'verbose_name_plural': 'User Stat Counters',
+                'ordering': ['dimension', 'value'],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='user_stat_counter_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:10
+
+from django.db import migrations
+
+
+class SQLiteRunSQL(migrations.RunSQL):
+    """``RunSQL`` that only runs on SQLite; other backends search with ``icontains``."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+# Names, emails and Unitec ids mirrored into an external-content FTS5 table.
+# IF NOT EXISTS: databases migrated before this migration got the table from a post_migrate hook.
+CREATE_SEARCH_INDEX = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_user_fts USING fts5(
+        email, first_name, last_name, unitec_id, content='users_user', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS users_user_fts_ai AFTER INSERT ON users_user BEGIN
+        INSERT INTO users_user_fts(rowid, email, first_name, last_name, unitec_id)
+        VALUES (new.id, new.email, new.first_name, new.last_name, new.unitec_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_user_fts_ad AFTER DELETE ON users_user BEGIN
+        INSERT INTO users_user_fts(users_user_fts, rowid, email, first_name, last_name, unitec_id)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name, old.unitec_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_user_fts_au
+    AFTER UPDATE OF email, first_name, last_name, unitec_id ON users_user BEGIN
+        INSERT INTO users_user_fts(users_user_fts, rowid, email, first_name, last_name, unitec_id)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name, old.unitec_id);
+        INSERT INTO users_user_fts(rowid, email, first_name, last_name, unitec_id)
+        VALUES (new.id, new.email, new.first_name, new.last_name, new.unitec_id);
+    END""",
+    # Index the users that already exist
+    "INSERT INTO users_user_fts(users_user_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS users_user_fts_au",
+    "DROP TRIGGER IF EXISTS users_user_fts_ad",
+    "DROP TRIGGER IF EXISTS users_user_fts_ai",
+    "DROP TABLE IF EXISTS users_user_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_bulkactionjob_heartbeat_at'),
+    ]
+
+    operations = [
+        SQLiteRunSQL(CREATE_SEARCH_INDEX, DROP_SEARCH_INDEX),
+    ]
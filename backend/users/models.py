@@ -1,15 +1,49 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models import Case, Value, When
+from django.db.models.functions import Lower
+from django.utils import timezone
 import uuid
 
+class UserQuerySet(models.QuerySet):
+    """
+    QuerySet with database-side graduation status.
+    """
+
+    def with_graduation_status(self, today=None):
+        """
+        Annotate ``graduation_state`` ('graduated', 'expired' or
+        'not_graduated') from the stored expiry date, so no per-row Python
+        work is needed when rendering lists.
+        """
+        if today is None:
+            today = timezone.localdate()
+        return self.annotate(graduation_state=Case(
+            When(graduation_expires_on__isnull=True, then=Value('not_graduated')),
+            When(graduation_expires_on__gte=today, then=Value('graduated')),
+            default=Value('expired'),
+            output_field=models.CharField(),
+        ))
+
+
 class CustomUserManager(BaseUserManager):
     """
     Custom user manager that allows creating users without username.
     """
     
-    def create_user(self, email, password=None, **extra_fields):
+    def get_queryset(self):
+        return UserQuerySet(self.model, using=self._db)
+    
+    def with_graduation_status(self, today=None):
+        return self.get_queryset().with_graduation_status(today)
+    
+    def create_user(self, email, password=None, encoded_password=None, **extra_fields):
         """
         Create and save a user with the given email and password.
+        
+        ``encoded_password`` stores an already hashed password as-is, for
+        callers that hash off the request thread.
         """
         if not email:
             raise ValueError('The Email field must be set')
@@ -21,7 +55,9 @@ class CustomUserManager(BaseUserManager):
         user = self.model(email=email, **extra_fields)
         
         # Set password
-        if password:
+        if encoded_password:
+            user.password = encoded_password
+        elif password:
             user.set_password(password)
         
         # Save user
@@ -84,39 +120,417 @@ class User(AbstractUser):
     )
     
     year_group = models.CharField(max_length=10, blank=True, null=True, verbose_name="Year Group")
+    
+    GRADUATION_STATUS_CHOICES = [
+        ("graduated", "Graduated (≤12m)"),
+        ("expired", "Expired (>12m)"),
+        ("not_graduated", "Not Graduated"),
+    ]
     graduation_date = models.DateField(blank=True, null=True, verbose_name="Graduation Date")
+    # Derived from graduation_date on save; kept in sync by bulk updates too
+    graduation_expires_on = models.DateField(
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Graduation Expires On"
+    )
     is_unitec_email = models.BooleanField(default=False, verbose_name="Is Unitec Email")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []  # Remove username from required fields
     
+    # Changes to these are recorded in AuditLogEntry (see users.audit)
+    AUDITED_FIELDS = ('approval_status', 'role', 'graduation_date')
+    # Fields the UserStatCounter rows count by (see users.stats)
+    STATS_FIELDS = ('approval_status', 'role', 'is_unitec_email', 'graduation_expires_on')
+    TRACKED_FIELDS = tuple(dict.fromkeys(AUDITED_FIELDS + STATS_FIELDS))
+    
     # Use custom manager
     objects = CustomUserManager()
 
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
+        # Indexes matching UserAdmin.list_filter and its (-created_at, -pk) changelist ordering
+        indexes = [
+            models.Index(fields=['approval_status', '-created_at', '-id'], name='user_approval_created_idx'),
+            models.Index(fields=['role', '-created_at', '-id'], name='user_role_created_idx'),
+            models.Index(fields=['is_unitec_email', '-created_at', '-id'], name='user_unitec_created_idx'),
+            models.Index(fields=['graduation_date'], name='user_graduation_idx'),
+            models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+            # Exact Unitec id lookups and case-insensitive email prefix search
+            models.Index(fields=['unitec_id'], name='user_unitec_id_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
 
     def __str__(self):
         return f"{self.email} ({self.get_approval_status_display()})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stored values of the tracked fields, compared on save by the audit and stats receivers
+        instance._loaded_values = {
+            name: instance.__dict__[name] for name in cls.TRACKED_FIELDS if name in instance.__dict__
+        }
+        return instance
+    
+    def get_graduation_state(self, today=None):
+        """
+        Graduation status key, from the ``with_graduation_status()``
+        annotation when present, otherwise from the stored expiry date.
+        """
+        state = getattr(self, 'graduation_state', None)
+        if state is not None:
+            return state
+        if not self.graduation_expires_on:
+            return 'not_graduated'
+        if today is None:
+            today = timezone.localdate()
+        return 'graduated' if today <= self.graduation_expires_on else 'expired'
+    
+    def get_graduation_state_display(self):
+        return dict(self.GRADUATION_STATUS_CHOICES)[self.get_graduation_state()]
+    
     def save(self, *args, **kwargs):
         # Auto-generate username if not provided
         if not self.username:
             self.username = f"user_{uuid.uuid4().hex[:8]}"
         
         # Auto-set is_unitec_email and approval_status based on email
-        from .utils import is_unitec_email, get_approval_status_by_email
+        from .utils import is_unitec_email, get_approval_status_by_email, graduation_expiry
+        
+        self.graduation_expires_on = graduation_expiry(self.graduation_date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'graduation_date' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'graduation_expires_on'}
         
         # Only set these if they haven't been explicitly set
         if not hasattr(self, '_is_unitec_email_set') or not self._is_unitec_email_set:
             self.is_unitec_email = is_unitec_email(self.email)
             self._is_unitec_email_set = True
         
-        # Only auto-set approval_status if it's still the default value and hasn't been manually changed
-        if self.approval_status == 'pending' and (not hasattr(self, '_approval_status_set') or not self._approval_status_set):
+        # Only auto-set approval_status on creation, while it's still the default and hasn't been
+        # manually changed; a later 'pending' (e.g. an expired graduate) must stay put
+        if (
+            self._state.adding
+            and self.approval_status == 'pending'
+            and not getattr(self, '_approval_status_set', False)
+        ):
             self.approval_status = get_approval_status_by_email(self.email)
             self._approval_status_set = True
         
         super().save(*args, **kwargs)
+        
+        # The post_save receivers have compared against the old values by now
+        saved = kwargs.get('update_fields')
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for name in self.TRACKED_FIELDS:
+            if saved is None or name in saved:
+                loaded[name] = getattr(self, name)
+
+
+class BulkActionJob(models.Model):
+    """
+    Tracks a bulk admin action that runs in the background.
+    """
+
+    ACTION_CHOICES = [
+        ("approve", "Approve users"),
+        ("deny", "Deny users"),
+        ("extend_graduation", "Extend graduated users"),
+    ]
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    action = models.CharField(max_length=30, choices=ACTION_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    user_ids = models.JSONField(default=list, verbose_name="User IDs")
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="bulk_action_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    started_at = models.DateTimeField(blank=True, null=True)
+    # Refreshed after every chunk; a running job whose heartbeat is older than
+    # USERS_BULK_JOB_LEASE is considered abandoned and requeued
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Bulk Action Job"
+        verbose_name_plural = "Bulk Action Jobs"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='bulkjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} ({self.processed}/{self.total})"
+
+    @property
+    def progress(self):
+        """Percentage of selected users processed so far."""
+        if not self.total:
+            return 100
+        return int(self.processed * 100 / self.total)
+
+
+class EmailDomainRule(models.Model):
+    """
+    Email domain classification rule, in addition to those in settings.
+
+    ``pattern`` is either an exact domain (``myunitec.ac.nz``) or a wildcard
+    matching every subdomain (``*.unitec.ac.nz``).
+    """
+
+    pattern = models.CharField(
+        max_length=253,
+        unique=True,
+        validators=[RegexValidator(
+            r'^(\*\.)?([a-z0-9]([a-z0-9-]*[a-z0-9])?\.)+[a-z0-9-]+$',
+            "Enter a lowercase domain, optionally prefixed with '*.' for subdomains.",
+        )],
+    )
+    is_unitec = models.BooleanField(default=True, verbose_name="Is Unitec Domain")
+    auto_approve = models.BooleanField(default=True, verbose_name="Auto Approve")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        verbose_name = "Email Domain Rule"
+        verbose_name_plural = "Email Domain Rules"
+        ordering = ['pattern']
+
+    def __str__(self):
+        return self.pattern
+
+    def save(self, *args, **kwargs):
+        self.pattern = self.pattern.strip().lower()
+        super().save(*args, **kwargs)
+
+
+class RevokedToken(models.Model):
+    """
+    A single revoked JWT, by its ``jti`` claim.
+
+    Kept until the token would have expired anyway.
+    """
+
+    jti = models.CharField(max_length=255, unique=True, verbose_name="JWT ID")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="revoked_tokens",
+    )
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Expires At")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        verbose_name = "Revoked Token"
+        verbose_name_plural = "Revoked Tokens"
+
+    def __str__(self):
+        return self.jti
+
+
+class TokenWatermark(models.Model):
+    """
+    Revokes every token of a user issued at or before ``not_before``.
+
+    Kept until the last token it covers would have expired (``expires_at``).
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="token_watermark",
+    )
+    not_before = models.DateTimeField(verbose_name="Tokens Issued Before")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Expires At")
+
+    class Meta:
+        verbose_name = "Token Watermark"
+        verbose_name_plural = "Token Watermarks"
+
+    def __str__(self):
+        return f"{self.user_id} < {self.not_before:%Y-%m-%d %H:%M:%S}"
+
+
+class AuditLogQuerySet(models.QuerySet):
+    """
+    Append-only queryset with the lookups the indexes serve.
+    """
+
+    def for_user(self, user_id):
+        return self.filter(user_id=user_id)
+
+    def by_actor(self, actor_id):
+        return self.filter(actor_id=actor_id)
+
+    def between(self, start=None, end=None):
+        """Entries from ``start`` (inclusive) to ``end`` (exclusive); either may be None."""
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=end)
+        return queryset
+
+    def update(self, **kwargs):
+        raise TypeError("Audit log entries are append-only.")
+
+    def delete(self):
+        raise TypeError("Audit log entries are append-only.")
+
+
+class AuditLogEntry(models.Model):
+    """
+    One change to an audited ``User`` field.
+
+    Entries are never updated or deleted, and they outlive the users they
+    refer to, so the user and actor references carry no database constraint.
+    """
+
+    FIELD_CHOICES = [
+        ("approval_status", "Approval Status"),
+        ("role", "Role"),
+        ("graduation_date", "Graduation Date"),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,  # covered by audit_user_created_idx
+        related_name="+",
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,  # covered by audit_actor_created_idx
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    field = models.CharField(max_length=30, choices=FIELD_CHOICES)
+    old_value = models.CharField(max_length=50, null=True, blank=True)
+    new_value = models.CharField(max_length=50, null=True, blank=True)
+    # Where the change came from, e.g. 'admin_action', 'approval_queue'
+    source = models.CharField(max_length=30)
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Created At")
+
+    objects = AuditLogQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Audit Log Entry"
+        verbose_name_plural = "Audit Log Entries"
+        ordering = ['-created_at', '-id']
+        # Every query pattern pages over (-created_at, -id) within its key
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='audit_user_created_idx'),
+            models.Index(fields=['actor', '-created_at', '-id'], name='audit_actor_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='audit_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.field}: {self.old_value} -> {self.new_value}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise TypeError("Audit log entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("Audit log entries are append-only.")
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting in (or sent from) the outbound queue; see ``users.mail``.
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    subject = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    # [content, mimetype] pairs, e.g. the HTML part
+    alternatives = models.JSONField(default=list, blank=True)
+    # [filename, base64 content, mimetype] triples
+    attachments = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a queued message is due, or when a worker's claim on a sending one lapses
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class UserStatCounter(models.Model):
+    """
+    Number of users per value of one dimension, kept current by ``users.stats``.
+    """
+
+    DIMENSION_CHOICES = [
+        ("total", "Total"),
+        ("approval_status", "Approval Status"),
+        ("role", "Role"),
+        ("email_domain", "Email Domain"),
+        # Counted per expiry date so graduated/expired can be split at read time
+        ("graduation_expires_on", "Graduation Expires On"),
+    ]
+
+    dimension = models.CharField(max_length=32, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=32, blank=True)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "User Stat Counter"
+        verbose_name_plural = "User Stat Counters"
+        ordering = ['dimension', 'value']
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='user_stat_counter_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.value}: {self.count}"
@@ -0,0 +1,35 @@
+"""
+Pagination classes for user listings.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+# The admin paginator lives in users.paginators so the admin doesn't import DRF
+from .paginators import LargeTablePaginator  # noqa: F401
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Cursor pagination ordered by ``(-created_at, -id)``.
+
+    DRF's cursor holds only the ``created_at`` of the last row seen: each
+    page seeks past it with the ``user_created_idx`` index, then skips the
+    rows already returned that share that timestamp with an OFFSET. Deep
+    pages cost about the same as the first one as long as few rows share a
+    ``created_at`` (each row gets its own microsecond timestamp); ``-id``
+    only makes the order of ties stable.
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ApprovalQueuePagination(CreatedAtCursorPagination):
+    """
+    Oldest-first cursor pagination for the approval queue, served by
+    ``user_approval_created_idx`` scanned in reverse.
+    """
+
+    ordering = ('created_at', 'id')
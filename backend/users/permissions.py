@@ -0,0 +1,35 @@
+"""
+DRF permission classes based on the user's role and approval status.
+
+They only read ``role`` and ``approval_status``, so they work on the
+``UserSnapshot`` returned by ``ClaimsJWTAuthentication`` without a query.
+"""
+
+from rest_framework.permissions import BasePermission
+
+ADMIN_ROLES = ('super_admin', 'admin')
+
+
+class IsApprovedUser(BasePermission):
+    """
+    Allow access only to authenticated users whose account is approved.
+    """
+    message = "Your account has not been approved yet."
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.approval_status == 'approved')
+
+
+class IsAdminRole(BasePermission):
+    """
+    Allow access only to approved users with the admin or super admin role.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(
+            user and user.is_authenticated
+            and user.approval_status == 'approved'
+            and user.role in ADMIN_ROLES
+        )
@@ -0,0 +1,19 @@
+"""
+DRF renderers that report their time to the request instrumentation.
+"""
+
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+from .instrumentation import timed
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class TimedBrowsableAPIRenderer(BrowsableAPIRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,196 @@
+"""
+Primary/replica database routing.
+
+``PrimaryReplicaRouter`` sends writes to the primary (``default``) and
+spreads read-only queries over the aliases in ``USERS_DB_REPLICAS``. Reads
+only go to a replica inside a request handled by
+``users.middleware.ReplicaRoutingMiddleware``; management commands,
+background jobs and the shell always use the primary. Within a request,
+reads go to the primary when:
+
+- they run inside a transaction on the primary
+- the request has already written (routed a write to the primary)
+- the user wrote within the last ``USERS_DB_STICKY_SECONDS`` seconds, on
+  any request, so they read their own writes despite replica lag
+- the request is not a GET, HEAD or OPTIONS: it may read rows it then
+  writes back, or log in a user who has only just signed up
+- the model is in ``USERS_DB_PRIMARY_MODELS`` (sessions, token revocations)
+
+Each request reads from one replica chosen at random, so its reads see a
+single consistent copy. Caches keyed on a version stamp that a write bumps
+(``users.cache``) must not be filled from a replica that has not caught up
+with that write; ``db_for_version`` picks the primary while the version is
+recent.
+
+Locally, ``DJANGO_DB_REPLICAS`` lists SQLite files (see config/databases.py)
+that ``manage.py sync_replicas`` keeps as copies of the primary, standing in
+for replication.
+"""
+
+import contextvars
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+# Requests with any other method read from the primary
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+DEFAULT_STICKY_SECONDS = 5
+DEFAULT_PRIMARY_MODELS = ('sessions.session', 'users.revokedtoken', 'users.tokenwatermark')
+
+
+def get_replicas() -> list:
+    return getattr(settings, 'USERS_DB_REPLICAS', [])
+
+
+def get_sticky_seconds() -> float:
+    return getattr(settings, 'USERS_DB_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+
+
+def _pin_key(user_id) -> str:
+    return f'users:db:primary:{user_id}'
+
+
+class RequestRouting:
+    """
+    Routing state of one request: the replica it reads from, whether it is
+    pinned to the primary and the user it was made by.
+    """
+
+    __slots__ = ('replica', 'pinned', 'user_id')
+
+    def __init__(self, replica, pinned=False):
+        self.replica = replica
+        self.pinned = pinned or replica is None
+        self.user_id = None
+
+
+_current = contextvars.ContextVar('users_db_routing', default=None)
+
+
+def start_request(pinned: bool = False) -> tuple:
+    """
+    Start routing a request, on the primary only if ``pinned``; returns its
+    state and a token for ``end_request``.
+    """
+    replicas = get_replicas()
+    state = RequestRouting(random.choice(replicas) if replicas else None, pinned)
+    return state, _current.set(state)
+
+
+def end_request(token):
+    """
+    Stop routing a request. If it wrote, keep its user's reads on the
+    primary for ``USERS_DB_STICKY_SECONDS``.
+    """
+    state = _current.get()
+    _current.reset(token)
+    if state.replica is not None and state.pinned and state.user_id is not None:
+        cache.set(_pin_key(state.user_id), 1, timeout=get_sticky_seconds())
+
+
+def current():
+    """Return the routing state of the request being handled, or None."""
+    return _current.get()
+
+
+def pin_to_primary():
+    """Send the rest of this request's reads to the primary."""
+    state = _current.get()
+    if state is not None:
+        state.pinned = True
+
+
+def note_user(user_id):
+    """
+    Record the request's user as soon as it is known (before its row is
+    read), pinning the request if the user wrote recently.
+    """
+    state = _current.get()
+    if state is None or state.replica is None or user_id is None:
+        return
+    state.user_id = user_id
+    if not state.pinned and cache.get(_pin_key(user_id)):
+        state.pinned = True
+
+
+async def anote_user(user_id):
+    """Async ``note_user``, through the cache's async API."""
+    state = _current.get()
+    if state is None or state.replica is None or user_id is None:
+        return
+    state.user_id = user_id
+    if not state.pinned and await cache.aget(_pin_key(user_id)):
+        state.pinned = True
+
+
+def db_for_version(version) -> str:
+    """
+    Alias to fill a cache entry stamped ``version`` (a change time in
+    nanoseconds) from: the primary while replicas may not have the change
+    yet, otherwise None to let the router decide.
+    """
+    if version is not None and time.time_ns() - version < get_sticky_seconds() * 1_000_000_000:
+        return PRIMARY
+    return None
+
+
+class PrimaryReplicaRouter:
+    """
+    Database router sending writes to the primary and reads to a replica
+    where that is safe; see the module docstring.
+    """
+
+    def __init__(self):
+        self.primary_models = frozenset(getattr(settings, 'USERS_DB_PRIMARY_MODELS', DEFAULT_PRIMARY_MODELS))
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if (
+            state is None
+            or state.pinned
+            or model._meta.label_lower in self.primary_models
+            or connections[PRIMARY].in_atomic_block
+        ):
+            return PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in get_replicas():
+            return False
+        return None
+
+
+def sync_sqlite_replica(source: str, target: str) -> float:
+    """
+    Copy the SQLite database ``source`` over ``target`` with the online
+    backup API, a stand-in for replication when developing locally.
+
+    Returns:
+        float: Seconds the copy took
+    """
+    started = time.perf_counter()
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target, timeout=20)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return time.perf_counter() - started
@@ -0,0 +1,278 @@
+"""
+JWT revocation.
+
+Two kinds of revocation are stored, each row kept only until the tokens it
+covers would have expired anyway:
+
+- ``RevokedToken``: one token, by its ``jti`` claim (``/auth/jwt/revoke/``)
+- ``TokenWatermark``: every token of a user issued up to a point in time,
+  set when the user is approved or denied
+
+Nearly every token checked is not revoked, so each process keeps a Bloom
+filter of the revoked ``jti``s and user ids, and only queries the tables
+when the filter reports a possible match. Revocations made in this process
+are added to its filter straight away; other processes see a bumped version
+in the shared cache and rebuild theirs within
+``USERS_REVOCATION_CHECK_INTERVAL`` seconds; with a per-process cache they
+cannot, so the filter is rebuilt at every check. Every filter is also rebuilt
+after ``USERS_REVOCATION_REBUILD_INTERVAL`` seconds to shed expired entries.
+``manage.py purge_revoked_tokens`` deletes expired rows in batches.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .cache import cache_is_shared
+from .models import RevokedToken, TokenWatermark
+
+VERSION_KEY = 'users:revocations:version'
+
+DEFAULT_BLOOM_CAPACITY = 10000
+DEFAULT_BLOOM_ERROR_RATE = 0.001
+DEFAULT_PURGE_BATCH_SIZE = 1000
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings.
+
+    Sized for ``capacity`` items at a false-positive rate of ``error_rate``;
+    the bit positions of an item come from double hashing a single blake2b
+    digest. Membership tests never give false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = DEFAULT_BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+
+def _jti_key(jti) -> str:
+    return f'jti:{jti}'
+
+
+def _user_key(user_id) -> str:
+    return f'user:{user_id}'
+
+
+def get_capacity() -> int:
+    return getattr(settings, 'USERS_REVOCATION_BLOOM_CAPACITY', DEFAULT_BLOOM_CAPACITY)
+
+
+def get_error_rate() -> float:
+    return getattr(settings, 'USERS_REVOCATION_BLOOM_ERROR_RATE', DEFAULT_BLOOM_ERROR_RATE)
+
+
+def get_purge_batch_size() -> int:
+    return getattr(settings, 'USERS_REVOCATION_PURGE_BATCH_SIZE', DEFAULT_PURGE_BATCH_SIZE)
+
+
+def token_lifetime():
+    """Longest time a token issued now stays valid."""
+    return max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+
+
+def build_filter() -> BloomFilter:
+    """Load every unexpired revocation into a new filter."""
+    now = timezone.now()
+    keys = [
+        *map(_jti_key, RevokedToken.objects.filter(expires_at__gt=now).values_list('jti', flat=True).iterator()),
+        *map(_user_key, TokenWatermark.objects.filter(expires_at__gt=now).values_list('user_id', flat=True).iterator()),
+    ]
+    # Headroom for revocations added locally before the next rebuild
+    bloom = BloomFilter(max(2 * len(keys), get_capacity()), get_error_rate())
+    for key in keys:
+        bloom.add(key)
+    return bloom
+
+
+_state = {'filter': None, 'version': None, 'checked_at': 0.0, 'built_at': 0.0}
+_lock = threading.Lock()
+
+
+def _checked_filter():
+    """The filter, if it was checked against the shared version recently enough."""
+    interval = getattr(settings, 'USERS_REVOCATION_CHECK_INTERVAL', 5)
+    if _state['filter'] is not None and time.monotonic() - _state['checked_at'] < interval:
+        return _state['filter']
+    return None
+
+
+def get_filter() -> BloomFilter:
+    """Return this process's filter, rebuilding it when it is out of date."""
+    bloom = _checked_filter()
+    if bloom is not None:
+        return bloom
+
+    with _lock:
+        now = time.monotonic()
+        # Read the version first: a revocation committed during the rebuild bumps it again
+        version = cache.get(VERSION_KEY)
+        bloom = _state['filter']
+        if (
+            bloom is None
+            or version != _state['version']
+            or not cache_is_shared()
+            or len(bloom) > bloom.capacity
+            or now - _state['built_at'] >= getattr(settings, 'USERS_REVOCATION_REBUILD_INTERVAL', 600)
+        ):
+            _state.update(filter=build_filter(), version=version, built_at=now)
+        _state['checked_at'] = now
+        return _state['filter']
+
+
+async def aget_filter() -> BloomFilter:
+    bloom = _checked_filter()
+    if bloom is None:
+        bloom = await sync_to_async(get_filter)()
+    return bloom
+
+
+def invalidate_filter():
+    """Make this process rebuild its filter on the next check."""
+    with _lock:
+        _state['filter'] = None
+
+
+def _revoked(keys):
+    """Add new revocations to the local filter now and tell other processes once committed."""
+    with _lock:
+        bloom = _state['filter']
+        if bloom is not None:
+            for key in keys:
+                bloom.add(key)
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, time.time_ns(), timeout=None))
+
+
+def _claims(payload):
+    return payload.get(api_settings.JTI_CLAIM), payload.get(api_settings.USER_ID_CLAIM), payload.get('iat', 0)
+
+
+def _covered_by(not_before, iat) -> bool:
+    # ``iat`` has one-second resolution, so tokens issued in the same second are revoked too
+    return not_before is not None and iat <= not_before.timestamp()
+
+
+def is_revoked(payload, bloom: BloomFilter = None) -> bool:
+    """
+    Whether the token with claims ``payload`` has been revoked.
+
+    Costs no query unless the filter reports a possible match.
+    """
+    bloom = bloom or get_filter()
+    jti, user_id, iat = _claims(payload)
+    if jti is not None and _jti_key(jti) in bloom:
+        if RevokedToken.objects.filter(jti=jti).exists():
+            return True
+    if user_id is not None and _user_key(user_id) in bloom:
+        not_before = TokenWatermark.objects.filter(user_id=user_id).values_list('not_before', flat=True).first()
+        return _covered_by(not_before, iat)
+    return False
+
+
+async def ais_revoked(payload) -> bool:
+    """Async ``is_revoked`` using the async ORM."""
+    bloom = await aget_filter()
+    jti, user_id, iat = _claims(payload)
+    if jti is not None and _jti_key(jti) in bloom:
+        if await RevokedToken.objects.filter(jti=jti).aexists():
+            return True
+    if user_id is not None and _user_key(user_id) in bloom:
+        not_before = await TokenWatermark.objects.filter(user_id=user_id).values_list('not_before', flat=True).afirst()
+        return _covered_by(not_before, iat)
+    return False
+
+
+def revoke_token(payload) -> bool:
+    """
+    Revoke one token by its ``jti``.
+
+    Returns:
+        bool: False if the token was already revoked
+    """
+    jti, user_id, _ = _claims(payload)
+    _, created = RevokedToken.objects.get_or_create(
+        jti=jti,
+        defaults={'user_id': user_id, 'expires_at': datetime_from_epoch(payload['exp'])},
+    )
+    if created:
+        _revoked([_jti_key(jti)])
+    return created
+
+
+def revoke_user_tokens(user_ids, at=None) -> int:
+    """
+    Revoke every token issued to the given users up to now (or ``at``).
+
+    Returns:
+        int: Number of users whose watermark was set
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    at = at or timezone.now()
+    expires_at = at + token_lifetime()
+    TokenWatermark.objects.bulk_create(
+        [TokenWatermark(user_id=user_id, not_before=at, expires_at=expires_at) for user_id in user_ids],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['not_before', 'expires_at'],
+    )
+    _revoked([_user_key(user_id) for user_id in user_ids])
+    return len(user_ids)
+
+
+def purge_expired(batch_size: int = None, on_batch=None) -> int:
+    """
+    Delete revocations whose tokens have all expired, one batch per DELETE.
+
+    Returns:
+        int: Number of rows deleted
+    """
+    batch_size = batch_size or get_purge_batch_size()
+    now = timezone.now()
+    total = 0
+    for model in (RevokedToken, TokenWatermark):
+        expired = model.objects.filter(expires_at__lte=now)
+        while True:
+            pks = list(expired.order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                deleted, _ = model.objects.filter(pk__in=pks).delete()
+            total += deleted
+            if on_batch:
+                on_batch(model, deleted)
+            if len(pks) < batch_size:
+                break
+    return total
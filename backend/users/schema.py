@@ -0,0 +1,27 @@
+"""
+drf-spectacular extensions for the users app.
+
+Imported by ``config.schema`` just before the schema is generated, so
+drf-spectacular stays out of worker startup.
+"""
+
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class RevocableJWTScheme(SimpleJWTScheme):
+    """Bearer JWT scheme for ``RevocableJWTAuthentication`` (the default, used by the djoser views)."""
+
+    target_class = 'users.authentication.RevocableJWTAuthentication'
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    """
+    Bearer JWT scheme for ``ClaimsJWTAuthentication`` and its subclasses.
+
+    The same header and token as ``jwtAuth``, but spectacular keys security
+    schemes by authentication class, so it needs a name of its own.
+    """
+
+    target_class = 'users.authentication.ClaimsJWTAuthentication'
+    match_subclasses = True
+    name = 'claimsJwtAuth'
@@ -0,0 +1,81 @@
+"""
+Indexed user search.
+
+On SQLite, names, emails and Unitec ids are mirrored into an FTS5 table
+(``users_user_fts``, created by migration 0016) that triggers keep in sync on
+every INSERT, UPDATE and DELETE, including ``bulk_create`` and
+``queryset.update()``. Search terms are matched as token prefixes against
+it, exact Unitec ids use ``user_unitec_id_idx`` and email prefixes use the
+``lower(email)`` index.
+
+Matching is by word prefix, not substring: "aro" finds "Aroha", but "oha"
+does not. Other database backends fall back to the admin's previous
+``icontains`` substring search.
+
+A later migration that makes SQLite rebuild ``users_user`` (most
+``AlterField`` and ``RemoveField`` operations) drops the triggers with the
+old table, so it must end by re-running the trigger statements of 0016 and
+``rebuild_search_index``.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+
+FTS_TABLE = 'users_user_fts'
+FTS_COLUMNS = ('email', 'first_name', 'last_name', 'unitec_id')
+
+
+def fts_available(using='default') -> bool:
+    return connections[using].vendor == 'sqlite'
+
+
+def rebuild_search_index(using='default'):
+    """Rebuild the FTS index from the users table."""
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def build_match_query(term: str) -> str:
+    """
+    Turn free text into an FTS5 query matching every word as a prefix.
+
+    Returns an empty string if the term contains no searchable words.
+    """
+    words = re.findall(r'\w+', term)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _prefix_range(prefix: str):
+    """Return ``(low, high)`` bounds matching every string starting with ``prefix``."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def search_users(queryset, term: str):
+    """
+    Filter ``queryset`` to users matching ``term`` using the search indexes.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+
+    if not fts_available(queryset.db):
+        condition = Q()
+        for field in FTS_COLUMNS:
+            condition |= Q(**{f'{field}__icontains': term})
+        return queryset.filter(condition)
+
+    low, high = _prefix_range(term.lower())
+    condition = Q(unitec_id=term) | Q(email_lower__gte=low, email_lower__lt=high)
+
+    match = build_match_query(term)
+    if match:
+        condition |= Q(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        ))
+    return queryset.alias(email_lower=Lower('email')).filter(condition)
@@ -4,7 +4,13 @@ Custom serializers for user registration and management.
 
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
-from .models import User
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.tokens import UntypedToken
+from .authentication import CLAIM_FIELDS, VERSION_CLAIM, RevocableRefreshToken
+from .cache import get_user_version
+from .models import AuditLogEntry, User
+from .revocation import is_revoked
 from .utils import is_unitec_email, validate_unitec_id, get_approval_status_by_email
 
 
@@ -132,14 +138,42 @@ class CustomUserSerializer(UserSerializer):
     
     def get_graduation_status(self, obj):
         """Get graduation status display."""
-        if not obj.graduation_date:
-            return "Not Graduated"
-        
-        from .utils import is_graduated_user
-        if is_graduated_user(obj.graduation_date):
-            return "Graduated (≤12m)"
-        else:
-            return "Expired (>12m)"
+        return obj.get_graduation_state_display()
+
+
+class AuditLogEntrySerializer(serializers.ModelSerializer):
+    """
+    Serializer for audit log entries.
+    """
+
+    user = serializers.IntegerField(source='user_id', read_only=True)
+    actor = serializers.IntegerField(source='actor_id', read_only=True)
+
+    class Meta:
+        model = AuditLogEntry
+        fields = ('id', 'user', 'actor', 'field', 'old_value', 'new_value', 'source', 'created_at')
+        read_only_fields = fields
+
+
+class MeSerializer(serializers.ModelSerializer):
+    """
+    Shape of the ``/me/`` payload (built by ``users.cache.build_me_payload``).
+    """
+
+    class Meta:
+        model = User
+        fields = (
+            'id',
+            'email',
+            'first_name',
+            'last_name',
+            'role',
+            'unitec_id',
+            'year_group',
+            'approval_status',
+            'is_unitec_email',
+        )
+        read_only_fields = fields
 
 
 class UserApprovalSerializer(serializers.ModelSerializer):
@@ -185,3 +219,169 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
                 "Invalid Unitec student ID format."
             )
         return value
+
+
+class UserImportSerializer(CustomUserCreateSerializer):
+    """
+    Row validator for bulk roster imports.
+
+    Applies the same field and cross-field rules as signup, but the password
+    is optional (imported accounts get an unusable password until reset) and
+    email uniqueness is checked per batch by the importer instead of one
+    query per row.
+    """
+
+    password = serializers.CharField(required=False, allow_blank=True, write_only=True)
+
+    class Meta(CustomUserCreateSerializer.Meta):
+        extra_kwargs = {
+            'password': {'write_only': True},
+            'email': {'validators': []},
+        }
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Token pair serializer that embeds the fields needed by permission checks,
+    plus the user's cache version, so ``ClaimsJWTAuthentication`` can
+    authenticate without loading the user row.
+    """
+
+    token_class = RevocableRefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[VERSION_CLAIM] = get_user_version(user.pk)
+        for claim in CLAIM_FIELDS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that rejects revoked refresh tokens.
+    """
+
+    token_class = RevocableRefreshToken
+
+
+class RevocableTokenVerifySerializer(TokenVerifySerializer):
+    """
+    Verify serializer that reports revoked tokens as invalid.
+    """
+
+    def validate(self, attrs):
+        super().validate(attrs)
+        if is_revoked(UntypedToken(attrs['token']).payload):
+            raise TokenError("Token has been revoked")
+        return {}
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    """
+    Refresh token to revoke (logout).
+    """
+
+    refresh = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        # RevocableRefreshToken verifies the signature, expiry and revocation
+        attrs['token'] = RevocableRefreshToken(attrs['refresh'])
+        return attrs
+
+
+class UserListSerializer(CustomUserSerializer):
+    """
+    User listing serializer with sparse fieldsets.
+
+    Pass ``fields`` (a list of field names) to keep only those fields;
+    ``model_fields_for`` gives the columns they need so the view can narrow
+    the SELECT to match.
+    """
+
+    # Model columns each derived field is computed from
+    SOURCE_FIELDS = {
+        'approval_status_display': ('approval_status',),
+        'is_unitec_email_display': ('is_unitec_email',),
+        'graduation_status': ('graduation_expires_on',),
+    }
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def parse_fields(cls, value):
+        """
+        Parse a comma-separated ``fields`` parameter.
+
+        Returns:
+            list: Requested field names, or None for all fields
+
+        Raises:
+            serializers.ValidationError: If an unknown field is requested
+        """
+        if not value:
+            return None
+        requested = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(requested) - set(cls.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': f"Unknown field(s): {', '.join(sorted(unknown))}."}
+            )
+        return requested
+
+    @classmethod
+    def model_fields_for(cls, fields):
+        """Return the model columns needed to render ``fields``."""
+        columns = []
+        for name in fields:
+            for column in cls.SOURCE_FIELDS.get(name, (name,)):
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+
+class ApprovalBatchSerializer(serializers.Serializer):
+    """
+    Batch of approval decisions: lists of user ids per target status.
+
+    Only users whose current status is ``expected_status`` are changed, so a
+    decision made elsewhere in the meantime is never overwritten.
+    """
+
+    approved = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    denied = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    expected_status = serializers.ChoiceField(choices=User.APPROVAL_STATUS_CHOICES, default='pending')
+
+    def validate(self, attrs):
+        approved = set(attrs['approved'])
+        denied = set(attrs['denied'])
+        if not approved and not denied:
+            raise serializers.ValidationError("Provide at least one id in 'approved' or 'denied'.")
+        overlap = approved & denied
+        if overlap:
+            raise serializers.ValidationError(
+                f"Ids cannot be both approved and denied: {', '.join(map(str, sorted(overlap)[:20]))}."
+            )
+        max_size = self.context.get('max_batch_size')
+        if max_size and len(approved) + len(denied) > max_size:
+            raise serializers.ValidationError(f"A batch can contain at most {max_size} ids.")
+        attrs['approved'] = sorted(approved)
+        attrs['denied'] = sorted(denied)
+        return attrs
+
+
+class UserStatsSerializer(serializers.Serializer):
+    """
+    User counts for the admin dashboard (see ``users.stats.get_stats``).
+    """
+
+    total = serializers.IntegerField()
+    approval_status = serializers.DictField(child=serializers.IntegerField())
+    role = serializers.DictField(child=serializers.IntegerField())
+    email_domain = serializers.DictField(child=serializers.IntegerField())
+    graduation_state = serializers.DictField(child=serializers.IntegerField())
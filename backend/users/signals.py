@@ -0,0 +1,49 @@
+"""
+Signal handlers for the users app.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .audit import audit_instance
+from .cache import bump_user_version
+from .domains import invalidate_rules
+from .models import EmailDomainRule, User
+from .stats import record_delete, record_save
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Bump the user's cache version whenever the row changes."""
+    # Wait for commit so readers can't cache the old row under the new version
+    user_id = instance.pk
+    transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+@receiver(post_save, sender=User)
+def audit_user_changes(sender, instance, created, update_fields=None, **kwargs):
+    """Record approval status, role and graduation date changes in the audit log."""
+    if not created:
+        audit_instance(instance, update_fields)
+
+
+@receiver(post_save, sender=User)
+def count_user_save(sender, instance, created, update_fields=None, **kwargs):
+    """Adjust the user stat counters for a created or changed user."""
+    record_save(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=User)
+def count_user_delete(sender, instance, **kwargs):
+    """Adjust the user stat counters for a deleted user."""
+    record_delete(instance)
+
+
+@receiver(post_save, sender=EmailDomainRule)
+@receiver(post_delete, sender=EmailDomainRule)
+def invalidate_domain_rules(sender, **kwargs):
+    """Recompile the email domain rules after a rule changes."""
+    transaction.on_commit(invalidate_rules)
+
@@ -0,0 +1,147 @@
+"""
+Process startup profiling.
+
+``measure_startup`` boots the project in a fresh interpreter, timing the
+three phases a worker goes through before it can serve a request (settings
+import, ``django.setup()`` and the URLconf import) and, with
+``-X importtime``, what each imported module cost and in which phase it was
+imported. A fresh process is the only honest measurement: in the current one
+everything is already in ``sys.modules``.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+
+PHASES = ('settings', 'setup', 'urls')
+
+# Subsystems that should only be imported once their routes are used
+DEFERRED_MODULES = (
+    'drf_spectacular.views',
+    'drf_spectacular.generators',
+    'drf_spectacular.renderers',
+)
+
+# Only needed once the API views load with the URLconf, so django.setup()
+# (which every management command runs) must not import them
+SETUP_DEFERRED_MODULES = (
+    'drf_spectacular.openapi',
+    'rest_framework.serializers',
+)
+
+_MARKER = 'users-startup-phase:'
+
+_SCRIPT = f'''
+import json, os, sys, time
+
+watch = json.loads(sys.argv[1])
+include_urls = sys.argv[2] == '1'
+timings, loaded = {{}}, {{}}
+
+def phase(name, started):
+    timings[name] = (time.perf_counter() - started) * 1000
+    loaded[name] = [m for m in watch if m in sys.modules]
+    print({_MARKER!r} + name, file=sys.stderr, flush=True)
+
+started = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+phase('settings', started)
+
+started = time.perf_counter()
+django.setup()
+phase('setup', started)
+
+if include_urls:
+    started = time.perf_counter()
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    phase('urls', started)
+
+print(json.dumps({{'timings': timings, 'loaded': loaded}}))
+'''
+
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+class ModuleCost(NamedTuple):
+    name: str
+    phase: str
+    self_ms: float
+    cumulative_ms: float
+
+
+class StartupProfile(NamedTuple):
+    timings: dict  # phase -> milliseconds
+    loaded: dict  # phase -> watched modules imported by the end of that phase
+    modules: list  # ModuleCost, empty unless measured with importtime
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.timings.values())
+
+    def by_package(self) -> list:
+        """Return ``(package, phase, self_ms)`` for each top-level package, costliest first."""
+        totals = defaultdict(float)
+        for module in self.modules:
+            totals[module.name.partition('.')[0], module.phase] += module.self_ms
+        return sorted(((package, phase, ms) for (package, phase), ms in totals.items()), key=lambda row: -row[2])
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parse ``-X importtime`` output interleaved with the phase markers.
+
+    Returns:
+        list: ``ModuleCost`` per module, in import order
+    """
+    modules = []
+    pending = []
+    for line in stderr.splitlines():
+        if line.startswith(_MARKER):
+            phase = line[len(_MARKER):]
+            modules.extend(module._replace(phase=phase) for module in pending)
+            pending = []
+            continue
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            pending.append(ModuleCost(name, '', int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def measure_startup(include_urls=True, importtime=True, watch=DEFERRED_MODULES) -> StartupProfile:
+    """
+    Boot the project in a new interpreter and profile it.
+
+    Args:
+        include_urls: Also time importing the root URLconf
+        importtime: Record per-module import costs (``-X importtime`` adds
+            some overhead, so leave it off when only the phase timings matter)
+        watch: Module names reported in ``StartupProfile.loaded``
+
+    Raises:
+        RuntimeError: If the project fails to start
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', _SCRIPT, json.dumps(list(watch)), '1' if include_urls else '0']
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'),
+        'PYTHONPATH': os.pathsep.join(filter(None, [str(settings.BASE_DIR), os.environ.get('PYTHONPATH')])),
+    }
+    result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"Startup failed:\n{result.stderr[-2000:]}")
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(result.stderr) if importtime else []
+    return StartupProfile(output['timings'], output['loaded'], modules)
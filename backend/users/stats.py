@@ -0,0 +1,210 @@
+"""
+User statistics backed by the ``UserStatCounter`` table.
+
+Every write that changes a counted field adjusts the matching counters by
+a delta, so reading the stats is one query over a table whose size does
+not depend on the number of users:
+
+- ``User.save()`` and deletes, through the ``post_save`` and ``post_delete``
+  receivers, which compare against the values the instance was loaded with
+- the set-based UPDATEs in ``users.bulk`` and the ``bulk_create`` paths,
+  which call ``apply_deltas`` in the same transaction as the write
+
+Graduation state depends on today's date, so users are counted per
+``graduation_expires_on`` date and split into graduated and expired when
+read. A single ``User.save()`` outside a transaction updates its counters
+in a separate statement, and raw SQL bypasses them altogether;
+``manage.py reconcile_user_stats`` recomputes the counters from the users
+table and corrects any drift.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, F, Q, Value, When
+from django.utils import timezone
+
+from .models import User, UserStatCounter
+
+TOTAL = ('total', '')
+
+
+def _key(dimension: str, value) -> tuple:
+    if dimension == 'email_domain':
+        return dimension, 'unitec' if value else 'non_unitec'
+    if dimension == 'graduation_expires_on':
+        return dimension, value.isoformat() if value else ''
+    return dimension, value
+
+
+# Counter dimension of each counted User field
+FIELD_DIMENSIONS = {
+    'approval_status': 'approval_status',
+    'role': 'role',
+    'is_unitec_email': 'email_domain',
+    'graduation_expires_on': 'graduation_expires_on',
+}
+
+
+def keys_for(values: dict) -> list:
+    """Counter keys of a user with the given field values (``total`` included)."""
+    return [TOTAL] + [
+        _key(dimension, values[field]) for field, dimension in FIELD_DIMENSIONS.items() if field in values
+    ]
+
+
+def apply_deltas(deltas) -> None:
+    """
+    Add ``deltas`` (counter key -> change) to the counters.
+
+    One UPDATE when every counter exists; missing ones are created first.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    def update(keys):
+        return UserStatCounter.objects.filter(
+            Q(*[Q(dimension=d, value=v) for d, v in keys], _connector=Q.OR)
+        ).update(count=F('count') + Case(
+            *[When(dimension=d, value=v, then=Value(deltas[(d, v)])) for d, v in keys],
+            default=Value(0),
+            output_field=BigIntegerField(),
+        ))
+
+    if update(deltas) == len(deltas):
+        return
+    with transaction.atomic():
+        existing = set(
+            UserStatCounter.objects.filter(
+                Q(*[Q(dimension=d, value=v) for d, v in deltas], _connector=Q.OR)
+            ).values_list('dimension', 'value')
+        )
+        missing = [key for key in deltas if key not in existing]
+        # Created at zero so a concurrent creator's delta is not lost to the conflict
+        UserStatCounter.objects.bulk_create(
+            [UserStatCounter(dimension=d, value=v) for d, v in missing], ignore_conflicts=True,
+        )
+        update(missing)
+
+
+def record_created(users) -> None:
+    """Count users inserted without ``save()`` (``bulk_create``)."""
+    deltas = Counter()
+    for user in users:
+        deltas.update(keys_for({field: getattr(user, field) for field in FIELD_DIMENSIONS}))
+    apply_deltas(deltas)
+
+
+def record_transitions(field: str, old_values, new) -> None:
+    """Move one user per value in ``old_values`` from that value of ``field`` to ``new``."""
+    dimension = FIELD_DIMENSIONS[field]
+    deltas = Counter()
+    for old in old_values:
+        deltas[_key(dimension, old)] -= 1
+        deltas[_key(dimension, new)] += 1
+    apply_deltas(deltas)
+
+
+def record_save(user: User, created: bool, update_fields=None) -> None:
+    """Adjust the counters for one saved user."""
+    if created:
+        apply_deltas(Counter(keys_for({field: getattr(user, field) for field in FIELD_DIMENSIONS})))
+        return
+    loaded = getattr(user, '_loaded_values', None)
+    if not loaded:
+        # Not loaded from the database, so the old values are unknown; reconciliation catches up
+        return
+    deltas = Counter()
+    for field, dimension in FIELD_DIMENSIONS.items():
+        if field in loaded and (update_fields is None or field in update_fields):
+            deltas[_key(dimension, loaded[field])] -= 1
+            deltas[_key(dimension, getattr(user, field))] += 1
+    apply_deltas(deltas)
+
+
+def record_delete(user: User) -> None:
+    """Adjust the counters for one deleted user."""
+    values = {field: getattr(user, field) for field in FIELD_DIMENSIONS}
+    values.update(getattr(user, '_loaded_values', None) or {})
+    apply_deltas(Counter({key: -1 for key in keys_for(values)}))
+
+
+def get_stats(today=None) -> dict:
+    """
+    Current user counts, read from the counters in one query.
+
+    Returns:
+        dict: ``total`` plus counts by ``approval_status``, ``role``,
+        ``email_domain`` and ``graduation_state``
+    """
+    if today is None:
+        today = timezone.localdate()
+    stats = {
+        'total': 0,
+        'approval_status': {value: 0 for value, _ in User.APPROVAL_STATUS_CHOICES},
+        'role': {value: 0 for value, _ in User.ROLE_CHOICES},
+        'email_domain': {'unitec': 0, 'non_unitec': 0},
+        'graduation_state': {'not_graduated': 0, 'graduated': 0, 'expired': 0},
+    }
+    today = today.isoformat()
+    for dimension, value, count in UserStatCounter.objects.values_list('dimension', 'value', 'count'):
+        if dimension == 'total':
+            stats['total'] = count
+        elif dimension == 'graduation_expires_on':
+            # ISO dates compare in date order
+            state = 'not_graduated' if not value else 'graduated' if value >= today else 'expired'
+            stats['graduation_state'][state] += count
+        else:
+            stats[dimension][value] = stats[dimension].get(value, 0) + count
+    return stats
+
+
+def compute_counts() -> Counter:
+    """Count the users table directly (one GROUP BY per dimension)."""
+    users = User.objects.order_by()
+    counts = Counter({TOTAL: users.count()})
+    for field, dimension in FIELD_DIMENSIONS.items():
+        for value, count in users.values(field).annotate(n=Count('pk')).values_list(field, 'n'):
+            counts[_key(dimension, value)] += count
+    return counts
+
+
+def reconcile(dry_run: bool = False) -> dict:
+    """
+    Recompute the counters from the users table and correct any drift.
+
+    Counters that dropped to zero are deleted so the table only holds
+    values in use.
+
+    Returns:
+        dict: Maps each drifted counter key to ``(stored, actual)``
+    """
+    with transaction.atomic():
+        # Touching every counter takes their row locks (the write lock on
+        # SQLite), so no delta lands between the scan and the overwrite
+        UserStatCounter.objects.update(count=F('count'))
+        stored = dict(
+            ((dimension, value), count)
+            for dimension, value, count in UserStatCounter.objects.values_list('dimension', 'value', 'count')
+        )
+        actual = compute_counts()
+        drift = {
+            key: (stored.get(key, 0), actual.get(key, 0))
+            for key in stored.keys() | actual.keys()
+            if stored.get(key, 0) != actual.get(key, 0)
+        }
+        if dry_run:
+            return drift
+        fixed = [
+            UserStatCounter(dimension=d, value=v, count=actual[(d, v)])
+            for d, v in drift if actual.get((d, v), 0)
+        ]
+        if fixed:
+            UserStatCounter.objects.bulk_create(
+                fixed, update_conflicts=True, unique_fields=['dimension', 'value'], update_fields=['count'],
+            )
+        unused = [key for key in stored if not actual.get(key)]
+        if unused:
+            UserStatCounter.objects.filter(Q(*[Q(dimension=d, value=v) for d, v in unused], _connector=Q.OR)).delete()
+    return drift
@@ -1,3 +1,1364 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+from contextlib import contextmanager, redirect_stderr
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.contrib.auth.hashers import PBKDF2SHA1PasswordHasher
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.utils import ConnectionHandler, load_backend
+from django.http import StreamingHttpResponse
+from django.test import (
+    AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, resolve
+from django.utils import timezone
+from djoser import signals as djoser_signals
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from config.caches import cache_from_env
+from config.databases import PROFILES, database_from_env, replicas_from_env
+from config import schema as schema_module
+from config.schema import generate_schema
+
+from . import bulk, replicas
+from .audit import AuditBuffer, acting_as
+from .authentication import ClaimsJWTAuthentication, snapshots
+from .benchmarks import SCENARIOS, BenchmarkContext, run_scenario, seed_users
+from .bulk import apply_action, apply_approval_decisions, reclassify_emails, sweep_expired_graduates
+from .cache import LRUCache, get_user_version
+from .checks import check_shared_cache
+from .domains import DomainRule, DomainRuleSet, invalidate_rules, match_domain
+from .export import EXPORT_FIELDS
+from .instrumentation import HISTOGRAMS
+from .mail import claim_batch, send_batch
+from .paginators import LargeTablePaginator
+from .search import search_users
+from .serializers import ClaimsTokenObtainPairSerializer
+from .models import AuditLogEntry, BulkActionJob, EmailDomainRule, OutboundEmail, User
+from .startup import DEFERRED_MODULES, SETUP_DEFERRED_MODULES, measure_startup
+from .stats import get_stats, reconcile
+from .utils import derive_email_fields
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EndpointQueryCountTests(TestCase):
+    """
+    Steady-state SQL query budgets of the benchmarked endpoints.
+
+    The table holds more users than a page, so a per-row query on any
+    listing pushes the count past its budget.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_users(120, seed=0)
+
+    def setUp(self):
+        self.ctx = BenchmarkContext()
+
+    def test_query_budgets(self):
+        for scenario in SCENARIOS:
+            with self.subTest(scenario=scenario.name):
+                result = run_scenario(self.ctx, scenario)
+                self.assertEqual(result['status'], scenario.status)
+                self.assertLessEqual(result['queries'], scenario.max_queries)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """
+    What a cold worker imports: settings, django.setup() and the URLconf, in
+    a fresh interpreter. Import sets are deterministic where wall-clock time
+    is not; ``manage.py profile_startup --check`` enforces
+    ``USERS_STARTUP_BUDGET_MS`` on a quiet machine.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.profile = measure_startup(importtime=False, watch=DEFERRED_MODULES + SETUP_DEFERRED_MODULES)
+
+    def test_rarely_used_subsystems_are_deferred(self):
+        loaded = [name for name in self.profile.loaded['urls'] if name in DEFERRED_MODULES]
+        self.assertEqual(loaded, [], f"Imported at startup: {DEFERRED_MODULES}")
+
+    def test_setup_does_not_load_drf_or_schema_generation(self):
+        self.assertEqual(self.profile.loaded['setup'], [])
+
+
+@override_settings(USERS_DB_REPLICAS=['replica1'], USERS_DB_STICKY_SECONDS=60)
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Read routing of ``PrimaryReplicaRouter``; only the chosen aliases are
+    checked, so no replica database is needed.
+    """
+
+    def setUp(self):
+        self.router = replicas.PrimaryReplicaRouter()
+        cache.delete_many([replicas._pin_key(user_id) for user_id in (1, 2)])
+
+    @contextmanager
+    def request(self, pinned=False):
+        _, token = replicas.start_request(pinned)
+        try:
+            yield
+        finally:
+            replicas.end_request(token)
+
+    def test_reads_outside_a_request_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_request_reads_from_the_replica_until_it_writes(self):
+        with self.request():
+            self.assertEqual(self.router.db_for_read(User), 'replica1')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_write(User), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_unsafe_methods_read_from_the_primary(self):
+        with self.request(pinned=True):
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_user_who_wrote_stays_on_the_primary(self):
+        with self.request():
+            replicas.note_user(1)
+            self.router.db_for_write(User)
+        with self.request():
+            replicas.note_user(2)
+            self.assertEqual(self.router.db_for_read(User), 'replica1')
+        with self.request():
+            replicas.note_user(1)
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+
+class GraduationSweepTests(TestCase):
+    """
+    Expired graduates moved out of 'approved' stay where the sweep put them.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            'graduate@myunitec.ac.nz', 'pw', graduation_date=timezone.localdate() - timedelta(days=800),
+        )
+
+    def test_swept_status_survives_saves_and_reclassification(self):
+        self.assertEqual(self.user.approval_status, 'approved')
+        self.assertEqual(sweep_expired_graduates('pending'), 1)
+
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Aroha'
+        user.save()
+        reclassify_emails()
+        self.assertEqual(User.objects.get(pk=self.user.pk).approval_status, 'pending')
+
+    def test_audits_only_users_the_update_changed(self):
+        self.assertEqual(sweep_expired_graduates('pending'), 1)
+        other = User.objects.create_user('other@myunitec.ac.nz', 'pw')
+        User.objects.filter(pk=other.pk).update(approval_status='pending')
+
+        def derive_then_deny(emails):
+            derived = derive_email_fields(emails)
+            # An admin denies the user after reclassify read the chunk
+            User.objects.filter(pk=other.pk).update(approval_status='denied')
+            return derived
+
+        with mock.patch.object(bulk, 'derive_email_fields', derive_then_deny):
+            self.assertEqual(reclassify_emails()['approved'], 0)
+
+        entries = AuditLogEntry.objects.filter(field='approval_status')
+        self.assertEqual(list(entries.values_list('user_id', 'new_value')), [(self.user.pk, 'pending')])
+        self.assertEqual(User.objects.get(pk=other.pk).approval_status, 'denied')
+
+
+class DomainRuleTests(TestCase):
+    """
+    Email domains are classified by the most specific rule, and edits to the
+    rules take effect without a restart.
+    """
+
+    def setUp(self):
+        # The compiled rules outlive each test's rolled back rows
+        invalidate_rules()
+        self.addCleanup(invalidate_rules)
+
+    def add_rule(self, pattern, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return EmailDomainRule.objects.create(pattern=pattern, **fields)
+
+    def test_wildcard_matches_subdomains_only(self):
+        rules = DomainRuleSet([DomainRule('*.unitec.ac.nz', True, False)])
+        self.assertEqual(rules.match('staff.unitec.ac.nz').pattern, '*.unitec.ac.nz')
+        self.assertEqual(rules.match('a.b.unitec.ac.nz').pattern, '*.unitec.ac.nz')
+        self.assertIsNone(rules.match('unitec.ac.nz'))
+        self.assertIsNone(rules.match('notunitec.ac.nz'))
+        self.assertIsNone(rules.match('staff.unitec.ac.nz.example.com'))
+
+    def test_case_and_trailing_dot_are_ignored(self):
+        rules = DomainRuleSet([DomainRule('myunitec.ac.nz', True, True), DomainRule('*.unitec.ac.nz', True, False)])
+        self.assertEqual(rules.match('MyUnitec.AC.nz.').pattern, 'myunitec.ac.nz')
+        self.assertEqual(rules.match('Staff.UNITEC.ac.nz.').pattern, '*.unitec.ac.nz')
+
+    def test_most_specific_rule_wins(self):
+        rules = DomainRuleSet([
+            DomainRule('*.ac.nz', False, False),
+            DomainRule('*.unitec.ac.nz', True, False),
+            DomainRule('students.unitec.ac.nz', True, True),
+        ])
+        self.assertEqual(rules.match('students.unitec.ac.nz').pattern, 'students.unitec.ac.nz')
+        self.assertEqual(rules.match('x.students.unitec.ac.nz').pattern, '*.unitec.ac.nz')
+        self.assertEqual(rules.match('staff.unitec.ac.nz').pattern, '*.unitec.ac.nz')
+        self.assertEqual(rules.match('auckland.ac.nz').pattern, '*.ac.nz')
+
+    def test_database_rule_overrides_settings(self):
+        self.assertTrue(match_domain('myunitec.ac.nz').auto_approve)
+        self.add_rule('myunitec.ac.nz', auto_approve=False)
+        self.assertEqual(match_domain('myunitec.ac.nz'), DomainRule('myunitec.ac.nz', True, False))
+
+    def test_saved_rules_apply_without_restart(self):
+        self.assertIsNone(match_domain('staff.unitec.ac.nz'))
+        rule = self.add_rule('*.unitec.ac.nz')
+        self.assertEqual(match_domain('staff.unitec.ac.nz').pattern, '*.unitec.ac.nz')
+
+        rule.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertIsNone(match_domain('staff.unitec.ac.nz'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EmailDomainRule.objects.create(pattern='Staff.Unitec.ac.nz', auto_approve=False)
+        self.assertEqual(match_domain('staff.unitec.ac.nz').pattern, 'staff.unitec.ac.nz')
+
+    def test_reclassify_emails_command_applies_new_rules(self):
+        staff = User.objects.create_user('tutor@staff.unitec.ac.nz', 'pw')
+        denied = User.objects.create_user('denied@staff.unitec.ac.nz', 'pw', approval_status='denied')
+        other = User.objects.create_user('someone@example.com', 'pw')
+        self.assertEqual((staff.is_unitec_email, staff.approval_status), (False, 'pending'))
+
+        self.add_rule('*.unitec.ac.nz')
+        out = StringIO()
+        call_command('reclassify_emails', stdout=out)
+
+        staff.refresh_from_db()
+        denied.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((staff.is_unitec_email, staff.approval_status), (True, 'approved'))
+        self.assertEqual((denied.is_unitec_email, denied.approval_status), (True, 'denied'))
+        self.assertEqual((other.is_unitec_email, other.approval_status), (False, 'pending'))
+        self.assertIn('2 email classification(s) changed, 1 pending user(s) approved', out.getvalue())
+
+
+class InstrumentationTests(TestCase):
+    """
+    Responses carry a ``Server-Timing`` header and ``/metrics`` serves the
+    per-view histograms in the Prometheus text format.
+    """
+
+    def setUp(self):
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+        self.user = User.objects.create_user('student@example.com', 'S3cure-pass!', approval_status='approved')
+        self.login = self.client.post(
+            '/auth/jwt/create/', {'email': 'student@example.com', 'password': 'S3cure-pass!'},
+            content_type='application/json',
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {self.login.json()['access']}"}
+
+    def timings(self, response):
+        return {
+            name: params for name, _, params in
+            (entry.strip().partition(';') for entry in response['Server-Timing'].split(','))
+        }
+
+    def test_server_timing_header(self):
+        timings = self.timings(self.client.get('/me/', **self.auth))
+        self.assertRegex(timings['db'], r'^dur=\d+\.\d{2};desc="\d+ queries"$')
+        self.assertRegex(timings['total'], r'^dur=\d+\.\d{2}$')
+        self.assertNotIn('hash', timings)
+        # The login checked a password
+        self.assertRegex(self.timings(self.login)['hash'], r'^dur=\d+\.\d{2}$')
+
+    @override_settings(USERS_SERVER_TIMING_HEADER=False)
+    def test_header_can_be_turned_off(self):
+        # The setting is read when the middleware is loaded
+        self.assertNotIn('Server-Timing', Client().get('/me/', **self.auth))
+
+    def test_metrics_count_requests(self):
+        view = resolve('/me/').view_name
+        count = f'http_request_duration_seconds_count{{view="{view}",method="GET",status="200"}}'
+
+        self.client.get('/me/', **self.auth)
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(f'http_request_db_queries_bucket{{view="{view}",le="+Inf"}} 1', body)
+        self.assertIn(f'{count} 1\n', body)
+
+        self.client.get('/me/', **self.auth)
+        self.client.get('/me/', **self.auth)
+        self.assertIn(f'{count} 3\n', self.client.get('/metrics').content.decode())
+
+    def test_metrics_are_local_only(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.9').status_code, 404)
+
+
+class SchemaTests(SimpleTestCase):
+    """
+    The generated OpenAPI schema documents the API's own views.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with redirect_stderr(StringIO()):
+            cls.schema = generate_schema()
+
+    def test_jwt_auth_schemes_are_resolved(self):
+        schemes = self.schema['components']['securitySchemes']
+        self.assertEqual(schemes['jwtAuth']['scheme'], 'bearer')
+        self.assertEqual(schemes['claimsJwtAuth']['scheme'], 'bearer')
+        self.assertIn({'claimsJwtAuth': []}, self.schema['paths']['/users/']['get']['security'])
+        self.assertIn({'jwtAuth': []}, self.schema['paths']['/auth/users/me/']['get']['security'])
+
+    def test_function_and_export_views_are_documented(self):
+        paths = self.schema['paths']
+        self.assertEqual(
+            paths['/me/']['get']['responses']['200']['content']['application/json']['schema']['$ref'],
+            '#/components/schemas/Me',
+        )
+        self.assertIn('requestBody', paths['/me/profile/']['patch'])
+        export = paths['/users/export.{export_format}']['get']
+        self.assertEqual(set(export['responses']['200']['content']), {'text/csv', 'application/x-ndjson'})
+        self.assertLessEqual({'q', 'approval_status', 'role'}, {param['name'] for param in export['parameters']})
+
+
+class SchemaViewTests(SimpleTestCase):
+    """
+    ``/schema/`` serves the rendered schema with an ETag per encoding and
+    answers revalidations with 304.
+    """
+
+    def setUp(self):
+        rendered = {
+            'yaml': schema_module._pack(b'openapi: 3.0.3\n'),
+            'json': schema_module._pack(b'{"openapi":"3.0.3"}'),
+        }
+        patcher = mock.patch.dict(schema_module._state, rendered=rendered)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.yaml = rendered['yaml']
+
+    def test_plain_response(self):
+        response = self.client.get('/schema/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'openapi: 3.0.3\n')
+        self.assertEqual(response['ETag'], self.yaml.etag)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        self.assertLessEqual({'Accept', 'Accept-Encoding'}, {value.strip() for value in response['Vary'].split(',')})
+        self.assertEqual(self.client.get('/schema/?format=json').content, b'{"openapi":"3.0.3"}')
+
+    def test_gzip_response(self):
+        response = self.client.get('/schema/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'openapi: 3.0.3\n')
+        self.assertEqual(response['ETag'], self.yaml.etag[:-1] + '-gzip"')
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get('/schema/', HTTP_IF_NONE_MATCH=self.yaml.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], self.yaml.etag)
+
+        gzip_etag = self.yaml.etag[:-1] + '-gzip"'
+        response = self.client.get('/schema/', HTTP_IF_NONE_MATCH=gzip_etag, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 304)
+        # The other encoding's ETag doesn't match
+        self.assertEqual(self.client.get('/schema/', HTTP_IF_NONE_MATCH=gzip_etag).status_code, 200)
+
+    def test_unbuilt_schema_is_unavailable(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(schema_module._state, rendered=None), \
+                self.settings(USERS_SCHEMA_CACHE_DIR=Path(tmp), USERS_SCHEMA_GENERATE_ON_REQUEST=False), \
+                self.assertLogs('config.schema', 'ERROR'):
+            response = self.client.get('/schema/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '60')
+
+
+class UndocumentedView(APIView):
+    def get(self, request):
+        return Response({})
+
+
+# URLconf for RegenerateSchemaTests: a view the generator can only skip
+urlpatterns = [path('undocumented/', UndocumentedView.as_view())]
+
+
+class RegenerateSchemaTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = Path(cache_dir.name)
+
+    def test_builds_schema_without_generator_errors(self):
+        with override_settings(USERS_SCHEMA_CACHE_DIR=self.cache_dir), redirect_stderr(StringIO()):
+            call_command('regenerate_schema', skip_validation=True, stdout=StringIO())
+        self.assertEqual(len(list(self.cache_dir.glob('*.schema.*'))), 2)
+
+    @override_settings(ROOT_URLCONF='users.tests')
+    def test_fails_on_generator_errors(self):
+        with override_settings(USERS_SCHEMA_CACHE_DIR=self.cache_dir), redirect_stderr(StringIO()):
+            with self.assertRaisesMessage(CommandError, 'generator error'):
+                call_command('regenerate_schema', skip_validation=True)
+            self.assertEqual(list(self.cache_dir.iterdir()), [])
+            call_command('regenerate_schema', skip_validation=True, allow_errors=True, stdout=StringIO())
+        self.assertEqual(len(list(self.cache_dir.glob('*.schema.*'))), 2)
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher', 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+])
+class AsyncAuthTests(TestCase):
+    """
+    The async signup and login endpoints behave like djoser's sync ones.
+    """
+
+    def setUp(self):
+        self.client = AsyncClient()
+
+    async def test_register_sends_signal_and_activation_email(self):
+        registered = []
+
+        def receiver(sender, user, request, **kwargs):
+            registered.append(user.email)
+
+        djoser_signals.user_registered.connect(receiver)
+        self.addCleanup(djoser_signals.user_registered.disconnect, receiver)
+        djoser = {**settings.DJOSER, 'SEND_ACTIVATION_EMAIL': True}
+        with override_settings(DJOSER=djoser):
+            response = await self.client.post('/auth/async/users/', {
+                'email': 'new@myunitec.ac.nz', 'password': 'S3cure-pass!', 'first_name': 'Aroha', 'last_name': 'Ngata',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(registered, ['new@myunitec.ac.nz'])
+        self.assertEqual([message.to for message in mail.outbox], [['new@myunitec.ac.nz']])
+        user = await User.objects.aget(email='new@myunitec.ac.nz')
+        self.assertEqual(user.approval_status, 'approved')
+        self.assertTrue(user.check_password('S3cure-pass!'))
+
+    async def test_login_upgrades_outdated_hash(self):
+        encoded = PBKDF2SHA1PasswordHasher().encode('S3cure-pass!', 'salt', iterations=1000)
+        await User.objects.acreate(email='old@example.com', password=encoded)
+        response = await self.client.post(
+            '/auth/async/jwt/create/', {'email': 'old@example.com', 'password': 'S3cure-pass!'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        user = await User.objects.aget(email='old@example.com')
+        self.assertTrue(user.password.startswith('md5$'))
+        self.assertTrue(user.check_password('S3cure-pass!'))
+
+
+class AsyncMeTests(TransactionTestCase):
+    """
+    The async /me/ and profile endpoints match the sync ones. Saves commit
+    for real, so the version bump behind the ETag runs.
+    """
+
+    def setUp(self):
+        cache.clear()
+        snapshots.clear()
+        self.user = User.objects.create_user('student@example.com', 'pw', first_name='Aroha', last_name='Ngata')
+        access = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.auth = {'Authorization': f'Bearer {access}'}
+        self.client = AsyncClient()
+
+    async def get_me(self, **headers):
+        return await self.client.get('/async/me/', headers={**self.auth, **headers})
+
+    async def update(self, method, data):
+        return await getattr(self.client, method)(
+            '/async/me/profile/', data, content_type='application/json', headers=self.auth,
+        )
+
+    async def test_get_and_revalidate(self):
+        response = await self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['email'], 'student@example.com')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        revalidated = await self.get_me(**{'If-None-Match': response['ETag']})
+        self.assertEqual((revalidated.status_code, revalidated.content), (304, b''))
+
+    async def test_patch_and_put_update_the_profile(self):
+        etag = (await self.get_me())['ETag']
+        response = await self.update('patch', {'first_name': 'Mere'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['first_name'], response.json()['last_name']), ('Mere', 'Ngata'))
+
+        response = await self.get_me(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['first_name'], 'Mere')
+
+        # PUT replaces the profile, so required fields must be present
+        self.assertEqual((await self.update('put', {'first_name': 'Hine'})).status_code, 400)
+        response = await self.update('put', {'first_name': 'Hine', 'last_name': 'Parata', 'year_group': '2'})
+        self.assertEqual(response.status_code, 200)
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertEqual((user.first_name, user.last_name, user.year_group), ('Hine', 'Parata', '2'))
+
+    async def test_invalid_bodies_are_rejected(self):
+        for body in ('{not json', []):
+            response = await self.update('patch', body)
+            self.assertEqual((response.status_code, response.json()), (400, {'detail': 'Invalid JSON body.'}))
+        response = await self.update('patch', {'unitec_id': 'not-an-id'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('unitec_id', response.json())
+
+    async def test_requires_a_token(self):
+        response = await AsyncClient().get('/async/me/')
+        self.assertEqual(response.status_code, 401)
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    """
+    Every ``DJANGO_DB_PROFILE`` gives settings a connection can be built from.
+    """
+
+    def connect(self, database):
+        # Fill in Django's defaults for the settings, as for DATABASES
+        settings_dict = ConnectionHandler({'default': database}).settings['default']
+        connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'profile')
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_every_profile_is_valid(self):
+        for profile in PROFILES:
+            # A fresh file each time: WAL mode persists in the database file
+            with self.subTest(profile=profile), tempfile.TemporaryDirectory() as tmp:
+                connection = self.connect(database_from_env(Path(tmp), {'DJANGO_DB_PROFILE': profile}))
+                params = connection.get_connection_params()
+                if connection.vendor == 'sqlite':
+                    with connection.cursor() as cursor:
+                        cursor.execute('PRAGMA journal_mode')
+                        journal_mode = cursor.fetchone()[0]
+                    self.assertEqual(journal_mode, 'delete' if profile == 'sqlite-default' else 'wal')
+                else:
+                    self.assertEqual(params['dbname'], 'inventory')
+                    self.assertEqual(connection.settings_dict['OPTIONS']['pool']['max_size'], 20)
+
+    def test_defaults_to_tuned_sqlite(self):
+        base = Path('/srv/app')
+        database = database_from_env(base, {})
+        self.assertEqual(database['NAME'], base / 'db.sqlite3')
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(database_from_env(base, {'SQLITE_PATH': '/data/users.db'})['NAME'], '/data/users.db')
+        with self.assertRaisesMessage(ValueError, "Unknown DJANGO_DB_PROFILE 'mysql'"):
+            database_from_env(base, {'DJANGO_DB_PROFILE': 'mysql'})
+
+    def test_unpooled_postgres_keeps_persistent_connections(self):
+        database = database_from_env(Path('.'), {'DJANGO_DB_PROFILE': 'postgres', 'POSTGRES_POOL_MAX_SIZE': '0'})
+        self.assertNotIn('pool', database['OPTIONS'])
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+
+    def test_replicas_mirror_default_in_tests(self):
+        base = Path('/srv/app')
+        replicas = replicas_from_env(base, {'DJANGO_DB_REPLICAS': 'r1.sqlite3, r2.sqlite3', 'SQLITE_PATH': '/x'})
+        self.assertEqual([replicas[alias]['NAME'] for alias in replicas], [base / 'r1.sqlite3', base / 'r2.sqlite3'])
+        self.assertEqual(replicas['replica1']['TEST'], {'MIRROR': 'default'})
+
+        replicas = replicas_from_env(base, {'DJANGO_DB_PROFILE': 'postgres', 'DJANGO_DB_REPLICAS': 'db2:5433'})
+        self.assertEqual((replicas['replica1']['HOST'], replicas['replica1']['PORT']), ('db2', '5433'))
+
+
+class SharedCacheTests(SimpleTestCase):
+    redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+
+    def test_cache_from_env(self):
+        self.assertEqual(cache_from_env({})['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        redis = cache_from_env({'DJANGO_CACHE_URL': 'redis://cache:6379/0,redis://replica:6379/0'})
+        self.assertEqual(redis['LOCATION'], ['redis://cache:6379/0', 'redis://replica:6379/0'])
+        memcached = cache_from_env({'DJANGO_CACHE_URL': 'memcached://a:11211,memcached://b:11211'})
+        self.assertEqual(memcached['LOCATION'], ['a:11211', 'b:11211'])
+        with self.assertRaisesMessage(ValueError, "Unsupported DJANGO_CACHE_URL 'db://x'"):
+            cache_from_env({'DJANGO_CACHE_URL': 'db://x'})
+
+    @override_settings(USERS_SINGLE_PROCESS=False)
+    def test_warns_about_process_local_cache(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['users.W001'])
+        with override_settings(CACHES=self.redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(USERS_SINGLE_PROCESS=True)
+    def test_allows_local_cache_in_a_single_process(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProcessLocalCacheTests(TestCase):
+    """
+    With a per-process cache, a change whose version bump only another
+    worker saw still takes effect: claims and cached payloads aren't trusted.
+    """
+
+    def setUp(self):
+        cache.clear()
+        snapshots.clear()
+        self.user = User.objects.create_user('student@example.com', 'S3cure-pass!', approval_status='approved')
+        response = self.client.post(
+            '/auth/jwt/create/', {'email': 'student@example.com', 'password': 'S3cure-pass!'},
+            content_type='application/json',
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+        self.assertEqual(self.client.get('/me/', **self.auth).status_code, 200)
+        # Changed by another worker: this process's version stamp is not bumped
+        User.objects.filter(pk=self.user.pk).update(role='admin', first_name='Changed')
+
+    def test_shared_cache_trusts_claims_and_cached_payload(self):
+        self.assertEqual(self.client.get('/users/', **self.auth).status_code, 403)
+        self.assertEqual(self.client.get('/me/', **self.auth).json()['first_name'], '')
+
+    @override_settings(USERS_SINGLE_PROCESS=False)
+    def test_process_local_cache_reads_the_database(self):
+        self.assertEqual(self.client.get('/users/', **self.auth).status_code, 200)
+        response = self.client.get('/me/', **self.auth)
+        self.assertEqual(response.json()['first_name'], 'Changed')
+        self.assertNotIn('ETag', response)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class MeConditionalRequestTests(TestCase):
+    """
+    /me/ is served with validators from the user's cache version and
+    revalidated with 304s until the user changes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        snapshots.clear()
+        self.user = User.objects.create_user('student@example.com', 'S3cure-pass!', first_name='Aroha')
+        response = self.client.post(
+            '/auth/jwt/create/', {'email': 'student@example.com', 'password': 'S3cure-pass!'},
+            content_type='application/json',
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+
+    def get_me(self, **headers):
+        return self.client.get('/me/', **self.auth, **headers)
+
+    def test_validators_and_revalidation(self):
+        response = self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{self.user.pk}-{get_user_version(self.user.pk)}"')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertIn('Authorization', response['Vary'])
+
+        for headers in ({'HTTP_IF_NONE_MATCH': response['ETag']},
+                        {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']}):
+            revalidated = self.get_me(**headers)
+            self.assertEqual((revalidated.status_code, revalidated.content), (304, b''))
+            self.assertEqual(revalidated['ETag'], response['ETag'])
+
+    def test_profile_update_changes_the_etag(self):
+        etag = self.get_me()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                '/me/profile/', {'first_name': 'Mere'}, content_type='application/json', **self.auth,
+            )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get_me(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['first_name'], 'Mere')
+
+    def test_save_elsewhere_changes_the_etag(self):
+        etag = self.get_me()['ETag']
+        user = User.objects.get(pk=self.user.pk)
+        user.year_group = 'Year 2'
+        # As the admin's change form saves it
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        response = self.get_me(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['year_group'], 'Year 2')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ClaimsAuthenticationTests(TestCase):
+    """
+    ``ClaimsJWTAuthentication`` trusts token claims and LRU snapshots only
+    at the user's current version; a change re-reads the row.
+    """
+
+    def setUp(self):
+        cache.clear()
+        snapshots.clear()
+        self.user = User.objects.create_user(
+            'staff@example.com', 'S3cure-pass!', role='admin', approval_status='approved',
+        )
+        response = self.client.post(
+            '/auth/jwt/create/', {'email': 'staff@example.com', 'password': 'S3cure-pass!'},
+            content_type='application/json',
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+
+    def authenticate(self):
+        request = RequestFactory().get('/users/', **self.auth)
+        user, _ = ClaimsJWTAuthentication().authenticate(request)
+        return user
+
+    def save(self, **fields):
+        user = User.objects.get(pk=self.user.pk)
+        for name, value in fields.items():
+            setattr(user, name, value)
+        # The version is bumped once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+    def test_current_claims_authenticate_without_a_query(self):
+        self.authenticate()  # builds the revocation filter
+        snapshots.clear()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual((user.role, user.approval_status), ('admin', 'approved'))
+
+    def test_approval_change_is_rechecked_on_the_next_request(self):
+        self.assertEqual(self.client.get('/users/', **self.auth).status_code, 200)
+        self.save(approval_status='denied')
+
+        self.assertEqual(self.client.get('/users/', **self.auth).status_code, 403)
+        self.assertEqual(snapshots.get(self.user.pk)['approval_status'], 'denied')
+
+    def test_revoked_tokens_are_rejected_despite_a_cached_snapshot(self):
+        self.assertEqual(self.client.get('/users/', **self.auth).status_code, 200)
+        apply_approval_decisions({'denied': [self.user.pk]}, expected_status='approved')
+
+        response = self.client.get('/users/', **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_revoked')
+
+    def test_snapshot_is_replaced_after_a_change(self):
+        stale = self.authenticate().version
+        self.save(role='student')
+
+        user = self.authenticate()
+        self.assertGreater(user.version, stale)
+        self.assertEqual(snapshots.get(self.user.pk), {
+            'id': self.user.pk, 'role': 'student', 'approval_status': 'approved', 'is_active': True,
+            'is_staff': False, 'is_superuser': False, 'version': user.version,
+        })
+
+    def test_lru_evicts_the_least_recently_used_snapshot(self):
+        lru = LRUCache(2)
+        lru.set(1, 'a')
+        lru.set(2, 'b')
+        lru.get(1)
+        lru.set(3, 'c')
+        self.assertEqual((lru.get(1), lru.get(2), lru.get(3), len(lru)), ('a', None, 'c', 2))
+
+
+class UserIndexTests(TestCase):
+    """
+    The listing filters, changelist ordering and search lookups are planned
+    on the indexes added for them, without sorting in a temporary B-tree.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_users(200, seed=1)
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_listing_filters_and_ordering(self):
+        newest = ('-created_at', '-id')
+        self.assertUsesIndex(User.objects.order_by(*newest)[:50], 'user_created_idx')
+        self.assertUsesIndex(
+            User.objects.filter(approval_status='pending').order_by(*newest)[:50], 'user_approval_created_idx',
+        )
+        self.assertUsesIndex(User.objects.filter(role='admin').order_by(*newest)[:50], 'user_role_created_idx')
+        self.assertUsesIndex(
+            User.objects.filter(graduation_date__lt=timezone.localdate()), 'user_graduation_idx',
+        )
+        # Most seeded users are Unitec, so SQLite walks the ordering index instead; either avoids the sort
+        self.assertNotIn('TEMP B-TREE', User.objects.filter(is_unitec_email=True).order_by(*newest)[:50].explain())
+
+    def test_search_lookups(self):
+        self.assertUsesIndex(User.objects.filter(unitec_id='1234567'), 'user_unitec_id_idx')
+        plan = search_users(User.objects.all(), 'aroha').explain()
+        self.assertIn('USING INDEX user_unitec_id_idx', plan)
+        self.assertIn('USING INDEX user_email_lower_idx', plan)
+
+
+class UserSearchTests(TestCase):
+    """
+    The FTS index follows every kind of write through its triggers.
+    """
+
+    def search(self, term):
+        return sorted(search_users(User.objects.all(), term).values_list('email', flat=True))
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        user = User.objects.create_user('aroha@example.com', 'pw', first_name='Aroha', last_name='Ngata')
+        User.objects.bulk_create([User(email='mere@example.com', first_name='Mere', last_name='Ngata')])
+        self.assertEqual(self.search('ngata'), ['aroha@example.com', 'mere@example.com'])
+
+        user.last_name = 'Parata'
+        user.save()
+        User.objects.filter(email='mere@example.com').update(first_name='Hine')
+        self.assertEqual(self.search('ngata'), ['mere@example.com'])
+        self.assertEqual(self.search('parata'), ['aroha@example.com'])
+        self.assertEqual(self.search('mere'), ['mere@example.com'])  # by email
+        self.assertEqual(self.search('hine ngata'), ['mere@example.com'])
+
+        user.delete()
+        User.objects.filter(email='mere@example.com').delete()
+        self.assertEqual(self.search('parata'), [])
+        self.assertEqual(self.search('hine'), [])
+
+    def test_terms_match_word_prefixes(self):
+        User.objects.create_user('aroha@example.com', 'pw', first_name='Aroha', unitec_id='1234567')
+        self.assertEqual(self.search('aro'), ['aroha@example.com'])
+        self.assertEqual(self.search('1234567'), ['aroha@example.com'])
+        self.assertEqual(self.search('oha'), [])
+
+
+class WorkerKilled(BaseException):
+    """Stands in for a worker process killed in the middle of a job."""
+
+
+class BulkJobLeaseTests(TestCase):
+    """
+    run_bulk_jobs requeues jobs abandoned by a dead worker and resumes them.
+    """
+
+    def setUp(self):
+        self.ids = [User.objects.create_user(f'user{n}@example.com', 'pw').pk for n in range(4)]
+
+    def make_job(self, heartbeat_age):
+        heartbeat = timezone.now() - timedelta(seconds=heartbeat_age)
+        return BulkActionJob.objects.create(
+            action='approve', status='running', user_ids=self.ids, total=4, processed=2, updated=2,
+            started_at=heartbeat, heartbeat_at=heartbeat,
+        )
+
+    @override_settings(USERS_BULK_JOB_LEASE=60)
+    def test_stale_job_is_resumed_after_recorded_progress(self):
+        job = self.make_job(heartbeat_age=120)
+        call_command('run_bulk_jobs', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.updated), ('done', 4, 4))
+        statuses = dict(User.objects.filter(pk__in=self.ids).values_list('pk', 'approval_status'))
+        self.assertEqual([statuses[pk] for pk in self.ids], ['pending', 'pending', 'approved', 'approved'])
+
+    @override_settings(USERS_BULK_JOB_LEASE=60, USERS_BULK_CHUNK_SIZE=1)
+    def test_job_whose_thread_died_is_recovered(self):
+        job = BulkActionJob.objects.create(action='approve', user_ids=self.ids, total=4)
+        revoke = bulk.revoke_user_tokens
+
+        def die_in_second_chunk(user_ids):
+            if user_ids == [self.ids[1]]:
+                raise WorkerKilled
+            return revoke(user_ids)
+
+        # The worker dies in the middle of the second chunk, skipping every handler
+        with mock.patch.object(bulk, 'revoke_user_tokens', die_in_second_chunk), self.assertRaises(WorkerKilled):
+            bulk.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('running', 1))
+        self.assertEqual(User.objects.filter(pk__in=self.ids, approval_status='approved').count(), 1)
+
+        BulkActionJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=120))
+        out = StringIO()
+        call_command('run_bulk_jobs', stdout=out)
+        self.assertIn('Requeued 1 abandoned job(s).', out.getvalue())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.updated), ('done', 4, 4))
+        self.assertEqual(User.objects.filter(pk__in=self.ids, approval_status='approved').count(), 4)
+        self.assertEqual(sorted(AuditLogEntry.objects.values_list('user_id', flat=True)), self.ids)
+        self.assertEqual(reconcile(dry_run=True), {})
+
+    @override_settings(USERS_BULK_JOB_LEASE=60)
+    def test_job_with_recent_heartbeat_is_left_running(self):
+        job = self.make_job(heartbeat_age=10)
+        call_command('run_bulk_jobs', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('running', 2))
+
+
+class UserListTests(TestCase):
+    """
+    The admin listing pages with a cursor, trims fields on request and
+    applies the changelist filters.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_users(12, seed=3)
+        # Rows sharing a created_at are told apart by id within the cursor
+        User.objects.filter(pk__in=User.objects.order_by('pk').values('pk')[:6]).update(
+            created_at=timezone.now() - timedelta(days=1),
+        )
+        cls.admin = User.objects.create_user('admin@example.com', 'pw', role='admin', approval_status='approved')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_cursor_walks_every_user_once_in_order(self):
+        seen = []
+        url = '/users/?page_size=5&fields=id'
+        while url:
+            body = self.client.get(url).json()
+            seen.extend(row['id'] for row in body['results'])
+            url = body['next']
+
+        expected = list(User.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 13)
+
+    def test_fields_trim_the_payload_and_the_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/users/', {'fields': 'id,email,role'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({tuple(row) for row in response.json()['results']}, {('id', 'email', 'role')})
+        listing = next(query['sql'] for query in queries if 'LIMIT' in query['sql'])
+        self.assertNotIn('first_name', listing)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/users/', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': 'Unknown field(s): password.'})
+
+    def test_filters(self):
+        params = {'approval_status': 'pending', 'email_domain': 'unitec', 'fields': 'email'}
+        response = self.client.get('/users/', params)
+        expected = User.objects.filter(approval_status='pending', is_unitec_email=True).values_list('email', flat=True)
+        self.assertEqual(sorted(row['email'] for row in response.json()['results']), sorted(expected))
+        self.assertEqual(self.client.get('/users/', {'role': 'wizard'}).status_code, 400)
+
+
+class ApprovalQueueTests(TestCase):
+    """
+    Batch decisions only apply to users still in ``expected_status``.
+    """
+
+    def setUp(self):
+        admin = User.objects.create_user('admin@example.com', 'pw', role='admin', approval_status='approved')
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.pending = User.objects.create_user('pending@example.com', 'pw')
+        self.decided = User.objects.create_user('decided@example.com', 'pw')
+
+    def decide(self, **payload):
+        response = self.client.post('/users/approvals/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_stale_expected_status_reports_conflict_and_not_found(self):
+        # Another admin denies the user after this one loaded the queue
+        self.decide(denied=[self.decided.pk])
+        body = self.decide(approved=[self.pending.pk, self.decided.pk, 999999], expected_status='pending')
+
+        self.assertEqual(body['updated'], 1)
+        self.assertEqual(body['results'], [
+            {'id': self.pending.pk, 'outcome': 'updated', 'approval_status': 'approved'},
+            {'id': self.decided.pk, 'outcome': 'conflict', 'approval_status': 'denied'},
+            {'id': 999999, 'outcome': 'not_found', 'approval_status': None},
+        ])
+        self.assertEqual(User.objects.get(pk=self.decided.pk).approval_status, 'denied')
+
+    def test_nothing_changes_when_no_user_is_in_expected_status(self):
+        body = self.decide(approved=[self.pending.pk], expected_status='denied')
+
+        self.assertEqual(body['updated'], 0)
+        self.assertEqual(body['results'][0]['outcome'], 'conflict')
+        self.assertEqual(User.objects.get(pk=self.pending.pk).approval_status, 'pending')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenRevocationTests(TestCase):
+    """
+    Revoked tokens are rejected, whether revoked one by one or by an
+    approval change.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('student@myunitec.ac.nz', 'S3cure-pass!')
+        self.client = APIClient()
+        response = self.client.post(
+            '/auth/jwt/create/', {'email': 'student@myunitec.ac.nz', 'password': 'S3cure-pass!'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.tokens = response.json()
+
+    def get_me(self):
+        return self.client.get('/me/', HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_revoked_refresh_token_is_rejected(self):
+        refresh = {'refresh': self.tokens['refresh']}
+        self.assertEqual(self.client.post('/auth/jwt/refresh/', refresh, format='json').status_code, 200)
+        self.assertEqual(self.client.post('/auth/jwt/revoke/', refresh, format='json').status_code, 204)
+        self.assertEqual(self.client.post('/auth/jwt/refresh/', refresh, format='json').status_code, 401)
+
+    def test_approval_change_revokes_issued_tokens(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        apply_action('deny', [self.user.pk])
+
+        response = self.get_me()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_revoked')
+        refresh = {'refresh': self.tokens['refresh']}
+        self.assertEqual(self.client.post('/auth/jwt/refresh/', refresh, format='json').status_code, 401)
+
+    def test_unchanged_status_keeps_tokens(self):
+        stats = get_stats()['approval_status']
+        self.assertEqual(self.user.approval_status, 'approved')
+        self.assertEqual(apply_action('approve', [self.user.pk]), 0)
+
+        self.assertEqual(self.get_me().status_code, 200)
+        self.assertFalse(AuditLogEntry.objects.exists())
+        self.assertEqual(get_stats()['approval_status'], stats)
+
+
+class AuditLogTests(TestCase):
+    """
+    Changes are written to the audit log in batches, and the log is append-only.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin@example.com', 'pw', role='admin', approval_status='approved')
+        self.users = [User.objects.create_user(f'user{n}@example.com', 'pw') for n in range(3)]
+
+    def test_buffer_writes_full_batches_and_the_rest_on_close(self):
+        with AuditBuffer(self.admin, 'test', batch_size=2) as audit:
+            for user in self.users:
+                audit.record(user.pk, 'approval_status', 'pending', 'approved')
+            # Unchanged values are not recorded
+            audit.record(self.users[0].pk, 'role', 'student', 'student')
+            self.assertEqual(AuditLogEntry.objects.count(), 2)
+        self.assertEqual(audit.written, 3)
+        self.assertEqual(set(AuditLogEntry.objects.values_list('actor_id', 'source')), {(self.admin.pk, 'test')})
+
+    def test_bulk_action_and_save_are_audited(self):
+        apply_action('approve', [user.pk for user in self.users[:2]], chunk_size=1, actor=self.admin)
+        user = User.objects.get(pk=self.users[2].pk)
+        user.role = 'admin'
+        with acting_as(self.admin, 'profile'):
+            user.save()
+
+        self.assertEqual(
+            sorted(AuditLogEntry.objects.values_list('user_id', 'field', 'old_value', 'new_value', 'source')),
+            sorted([
+                (self.users[0].pk, 'approval_status', 'pending', 'approved', 'admin_action'),
+                (self.users[1].pk, 'approval_status', 'pending', 'approved', 'admin_action'),
+                (self.users[2].pk, 'role', 'student', 'admin', 'profile'),
+            ]),
+        )
+
+    def test_entries_cannot_be_changed_or_deleted(self):
+        apply_action('deny', [self.users[0].pk])
+        entry = AuditLogEntry.objects.get()
+        entry.new_value = 'approved'
+        for attempt in (entry.save, entry.delete, AuditLogEntry.objects.all().delete,
+                        lambda: AuditLogEntry.objects.update(new_value='approved')):
+            with self.assertRaises(TypeError):
+                attempt()
+        # Entries outlive the users they refer to
+        User.objects.filter(pk=self.users[0].pk).delete()
+        self.assertEqual(AuditLogEntry.objects.get().new_value, 'denied')
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("mail server down")
+
+
+@override_settings(
+    EMAIL_BACKEND='users.mail.QueuedEmailBackend', USERS_EMAIL_RETRY_BACKOFF=30, USERS_EMAIL_MAX_ATTEMPTS=2,
+)
+class OutboundEmailTests(TestCase):
+    """
+    Sent mail is queued in the database and delivered by the worker.
+    """
+
+    locmem = 'django.core.mail.backends.locmem.EmailBackend'
+
+    def setUp(self):
+        mail.send_mail('Welcome', 'Hello', None, ['student@example.com'])
+        self.email = OutboundEmail.objects.get()
+
+    def test_queued_email_is_delivered(self):
+        self.assertEqual((self.email.status, mail.outbox), ('queued', []))
+        self.assertEqual(send_batch(claim_batch(), self.locmem), {'sent': 1, 'failed': 0})
+
+        self.assertEqual(
+            [(message.subject, message.to) for message in mail.outbox], [('Welcome', ['student@example.com'])],
+        )
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ('sent', 1))
+        self.assertEqual(claim_batch(), [])
+
+    def test_failed_send_is_retried_with_backoff(self):
+        failing = 'users.tests.FailingEmailBackend'
+        before = timezone.now()
+        self.assertEqual(send_batch(claim_batch(), failing), {'sent': 0, 'failed': 1})
+
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ('queued', 1))
+        self.assertIn('mail server down', self.email.last_error)
+        self.assertGreaterEqual(self.email.next_attempt_at, before + timedelta(seconds=30))
+        # Not due again until the backoff has passed
+        self.assertEqual(claim_batch(), [])
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('users.mail', 'ERROR'):
+            send_batch(claim_batch(), failing)
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ('failed', 2))
+
+
+class UserStatCounterTests(TestCase):
+    """
+    The incrementally maintained counters agree with a recount of the users
+    table after every kind of write.
+    """
+
+    def assertNoDrift(self, step):
+        self.assertEqual(reconcile(dry_run=True), {}, f"Counters drifted after {step}")
+
+    def test_counters_match_recount(self):
+        graduated = timezone.localdate() - timedelta(days=800)
+        students = [
+            User.objects.create_user(f'student{n}@myunitec.ac.nz', 'pw', graduation_date=graduated) for n in range(3)
+        ]
+        others = [User.objects.create_user(f'user{n}@example.com', 'pw') for n in range(4)]
+        seed_users(5, seed=1)
+        self.assertNoDrift('create')
+
+        apply_action('approve', [others[0].pk])
+        apply_approval_decisions({'approved': [others[1].pk], 'denied': [others[2].pk]})
+        user = User.objects.get(pk=others[3].pk)
+        user.role = 'admin'
+        user.save()
+        self.assertNoDrift('approve')
+
+        self.assertEqual(sweep_expired_graduates('pending'), 3)
+        apply_action('extend_graduation', [students[0].pk])
+        self.assertNoDrift('sweep')
+
+        User.objects.get(pk=students[1].pk).delete()
+        User.objects.filter(pk__in=[others[0].pk, others[1].pk]).delete()
+        self.assertNoDrift('delete')
+
+        stats = get_stats()
+        self.assertEqual(stats['total'], User.objects.count())
+        self.assertEqual(stats['graduation_state']['expired'], 1)
+        self.assertEqual(stats['approval_status']['denied'], User.objects.filter(approval_status='denied').count())
+
+
+@override_settings(USERS_ADMIN_EXACT_COUNT_THRESHOLD=5)
+class LargeTablePaginatorTests(TestCase):
+    """
+    Counts above the threshold are estimated without scanning the table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_users(12, seed=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_results_are_counted_exactly(self):
+        paginator = LargeTablePaginator(User.objects.filter(pk__in=User.objects.values('pk')[:3]).order_by('pk'), 50)
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.is_estimated)
+
+    def test_unfiltered_count_is_estimated_from_the_key_span(self):
+        User.objects.filter(pk=User.objects.order_by('pk')[1].pk).delete()
+        paginator = LargeTablePaginator(User.objects.order_by('-created_at'), 50)
+        # The capped COUNT and one MIN/MAX lookup; the deleted row still counts
+        with self.assertNumQueries(2):
+            self.assertEqual(paginator.count, 12)
+        self.assertTrue(paginator.is_estimated)
+
+    def test_filtered_count_is_cached(self):
+        User.objects.update(role='student')
+        counts = [LargeTablePaginator(User.objects.filter(role='student').order_by('pk'), 50) for _ in range(2)]
+        self.assertEqual(counts[0].count, 12)
+        # Only the capped COUNT; the full count comes from the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(counts[1].count, 12)
+
+
+class ExportUsersCommandTests(TestCase):
+    def test_filters_by_listing_filter_names(self):
+        User.objects.create_user('approved@myunitec.ac.nz', 'pw')
+        User.objects.create_user('pending@example.com', 'pw')
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'users.jsonl'
+            call_command('export_users', str(path), filter=['approval_status=pending'], stderr=StringIO())
+            rows = [json.loads(line) for line in path.read_text().splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['pending@example.com'])
+
+    def test_unknown_filter_name_is_an_error(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown filter(s): status'):
+            call_command('export_users', filter=['status=pending', 'created_at_after=2024-01-01'], stdout=StringIO())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserExportViewTests(TestCase):
+    """
+    The API export streams the filtered users in chunks.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin@example.com', 'pw', role='admin', approval_status='approved')
+        for n in range(5):
+            User.objects.create_user(f'pending{n}@example.com', 'pw', first_name=f'Pending{n}')
+        User.objects.create_user('aroha@myunitec.ac.nz', 'pw', first_name='Aroha')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    @override_settings(USERS_EXPORT_CHUNK_SIZE=2)
+    def test_csv_streams_filtered_rows_in_chunks(self):
+        response = self.client.get('/users/export.csv', {'approval_status': 'pending'})
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="users-\d{8}\.csv"$')
+        self.assertEqual(response['Cache-Control'], 'no-store')
+
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        # The header, then 5 rows two at a time
+        self.assertEqual(len(chunks), 4)
+        reader = csv.DictReader(io.StringIO(''.join(chunks)))
+        self.assertEqual(tuple(reader.fieldnames), EXPORT_FIELDS)
+        rows = list(reader)
+        self.assertEqual([row['email'] for row in rows], [f'pending{n}@example.com' for n in range(5)])
+        self.assertEqual(
+            {key: rows[0][key] for key in ('first_name', 'approval_status_display', 'is_unitec_email_display')},
+            {'first_name': 'Pending0', 'approval_status_display': 'Pending', 'is_unitec_email_display': 'Non-Unitec'},
+        )
+
+    def test_jsonl_applies_search(self):
+        response = self.client.get('/users/export.jsonl', {'q': 'aroha'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['aroha@myunitec.ac.nz'])
+        self.assertEqual(rows[0]['approval_status'], 'approved')
+
+    def test_rejects_unknown_formats_and_non_admins(self):
+        self.assertEqual(self.client.get('/users/export.xlsx').status_code, 404)
+        self.client.force_authenticate(User.objects.get(email='aroha@myunitec.ac.nz'))
+        self.assertEqual(self.client.get('/users/export.csv').status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersCommandTests(TestCase):
+    def import_rows(self, rows, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'users.jsonl'
+            path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+            call_command('import_users', str(path), stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_passwords_are_hashed_on_the_pool_in_row_order(self):
+        rows = [
+            {'email': f'user{n}@example.com', 'password': f'Passw0rd!{n}', 'first_name': 'A', 'last_name': 'B'}
+            for n in range(5)
+        ]
+        rows.append({'email': 'reset@example.com', 'first_name': 'A', 'last_name': 'B'})
+        self.import_rows(rows, batch_size=4, hash_workers=3)
+
+        for n in range(5):
+            self.assertTrue(User.objects.get(email=f'user{n}@example.com').check_password(f'Passw0rd!{n}'))
+        self.assertFalse(User.objects.get(email='reset@example.com').has_usable_password())
+
+    def test_skip_passwords_leaves_them_unusable(self):
+        row = {'email': 'a@example.com', 'password': 'Passw0rd!x', 'first_name': 'A', 'last_name': 'B'}
+        self.import_rows([row], skip_passwords=True)
+        self.assertFalse(User.objects.get(email='a@example.com').has_usable_password())
+
+    def test_errors_are_reported_in_line_order(self):
+        user = '{"email": "a@example.com", "password": "Passw0rd!x", "first_name": "A", "last_name": "B"}'
+        lines = [user, '{bad', user, '{"email": "nope"}', '[]', user]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'users.jsonl'
+            path.write_text('\n'.join(lines) + '\n')
+            err = StringIO()
+            call_command('import_users', str(path), batch_size=4, stdout=StringIO(), stderr=err)
+
+        reported = [int(line.split(':')[0].removeprefix('line ')) for line in err.getvalue().splitlines()]
+        self.assertEqual(reported, [2, 3, 4, 5, 6])
+        self.assertEqual(User.objects.filter(email='a@example.com').count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class MiddlewareTests(TestCase):
+    """
+    Admin pages get sessions, CSRF protection and messages; JWT API requests
+    leave the session and CSRF cookies untouched.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin@example.com', 'S3cure-pass!')
+        self.pending = User.objects.create_user('pending@example.com', 'pw')
+        self.client = Client(enforce_csrf_checks=True)
+
+    def test_admin_uses_session_csrf_and_messages(self):
+        response = self.client.get('/admin/login/')
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        login = {'username': 'admin@example.com', 'password': 'S3cure-pass!', 'next': '/admin/'}
+        self.assertEqual(self.client.post('/admin/login/', login).status_code, 403)
+
+        login['csrfmiddlewaretoken'] = response.cookies[settings.CSRF_COOKIE_NAME].value
+        self.assertRedirects(self.client.post('/admin/login/', login), '/admin/', fetch_redirect_response=False)
+        self.assertIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+        changelist = '/admin/users/user/'
+        token = self.client.cookies[settings.CSRF_COOKIE_NAME].value
+        response = self.client.post(changelist, {
+            'action': 'approve_users', '_selected_action': [self.pending.pk], 'csrfmiddlewaretoken': token,
+        }, follow=True)
+        messages = [str(message) for message in response.context['messages']]
+        self.assertEqual(messages, ['Successfully approved 1 user(s).'])
+
+    def test_api_requests_skip_session_and_csrf_cookies(self):
+        response = self.client.post(
+            '/auth/jwt/create/', {'email': 'admin@example.com', 'password': 'S3cure-pass!'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+
+        response = self.client.patch('/me/profile/', {'first_name': 'Api'}, content_type='application/json', **auth)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/me/', **auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies, {})
+        self.assertNotIn('Cookie', response.get('Vary', ''))
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from .views import ApprovalQueueView, AuditLogView, UserExportView, UserListView, UserSearchView, UserStatsView
+
+urlpatterns = [
+    path("", UserListView.as_view(), name="user-list"),
+    path("approvals/", ApprovalQueueView.as_view(), name="user-approvals"),
+    path("search/", UserSearchView.as_view(), name="user-search"),
+    path("audit/", AuditLogView.as_view(), name="user-audit-log"),
+    path("stats/", UserStatsView.as_view(), name="user-stats"),
+    path("export.<str:export_format>", UserExportView.as_view(), name="user-export"),
+]
@@ -2,9 +2,17 @@
 Utility functions for user management and email validation.
 """
 
+import calendar
 import re
 from typing import Optional
 
+from django.utils import timezone
+
+from .domains import match_domain
+
+# Graduates keep graduated status for this many months after graduation
+GRADUATED_PERIOD_MONTHS = 12
+
 
 def is_unitec_email(email: str) -> bool:
     """
@@ -19,15 +27,9 @@ def is_unitec_email(email: str) -> bool:
     if not email:
         return False
     
-    # Extract domain from email
-    domain = extract_domain(email)
-    
-    # List of Unitec email domains
-    unitec_domains = [
-        'myunitec.ac.nz',
-    ]
-    
-    return domain.lower() in unitec_domains
+    # Domains come from the rule registry (settings + EmailDomainRule)
+    rule = match_domain(extract_domain(email))
+    return bool(rule and rule.is_unitec)
 
 
 def extract_domain(email: str) -> str:
@@ -77,20 +79,55 @@ def get_approval_status_by_email(email: str) -> str:
         email (str): Email address
         
     Returns:
-        str: 'approved' for Unitec emails, 'pending' for others
+        str: 'approved' for auto-approved domains (Unitec by default), 'pending' for others
     """
-    if is_unitec_email(email):
+    rule = match_domain(extract_domain(email))
+    if rule and rule.auto_approve:
         return 'approved'
     return 'pending'
 
 
-def is_graduated_user(graduation_date, max_months: int = 12) -> bool:
+def add_months(day, months: int):
+    """
+    Add calendar months to a date, clamping to the last day of the month.
+    
+    Args:
+        day (date): Start date
+        months (int): Number of months to add
+        
+    Returns:
+        date: The shifted date (e.g. 29 Feb + 12 months is 28 Feb)
+    """
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def graduation_expiry(graduation_date, max_months: int = GRADUATED_PERIOD_MONTHS):
+    """
+    Last day a graduate still counts as graduated.
+    
+    Args:
+        graduation_date: User's graduation date, or None
+        max_months (int): Months after graduation (default 12)
+        
+    Returns:
+        date: Expiry date, or None if there is no graduation date
+    """
+    if not graduation_date:
+        return None
+    return add_months(graduation_date, max_months)
+
+
+def is_graduated_user(graduation_date, max_months: int = GRADUATED_PERIOD_MONTHS, today=None) -> bool:
     """
     Check if user is within the graduated user period (default 12 months).
     
     Args:
         graduation_date: User's graduation date
         max_months (int): Maximum months after graduation (default 12)
+        today (date): Date to check against (default: today)
         
     Returns:
         bool: True if user is within graduated period, False otherwise
@@ -98,10 +135,33 @@ def is_graduated_user(graduation_date, max_months: int = 12) -> bool:
     if not graduation_date:
         return False
     
-    from datetime import datetime, timedelta
-    from django.utils import timezone
-    
-    current_date = timezone.now().date()
-    max_date = graduation_date + timedelta(days=max_months * 30)  # Approximate
+    if today is None:
+        today = timezone.localdate()
+    return today <= graduation_expiry(graduation_date, max_months)
+
+
+def derive_email_fields(emails) -> dict:
+    """
+    Derive ``is_unitec_email`` and ``approval_status`` for a batch of emails.
+
+    The domain rules only depend on the domain, so they are evaluated once
+    per distinct domain in the batch rather than once per email.
     
-    return current_date <= max_date
+    Args:
+        emails: Iterable of email addresses
+        
+    Returns:
+        dict: Mapping of email to an ``(is_unitec_email, approval_status)`` tuple
+    """
+    by_domain = {}
+    derived = {}
+    for email in emails:
+        domain = extract_domain(email).lower()
+        if domain not in by_domain:
+            rule = match_domain(domain)
+            by_domain[domain] = (
+                bool(rule and rule.is_unitec),
+                'approved' if rule and rule.auto_approve else 'pending',
+            )
+        derived[email] = by_domain[domain]
+    return derived
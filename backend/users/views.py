@@ -1,20 +1,464 @@
-from rest_framework.decorators import api_view, permission_classes
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import IntegrityError
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+from djoser import signals as djoser_signals
+from djoser.compat import get_user_email
+from djoser.conf import settings as djoser_settings
+from djoser.views import UserViewSet as DjoserUserViewSet
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
+from rest_framework import generics
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import AuthenticationFailed as DRFAuthenticationFailed, NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenViewBase
+
+from .audit import acting_as
+from .authentication import ClaimsJWTAuthentication
+from .bulk import apply_approval_decisions
+from .cache import aget_me_payload, build_me_payload, cache_is_shared, get_me_payload
+from .export import FORMATS as EXPORT_FORMATS, export_response
+from .filters import AuditLogFilter, UserFilter
+from .hashing import HasherOverloaded, get_hasher
+from .instrumentation import render_metrics
+from .models import AuditLogEntry, User
+from .pagination import ApprovalQueuePagination, CreatedAtCursorPagination
+from .permissions import IsAdminRole
+from .replicas import db_for_version
+from .revocation import revoke_token
+from .search import search_users
+from .serializers import (
+    ApprovalBatchSerializer,
+    AuditLogEntrySerializer,
+    ClaimsTokenObtainPairSerializer,
+    CustomUserCreateSerializer,
+    MeSerializer,
+    TokenRevokeSerializer,
+    UserApprovalSerializer,
+    UserListSerializer,
+    UserProfileUpdateSerializer,
+    UserStatsSerializer,
+)
+from .stats import get_stats
+
+
+def _me_validators(user_id, version):
+    """ETag and Last-Modified for ``version``, the cache version authentication read for the user."""
+    return version, f'"{user_id}-{version}"', version // 1_000_000_000
+
+
+def _me_headers(response, etag=None, last_modified=None):
+    if etag is not None:
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+    # Clients may keep the payload but must revalidate it on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
 
 ##who am i test 
+@extend_schema(responses=MeSerializer)
 @api_view(["GET"])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def me(request):
     u = request.user
-    return Response({
-        "id": u.id, 
-        "email": u.email, 
-        "first_name": u.first_name,
-        "last_name": u.last_name,
-        "role": u.role,
-        "unitec_id": u.unitec_id,
-        "year_group": u.year_group,
-        "approval_status": u.approval_status,
-        "is_unitec_email": u.is_unitec_email
-    })
+    if not cache_is_shared():
+        # Another worker's version bump would go unseen, so always read the row
+        return _me_headers(Response(build_me_payload(u)))
+    version, etag, last_modified = _me_validators(u.pk, u.version)
+
+    response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = Response(get_me_payload(u, version))
+    return _me_headers(response, etag, last_modified)
+
+
+@extend_schema(request=UserProfileUpdateSerializer, responses=UserProfileUpdateSerializer)
+@api_view(["PUT", "PATCH"])
+@authentication_classes([ClaimsJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def profile(request):
+    """
+    Update the current user's profile.
+    """
+    user = User.objects.get(pk=request.user.pk)
+    serializer = UserProfileUpdateSerializer(user, data=request.data, partial=request.method == "PATCH")
+    serializer.is_valid(raise_exception=True)
+    with acting_as(request.user, 'profile'):
+        serializer.save()
+    return Response(serializer.data)
+
+
+async def _aauthenticate(request):
+    """
+    Authenticate an async view's request with the claims JWT authentication.
+
+    Returns:
+        tuple: ``(user, None)``, or ``(None, response)`` with the 401 to return
+    """
+    authenticator = ClaimsJWTAuthentication()
+    try:
+        result = await authenticator.aauthenticate(request)
+    except DRFAuthenticationFailed as exc:
+        # Same body as DRF's exception handler; InvalidToken is a subclass
+        detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+        response = JsonResponse(detail, status=401)
+    else:
+        if result is not None:
+            return result[0], None
+        response = JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    response["WWW-Authenticate"] = authenticator.authenticate_header(request)
+    return None, response
+
+
+@require_GET
+async def async_me(request):
+    """
+    Async equivalent of /me/ using the async ORM on cache misses.
+    """
+    user, error = await _aauthenticate(request)
+    if error is not None:
+        return error
+    if not cache_is_shared():
+        return _me_headers(JsonResponse(build_me_payload(await User.objects.aget(pk=user.pk))))
+    version, etag, last_modified = _me_validators(user.pk, user.version)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        # Filled from the primary while the change behind the version may not have replicated
+        users = User.objects.using(db_for_version(version))
+        payload = await aget_me_payload(user.pk, version, lambda: users.aget(pk=user.pk))
+        response = JsonResponse(payload)
+    return _me_headers(response, etag, last_modified)
+
+
+@csrf_exempt
+@require_http_methods(["PUT", "PATCH"])
+async def async_profile(request):
+    """
+    Async equivalent of /me/profile/, saving through the async ORM.
+    """
+    user, error = await _aauthenticate(request)
+    if error is not None:
+        return error
+
+    instance = await User.objects.aget(pk=user.pk)
+    serializer, error = await sync_to_async(_validate_profile)(request, instance)
+    if error is not None:
+        return error
+    for field, value in serializer.validated_data.items():
+        setattr(instance, field, value)
+    with acting_as(user, 'profile'):
+        await instance.asave(update_fields=list(serializer.validated_data))
+    return JsonResponse(UserProfileUpdateSerializer(instance).data)
+
+
+def _validate_profile(request, instance):
+    """
+    Parse and validate an async profile update off the event loop.
+
+    Returns:
+        tuple: ``(serializer, None)``, or ``(None, response)`` with the 400 to return
+    """
+    data = _json_body(request)
+    if data is None:
+        return None, JsonResponse({"detail": "Invalid JSON body."}, status=400)
+    serializer = UserProfileUpdateSerializer(instance, data=data, partial=request.method == "PATCH")
+    if not serializer.is_valid():
+        return None, JsonResponse(serializer.errors, status=400)
+    return serializer, None
+
+
+def metrics(request):
+    """Request metrics in the Prometheus text format, for local scrapers only."""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'USERS_METRICS_ALLOWED_IPS', ['127.0.0.1', '::1']):
+        raise Http404
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _overloaded():
+    response = JsonResponse({"detail": "Server is busy, please retry shortly."}, status=503)
+    response["Retry-After"] = "1"
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def async_login(request):
+    """
+    Async equivalent of /auth/jwt/create/ with password checks on the hashing pool.
+    """
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({"detail": "Invalid JSON body."}, status=400)
+    email = data.get("email")
+    password = data.get("password")
+    if not email or not password:
+        return JsonResponse({"detail": "Email and password are required."}, status=400)
+
+    user = await User.objects.filter(email=email).afirst()
+    # check_password calls the setter when the hash uses outdated parameters
+    outdated = []
+    try:
+        if user is None:
+            # Hash anyway so response time doesn't reveal whether the email exists
+            await get_hasher().run(make_password, password)
+            valid = False
+        else:
+            valid = await get_hasher().run(check_password, password, user.password, outdated.append)
+    except HasherOverloaded:
+        return _overloaded()
+
+    if not valid or not user.is_active:
+        return JsonResponse({"detail": "No active account found with the given credentials"}, status=401)
+
+    if outdated:
+        # Rehash and store it, as User.check_password does on the sync login
+        try:
+            user.password = await get_hasher().run(make_password, password)
+        except HasherOverloaded:
+            pass  # Upgraded on a later login
+        else:
+            await user.asave(update_fields=["password"])
+
+    refresh = ClaimsTokenObtainPairSerializer.get_token(user)
+    return JsonResponse({"refresh": str(refresh), "access": str(refresh.access_token)})
+
+
+@csrf_exempt
+@require_POST
+async def async_register(request):
+    """
+    Async equivalent of djoser's user registration with hashing on the hashing pool.
+
+    Only the hashing moves off the request thread: the user is created
+    through the same serializer ``save()``, and ``user_registered`` and the
+    activation or confirmation email follow as in djoser's ``UserViewSet``.
+    """
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({"detail": "Invalid JSON body."}, status=400)
+
+    serializer = CustomUserCreateSerializer(data=data, context={"request": request})
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        encoded_password = await get_hasher().run(make_password, serializer.validated_data["password"])
+    except HasherOverloaded:
+        return _overloaded()
+
+    try:
+        user = await sync_to_async(_perform_register)(request, serializer, encoded_password)
+    except IntegrityError:
+        return JsonResponse({"non_field_errors": ["Unable to create account."]}, status=400)
+    return JsonResponse(CustomUserCreateSerializer(user).data, status=201)
+
+
+def _perform_register(request, serializer, encoded_password):
+    """``UserViewSet.perform_create`` with the password already hashed."""
+    user = serializer.save(password=None, encoded_password=encoded_password)
+    djoser_signals.user_registered.send(sender=DjoserUserViewSet, user=user, request=request)
+
+    context = {"user": user}
+    to = [get_user_email(user)]
+    if djoser_settings.SEND_ACTIVATION_EMAIL:
+        djoser_settings.EMAIL.activation(request, context).send(to)
+    elif djoser_settings.SEND_CONFIRMATION_EMAIL:
+        djoser_settings.EMAIL.confirmation(request, context).send(to)
+    return user
+
+
+class UserListView(generics.ListAPIView):
+    """
+    Admin user listing with cursor pagination and sparse fieldsets.
+
+    ``?fields=id,email,role`` limits both the response and the SELECT to the
+    requested fields; filters match ``UserAdmin.list_filter``.
+    """
+
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAdminRole]
+    serializer_class = UserListSerializer
+    pagination_class = CreatedAtCursorPagination
+    filterset_class = UserFilter
+
+    def get_fields(self):
+        if not hasattr(self, '_fields'):
+            self._fields = UserListSerializer.parse_fields(self.request.query_params.get('fields'))
+        return self._fields
+
+    def get_queryset(self):
+        queryset = User.objects.with_graduation_status()
+        fields = self.get_fields()
+        if fields:
+            # The cursor is built from created_at and id, so always load them
+            columns = UserListSerializer.model_fields_for(['id', 'created_at', *fields])
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = self.get_fields()
+        return super().get_serializer(*args, **kwargs)
+
+
+class UserSearchView(UserListView):
+    """
+    Indexed user search: ``?q=`` matches name, email and Unitec id prefixes.
+
+    Accepts the same ``fields``, filter and cursor parameters as the listing.
+    """
+
+    def get_queryset(self):
+        return search_users(super().get_queryset(), self.request.query_params.get('q', ''))
+
+
+class UserExportView(generics.GenericAPIView):
+    """
+    Stream every matching user as CSV (``export.csv``) or JSON Lines
+    (``export.jsonl``).
+
+    Accepts the listing's filters and the search ``?q=`` parameter.
+    """
+
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAdminRole]
+    filterset_class = UserFilter
+
+    def get_queryset(self):
+        return search_users(User.objects.all(), self.request.query_params.get('q', ''))
+
+    @extend_schema(
+        operation_id='users_export',
+        parameters=[
+            OpenApiParameter('export_format', str, OpenApiParameter.PATH, enum=list(EXPORT_FORMATS)),
+            OpenApiParameter('q', str, description='Search terms, as on the search endpoint'),
+        ],
+        filters=True,
+        responses={
+            (200, content_type.partition(';')[0]): OpenApiResponse(OpenApiTypes.BINARY, description='Export file')
+            for _, content_type in EXPORT_FORMATS.values()
+        },
+    )
+    def get(self, request, export_format):
+        if export_format not in EXPORT_FORMATS:
+            raise NotFound(f"Unsupported export format '{export_format}'.")
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, export_format, filename=f"users-{timezone.localdate():%Y%m%d}")
+
+
+class ApprovalQueueView(generics.ListAPIView):
+    """
+    Pending users, oldest first, and batch approval decisions.
+
+    POST ``{"approved": [ids], "denied": [ids], "expected_status": "pending"}``
+    applies the batch as one conditional UPDATE and returns the outcome for
+    every id: ``updated``, ``conflict`` (already decided elsewhere) or
+    ``not_found``.
+    """
+
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAdminRole]
+    serializer_class = UserApprovalSerializer
+    pagination_class = ApprovalQueuePagination
+    filter_backends = []
+
+    def get_queryset(self):
+        return User.objects.filter(approval_status='pending').only(*UserApprovalSerializer.Meta.fields, 'created_at')
+
+    def post(self, request):
+        serializer = ApprovalBatchSerializer(
+            data=request.data,
+            context={'max_batch_size': getattr(settings, 'USERS_APPROVAL_BATCH_MAX', 5000)},
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        outcomes = apply_approval_decisions(
+            {'approved': data['approved'], 'denied': data['denied']},
+            expected_status=data['expected_status'],
+            actor=request.user,
+        )
+        results = [
+            {'id': user_id, 'outcome': outcome, 'approval_status': status}
+            for user_id, (outcome, status) in outcomes.items()
+        ]
+        return Response({
+            'updated': sum(1 for row in results if row['outcome'] == 'updated'),
+            'results': results,
+        })
+
+
+class AuditLogView(generics.ListAPIView):
+    """
+    Audit log of approval status, role and graduation date changes, newest
+    first with cursor pagination.
+
+    ``?user=``, ``?actor=`` and ``?created_at_after=``/``?created_at_before=``
+    are each served by an index; ``?field=`` and ``?source=`` narrow further.
+    """
+
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAdminRole]
+    serializer_class = AuditLogEntrySerializer
+    pagination_class = CreatedAtCursorPagination
+    filterset_class = AuditLogFilter
+    queryset = AuditLogEntry.objects.all()
+
+
+class UserStatsView(generics.GenericAPIView):
+    """
+    User counts by approval status, role, email domain and graduation state.
+
+    Read from the ``UserStatCounter`` table in one query, so the cost does
+    not grow with the number of users.
+    """
+
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAdminRole]
+    serializer_class = UserStatsSerializer
+    filter_backends = []
+
+    def get(self, request):
+        return Response(self.get_serializer(get_stats()).data)
+
+
+class TokenRevokeView(TokenViewBase):
+    """
+    Revoke a refresh token (logout).
+
+    POST ``{"refresh": "<token>"}``; access tokens minted from it stay valid
+    until they expire (``ACCESS_TOKEN_LIFETIME``).
+    """
+
+    serializer_class = TokenRevokeSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0]) from e
+        revoke_token(serializer.validated_data['token'].payload)
+        return Response(status=204)